@@ -0,0 +1,57 @@
+"""
+    Benchmark of the batched platoon solve in symuviapy.contfunc
+
+    Compares one compute_control call per platoon with a single
+    compute_control_batch call for 1-40 platoons of 2-8 CAVs
+    (H = 50).
+
+    Usage:
+    python bench_batch.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.contfunc import (compute_control,  # noqa: E402
+                                compute_control_batch)
+from bench_sweep import create_problem  # noqa: E402
+
+H = 50
+PLATOONS = (1, 5, 10, 20, 40)
+SIZES = (2, 4, 6, 8)
+
+
+def create_step(n_plt, h=H):
+    """ Platoon problems of one simulation step"""
+    l_problem = [create_problem(h, SIZES[b % len(SIZES)], seed=b)
+                 for b in range(n_plt)]
+    return [list(x) for x in zip(*l_problem)]
+
+
+if __name__ == "__main__":
+
+    print(f'Time per simulation step [s] (H = {H})')
+    print(f'{"platoons":>8} {"single":>10} {"batch":>10} {"speedup":>8}')
+    for n_plt in PLATOONS:
+        l_results, l_ldr_pos, l_h_ref = create_step(n_plt)
+
+        t_0 = timeit.default_timer()
+        l_single = [compute_control(results, h_ref, 0, ldr_pos)
+                    for results, ldr_pos, h_ref in zip(l_results, l_ldr_pos,
+                                                       l_h_ref)]
+        t_single = timeit.default_timer() - t_0
+
+        t_0 = timeit.default_timer()
+        l_batch = compute_control_batch(l_results, l_h_ref, l_ldr_pos)
+        t_batch = timeit.default_timer() - t_0
+
+        for single, batch in zip(l_single, l_batch):
+            assert np.allclose(single[3], batch[3])
+
+        print(f'{n_plt:>8} {t_single:>10.4f} {t_batch:>10.4f} '
+              f'{t_single/t_batch:>8.1f}')
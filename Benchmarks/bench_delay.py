@@ -0,0 +1,84 @@
+"""
+    Benchmark of the delayed control of Operational/models.py
+
+    100 vehicles with actuation and measurement delays up to 0.5 s:
+    full histories of states and controls (preallocated for the run,
+    delayed samples read back by index) against the DelayBuffer
+    of VehNetwork, for runs of 1000 up to 100000 steps. Memory is
+    measured with tracemalloc.
+
+    Usage:
+    python bench_delay.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from models import dynamic_3rd, Vehicle, VehNetwork  # noqa: E402
+from parameters import SimParameter, VehParameter  # noqa: E402
+
+N_VEH = 100
+RUNS = (1000, 10000, 100000)
+
+
+def history(network, veh_dly, n_stp):
+    """ Delays read from the full history of the run"""
+    m_obs = np.empty((n_stp + 1,) + network.veh_state.shape)
+    m_ctr = np.empty((n_stp, network.n_veh))
+    m_obs[0] = network.veh_state
+    a_veh = np.arange(network.n_veh)
+    for k in range(n_stp):
+        m_ctr[k] = -0.1 * m_obs[np.maximum(k - veh_dly, 0), a_veh, 2]
+        veh_ctr = np.where(k >= veh_dly,
+                           m_ctr[np.maximum(k - veh_dly, 0), a_veh], 0.0)
+        m_obs[k + 1] = network.evolve_step(veh_ctr)
+    return m_obs, m_ctr
+
+
+def buffered(network, n_stp):
+    """ Delays read from the ring buffers of the network"""
+    for k in range(n_stp):
+        network.evolve_step(-0.1 * network.measure()[:, 2])
+    return network
+
+
+def measure(func):
+    """ Peak memory [kB] and time per step [us]"""
+    tracemalloc.start()
+    t_0 = time.perf_counter()
+    result = func()
+    t_run = time.perf_counter() - t_0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1e3, t_run
+
+
+if __name__ == "__main__":
+
+    sim_par = SimParameter()
+    veh_par = VehParameter(cpcty=0.8)
+    veh_dly = np.random.RandomState(0).uniform(0, 0.5, N_VEH)
+
+    def network(**kwargs):
+        return VehNetwork(sim_par, [Vehicle(sim_par, veh_par, dynamic_3rd)
+                                    for _ in range(N_VEH)], **kwargs)
+
+    print(f'Delayed control of {N_VEH} vehicles, peak memory [kB] and '
+          f'time per step [us]')
+    print(f'{"steps":>7} {"history kB":>11} {"buffer kB":>10} '
+          f'{"history us":>11} {"buffer us":>10}')
+    for n_stp in RUNS:
+        net_hist = network()
+        a_dly = net_hist.delay_steps(veh_dly)
+        m_hist, t_hist = measure(lambda: history(net_hist, a_dly, n_stp))
+        net_buf = network(ctr_dly=veh_dly, obs_dly=veh_dly)
+        m_buf, t_buf = measure(lambda: buffered(net_buf, n_stp))
+        print(f'{n_stp:>7} {m_hist:>11.0f} {m_buf:>10.0f} '
+              f'{t_hist / n_stp * 1e6:>11.1f} {t_buf / n_stp * 1e6:>10.1f}')
@@ -0,0 +1,124 @@
+"""
+    Benchmark of the batched SymDriveVehicleEx calls
+
+    A plain per-vehicle loop with the encoded link names cached
+    against DriveBatch (link codes, arguments converted to lists once
+    per batch), for 20 up to 5000 vehicles per step. Both make one
+    ctypes call per vehicle, so the batch is expected to be close to
+    the loop: it mainly saves the conversions from NumPy scalars.
+
+    libSymuVia is replaced by a C function with the same prototype
+    compiled with the system compiler (cc), so the times are the
+    marshalling cost only. Without a compiler a Python function is
+    used.
+
+    Usage:
+    python bench_drive.py
+"""
+import ctypes
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.frame import Codebook, LINK_NAMES  # noqa: E402
+from symuviapy.session import PROTOTYPES, DriveBatch  # noqa: E402
+
+VEHICLES = (20, 200, 1000, 5000)
+
+STUB = b"""
+int SymLoadNetworkEx(const char *s) { return 1; }
+int SymDriveVehicleEx(int id, const char *link, int lane, double pos,
+                      int force) { return id < 0 ? -1 : 0; }
+"""
+
+
+class PythonLibrary:
+    """ Python stand-in when no compiler is available"""
+
+    def SymLoadNetworkEx(self, sFile):
+        return 1
+
+    def SymDriveVehicleEx(self, nId, sLink, nLane, dPos, bForce):
+        return -1 if nId < 0 else 0
+
+
+def stub_library(dirname):
+    """ Shared library with the prototypes of libSymuVia (or None)"""
+    sSource = os.path.join(dirname, 'stub.c')
+    sLibrary = os.path.join(dirname, 'libstub.so')
+    with open(sSource, 'wb') as f:
+        f.write(STUB)
+    try:
+        subprocess.run(['cc', '-shared', '-fPIC', '-O2', '-o', sLibrary,
+                        sSource], check=True, stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    library = ctypes.cdll.LoadLibrary(sLibrary)
+    for name in ('SymLoadNetworkEx', 'SymDriveVehicleEx'):
+        function = getattr(library, name)
+        function.argtypes, function.restype = PROTOTYPES[name]
+    return library
+
+
+class StubSession:
+    """ What DriveBatch uses of SymuviaSession"""
+
+    def __init__(self, library):
+        self.library = library
+        self.dName = {}
+        self.links = Codebook(LINK_NAMES)
+
+    def encode(self, name):
+        try:
+            return self.dName[name]
+        except KeyError:
+            self.dName[name] = name.encode('UTF8')
+            return self.dName[name]
+
+
+def drive_loop(library, session, aId, aLink, aLane, aPos):
+    """ One call per vehicle, link names encoded once (session cache)"""
+    lStatus = []
+    for nId, sLink, nLane, dPos in zip(aId, aLink, aLane, aPos):
+        lStatus.append(library.SymDriveVehicleEx(
+            int(nId), session.encode(sLink), int(nLane), float(dPos), 1))
+    return np.array(lStatus)
+
+
+if __name__ == "__main__":
+
+    with tempfile.TemporaryDirectory() as dirname:
+        library = stub_library(dirname)
+        if library is None:
+            print('No C compiler, Python stand-in library')
+            library = PythonLibrary()
+        session = StubSession(library)
+        batch = DriveBatch(session)
+        rng = np.random.RandomState(0)
+
+        print('SymDriveVehicleEx per step [ms]')
+        print(f'{"N":>6} {"loop":>10} {"batch":>10} {"ratio":>8}')
+        for n_veh in VEHICLES:
+            aId = np.arange(n_veh)
+            aCode = rng.randint(0, len(LINK_NAMES), n_veh).astype(np.int16)
+            aLink = session.links.decode(aCode)
+            aLane = rng.randint(1, 3, n_veh)
+            aPos = rng.uniform(0, 500, n_veh)
+            number = max(5000 // n_veh, 1)
+            t_loop = min(timeit.repeat(
+                lambda: drive_loop(library, session, aId, aLink, aLane,
+                                   aPos),
+                number=number, repeat=3)) / number
+            t_batch = min(timeit.repeat(
+                lambda: batch(aId, aCode, aLane, aPos),
+                number=number, repeat=3)) / number
+            print(f'{n_veh:>6} {t_loop*1e3:>10.3f} {t_batch*1e3:>10.3f} '
+                  f'{t_loop/t_batch:>8.1f}')
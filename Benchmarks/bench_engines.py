@@ -0,0 +1,95 @@
+"""
+    Convergence benchmark of the costate update engines
+
+    Compares iteration counts and wall time of the 'relax' (original
+    fixed relaxation), 'adaptive', 'nesterov' and 'anderson' engines
+    for symuviapy.contfunc.compute_control and for compute_control
+    in Operational/platoon-closed.py (cold starts along a split
+    maneuver). For platoon-closed the condensed solver 'qp' is
+    included, its iterations are Newton iterations.
+
+    Usage:
+    python bench_engines.py
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from symuviapy.contfunc import compute_control  # noqa: E402
+from symuviapy.engines import dengine  # noqa: E402
+from bench_sweep import create_problem  # noqa: E402
+
+GRID = ((50, 2), (50, 8), (50, 64), (100, 4), (100, 16))
+
+
+def load_platoon_closed():
+    """ Imports Operational/platoon-closed.py as a module"""
+    file_name = os.path.join(dir_path, '..', 'Operational',
+                             'platoon-closed.py')
+    spec = importlib.util.spec_from_file_location('platoon_closed',
+                                                  file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_contfunc(engine, h, n_veh):
+    """ Time (s), iterations and control of one call"""
+    results, ldr_pos, h_ref = create_problem(h, n_veh)
+    t_0 = timeit.default_timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = compute_control(results, h_ref, 0, ldr_pos, engine=engine)
+    return timeit.default_timer() - t_0, out[-1], out[3]
+
+
+def time_platoon_closed(pc, engine, l_samples=(0, 250, 280, 310),
+                        fast=False):
+    """ Time (s) and iterations of cold solves along a maneuver"""
+    dEvent = {'id': 2, 'tm': 30.0, 'tg': (pc.G_T, 3 * pc.G_T)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        mRef = pc.create_ref(dEvent, pc.G_T)
+    aX = (np.ones(pc.N) * (pc.S_D + pc.L_AVG), np.ones(pc.N) * pc.V_P,
+          np.zeros(pc.N))
+    t_total, n_total = 0.0, 0
+    for i in l_samples:
+        state = pc.SolverState()
+        mRefW = mRef[i:i+pc.H]
+        t_0 = timeit.default_timer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pc.compute_control(aX, mRefW, np.zeros(mRefW.shape), state,
+                               engine, fast)
+        t_total += timeit.default_timer() - t_0
+        n_total += state.l_iter[0]
+    return t_total, n_total
+
+
+if __name__ == "__main__":
+
+    print('symuviapy.contfunc.compute_control')
+    print(f'{"H":>5} {"N":>4} {"engine":>10} {"iter":>7} {"time [s]":>9} '
+          f'{"speedup":>8} {"|dU|":>9}')
+    for h, n_veh in GRID:
+        t_ref, _, U_ref = time_contfunc('relax', h, n_veh)
+        for engine in dengine:
+            t, n, U = time_contfunc(engine, h, n_veh)
+            print(f'{h:>5} {n_veh:>4} {engine:>10} {n:>7} {t:>9.4f} '
+                  f'{t_ref/t:>8.1f} {np.max(np.abs(U-U_ref)):>9.2e}')
+
+    pc = load_platoon_closed()
+    print('\nplatoon-closed.compute_control (4 samples, cold start)')
+    print(f'{"engine":>10} {"iter":>7} {"time [s]":>9} {"speedup":>8}')
+    t_ref, _ = time_platoon_closed(pc, 'relax')
+    for engine in list(dengine) + ['qp']:
+        t, n = time_platoon_closed(pc, engine)
+        print(f'{engine:>10} {n:>7} {t:>9.4f} {t_ref/t:>8.1f}')
+    t, n = time_platoon_closed(pc, 'relax', fast=True)
+    print(f'{"riccati":>10} {n:>7} {t:>9.4f} {t_ref/t:>8.1f}')
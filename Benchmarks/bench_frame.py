@@ -0,0 +1,58 @@
+"""
+    Benchmark of the per-step vehicle processing
+
+    Time of one step from the instant XML to vehicle rows with leader,
+    spacing and leader speed, for 10, 100 and 1000 vehicles:
+
+    dicts:  xmltodict + symfunc typedict/getspace/getleaderspeed/updatelist
+    frame:  stepparser + symuviapy.frame (columnar)
+
+    Usage:
+    python bench_frame.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy import frame as vf  # noqa: E402
+from symuviapy import symfunc  # noqa: E402
+from symuviapy.stepparser import parse_inst  # noqa: E402
+from bench_parser import create_request, parse_xmltodict  # noqa: E402
+
+VEHICLES = (10, 100, 1000)
+
+
+def step_dicts(bRequest):
+    ti, lTrajVeh = parse_xmltodict(bRequest)
+    for i, veh in enumerate(lTrajVeh):
+        veh['ti'] = ti
+        veh['ldr'] = lTrajVeh[i-1]['id'] if i else veh['id']
+    lTrajVeh = symfunc.updatelist(lTrajVeh, symfunc.getspace(lTrajVeh))
+    return symfunc.updatelist(lTrajVeh, symfunc.getleaderspeed(lTrajVeh))
+
+
+def step_frame(bRequest):
+    frame = vf.typedict(*parse_inst(bRequest))
+    frame.ldr = np.concatenate((frame.id[:1], frame.id[:-1]))
+    return vf.updatelist(frame, spc=vf.getspace(frame),
+                         vld=vf.getleaderspeed(frame))
+
+
+if __name__ == "__main__":
+
+    print('Time per step [ms]')
+    print(f'{"N":>6} {"dicts":>10} {"frame":>10} {"speedup":>8}')
+    for n_veh in VEHICLES:
+        bRequest = create_request(n_veh)
+        number = max(2000 // n_veh, 3)
+        t_dicts = min(timeit.repeat(lambda: step_dicts(bRequest),
+                                    number=number, repeat=3)) / number
+        t_frame = min(timeit.repeat(lambda: step_frame(bRequest),
+                                    number=number, repeat=3)) / number
+        print(f'{n_veh:>6} {t_dicts*1e3:>10.3f} {t_frame*1e3:>10.3f} '
+              f'{t_dicts/t_frame:>8.1f}')
@@ -0,0 +1,64 @@
+"""
+    Benchmark of the headless simulator (symuviapy.headless)
+
+    Full runs of the networks of Network/ through SymuviaSession, with
+    the XML output of every step (traced and parsed as with
+    libSymuVia) and without trace (arrays read with traj()). The
+    demand of the entries is scaled to load the network.
+
+    Usage:
+    python bench_headless.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.headless import HeadlessSymuVia  # noqa: E402
+from symuviapy.runner import write_network  # noqa: E402
+from symuviapy.session import SymuviaSession  # noqa: E402
+
+NETWORKS = ('Merge.xml', 'Merge_Demand_CAV.xml', 'Merge_Demand_HDV.xml')
+DEMAND = ((0.8, 120),)  # veh/s on each entry for the loaded runs
+
+
+def run(network, trace):
+    """ Time of a full run, mean number of vehicles"""
+    library = HeadlessSymuVia()
+    session = SymuviaSession(network, library)
+    n_veh = 0
+    t_0 = time.perf_counter()
+    if trace:
+        for k, ti, aTraj in session.run(sys.maxsize):
+            n_veh += len(aTraj)
+    else:
+        while not session.finished:
+            session.step(trace=False)
+            n_veh += len(library.traj())
+    return time.perf_counter() - t_0, session.n_steps, n_veh
+
+
+if __name__ == "__main__":
+
+    with tempfile.TemporaryDirectory() as dirname:
+        lNetworks = []
+        for sNetwork in NETWORKS:
+            source = os.path.join(dir_path, '..', 'Network', sNetwork)
+            lNetworks.append((sNetwork, source))
+            lNetworks.append((sNetwork + ' (loaded)', write_network(
+                source, os.path.join(dirname, sNetwork),
+                demand={'Ext_In_main': DEMAND, 'Ext_In_onramp': DEMAND})))
+
+        print('Headless runs')
+        print(f'{"network":>30} {"steps":>6} {"veh":>6} '
+              f'{"trace ms/step":>14} {"arrays ms/step":>15} {"runs/min":>9}')
+        for sName, network in lNetworks:
+            t_trace, n_steps, n_veh = run(network, True)
+            t_array, _, _ = run(network, False)
+            print(f'{sName:>30} {n_steps:>6} {n_veh / n_steps:>6.1f} '
+                  f'{t_trace / n_steps * 1e3:>14.3f} '
+                  f'{t_array / n_steps * 1e3:>15.3f} '
+                  f'{60 / t_array:>9.1f}')
@@ -0,0 +1,79 @@
+"""
+    Benchmark of the leader identification over a simulation
+
+    Vehicles enter a 3-link road every few steps and leave at its end.
+    The persistent dLeader of the closed-loop notebook (queueveh +
+    getlead) is compared with symuviapy.leaders.LeaderRegistry: time
+    per step and memory after the run, for increasing network loads.
+
+    Usage:
+    python bench_leaders.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.leaders import LeaderRegistry  # noqa: E402
+from symuviapy.symfunc import queueveh, getlead  # noqa: E402
+
+DT = 0.1
+SPEED = 20.0
+LINKS = ('In_main', 'Merge_zone', 'Out_main')
+LINK_LENGTH = 1000.0
+N_STEPS = 3000
+
+
+def create_steps(n_on_network, n_steps=N_STEPS):
+    """ Vehicles (id, link, position) of each step"""
+    travel = len(LINKS) * LINK_LENGTH / SPEED / DT  # steps on network
+    every = travel / n_on_network
+    l_steps = []
+    for k in range(n_steps):
+        n_entered = int(k / every) + 1
+        aId = np.arange(n_entered)
+        aPos = SPEED * DT * (k - aId * every)
+        bIn = (aPos >= 0) & (aPos < len(LINKS) * LINK_LENGTH)
+        aId, aPos = aId[bIn], aPos[bIn]
+        aLink = (aPos // LINK_LENGTH).astype(int)
+        l_steps.append((aId, np.array(LINKS)[aLink], aPos))
+    return l_steps
+
+
+def run_dicts(l_steps):
+    dLeader = {}
+    for aId, aTron, aPos in l_steps:
+        for veh_id, tron in zip(aId.tolist(), aTron.tolist()):
+            veh = {'id': veh_id, 'tron': tron}
+            dLeader = queueveh(dLeader, veh)
+            veh['ldr'] = getlead(dLeader, veh)
+    return sys.getsizeof(dLeader) + sum(sys.getsizeof(q)
+                                        for q in dLeader.values())
+
+
+def run_registry(l_steps, registry):
+    for aId, aTron, aPos in l_steps:
+        registry.update_arrays(aId, aTron, aPos)
+    return registry.memory()
+
+
+if __name__ == "__main__":
+
+    print(f'{N_STEPS} steps, time per step [ms] and memory [kB] at the end')
+    print(f'{"N":>6} {"dLeader":>10} {"registry":>10} {"speedup":>8} '
+          f'{"mem dLeader":>12} {"mem registry":>13}')
+    for n_on_network in (10, 100, 500):
+        l_steps = create_steps(n_on_network)
+        t_0 = timeit.default_timer()
+        mem_dicts = run_dicts(l_steps)
+        t_dicts = (timeit.default_timer() - t_0) / N_STEPS
+        registry = LeaderRegistry()
+        mem_registry = run_registry(l_steps, registry)
+        t_registry = registry.time_per_step
+        print(f'{n_on_network:>6} {t_dicts*1e3:>10.3f} '
+              f'{t_registry*1e3:>10.3f} {t_dicts/t_registry:>8.1f} '
+              f'{mem_dicts/1e3:>12.1f} {mem_registry/1e3:>13.1f}')
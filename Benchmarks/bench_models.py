@@ -0,0 +1,31 @@
+"""
+    Throughput benchmark of the vehicle dynamics of Operational/models.py
+
+    One time step of a mixed fleet (half 2nd order, half 3rd order
+    vehicles, each one following the previous vehicle): per-vehicle
+    calls of dynamic_2nd / dynamic_3rd against the batched
+    VehNetwork.evolve_step, for 10 up to 10000 vehicles. The fleet and
+    the timing are those of test_models.test_network_throughput.
+
+    Usage:
+    python bench_models.py
+"""
+import os
+import sys
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from test_models import throughput  # noqa: E402
+
+FLEETS = (10, 100, 1000, 10000)
+
+
+if __name__ == "__main__":
+
+    print('Vehicle updates per second (one time step of the fleet)')
+    print(f'{"N":>6} {"per vehicle":>12} {"network":>12} {"speedup":>8}')
+    for n_veh in FLEETS:
+        f_loop, f_net = throughput(n_veh)
+        print(f'{n_veh:>6} {f_loop:>12.3g} {f_net:>12.3g} '
+              f'{f_net / f_loop:>8.1f}')
@@ -0,0 +1,48 @@
+"""
+    Benchmark of the Monte Carlo engine of Operational/montecarlo.py
+
+    Robustness study of an 8 truck platoon (60 s, all perturbations of
+    platoon-closed-3rd.py at once): M separate closed loops (one
+    realization per simulate call) against batches of realizations in
+    one (M x N x 4) array, for 10 up to 1000 realizations. The time of
+    10000 realizations is extrapolated from the batched rate.
+
+    Usage:
+    python bench_montecarlo.py
+"""
+import os
+import sys
+import time
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from montecarlo import MonteCarlo, braking  # noqa: E402
+from parameters import SimParameter, VehParameter  # noqa: E402
+
+SAMPLES = (10, 100, 1000)
+CHUNK = 500
+
+
+if __name__ == "__main__":
+
+    sim_par = SimParameter(0.01, 0.5, 60)
+    veh_par = VehParameter.VehParameterSym(25.0, 0.16, 6.25, 4.0)
+    mc = MonteCarlo(sim_par, veh_par, 8, noise=(0.5, 0.2, 0.2, 0.05),
+                    mismatch=0.3, delay=0.3, head_nif=braking(sim_par),
+                    split=(30.0, 4, 10.0))
+
+    print('Realizations per second')
+    print(f'{"M":>6} {"separate":>9} {"batched":>9} {"speedup":>8} '
+          f'{"10000 [min]":>12}')
+    for n_mc in SAMPLES:
+        n_loop = min(n_mc, 20)  # separate loops are extrapolated
+        t_0 = time.perf_counter()
+        for i in range(n_loop):
+            mc.simulate(i)
+        t_loop = (time.perf_counter() - t_0) / n_loop
+        t_0 = time.perf_counter()
+        mc.run(n_mc, chunk=CHUNK)
+        t_batch = (time.perf_counter() - t_0) / n_mc
+        print(f'{n_mc:>6} {1 / t_loop:>9.3g} {1 / t_batch:>9.3g} '
+              f'{t_loop / t_batch:>8.1f} {1e4 * t_batch / 60:>12.2f}')
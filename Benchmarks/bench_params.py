@@ -0,0 +1,72 @@
+"""
+    Benchmark of the parameter sets of Operational/parameters.py
+
+    Sensitivity sweep over free-flow speed, vehicle length, gap,
+    capacity and wave speed (some capacities missing, to exercise the
+    fallback): one VehParameter per combination against a ParameterGrid
+    deriving every column at once, for 100 up to 100000 combinations.
+    Materializing the grid rows is timed separately.
+
+    Usage:
+    python bench_params.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from parameters import ParameterGrid, VehParameter  # noqa: E402
+
+SWEEPS = (100, 1000, 10000, 100000)
+
+
+def sweep(n_comb):
+    """ Random inputs, one capacity out of four missing"""
+    rng = np.random.RandomState(n_comb)
+    cpcty = rng.uniform(0.3, 0.6, n_comb)
+    cpcty[::4] = np.nan
+    return {'u_ffs': rng.uniform(15, 30, n_comb),
+            'l_veh': rng.uniform(4, 18, n_comb),
+            'x_gap': rng.uniform(1, 5, n_comb),
+            'cpcty': cpcty,
+            'w_cgt': rng.uniform(5, 7, n_comb)}
+
+
+def scalar(d_in):
+    """ One VehParameter per combination"""
+    l_par = []
+    for u, l, x, c, w in zip(*(d_in[k].tolist() for k in
+                               ('u_ffs', 'l_veh', 'x_gap', 'cpcty',
+                                'w_cgt'))):
+        if np.isnan(c):
+            l_par.append(VehParameter(u, l, x, w_cgt=w))
+        else:
+            l_par.append(VehParameter(u, l, x, cpcty=c))
+    return np.array([par.k_crt for par in l_par])
+
+
+if __name__ == "__main__":
+
+    print('Parameter sets per second')
+    print(f'{"N":>7} {"scalar":>10} {"grid":>10} {"speedup":>8} '
+          f'{"rows":>10}')
+    for n_comb in SWEEPS:
+        d_in = sweep(n_comb)
+        t_0 = time.perf_counter()
+        a_ref = scalar(d_in)
+        t_scalar = time.perf_counter() - t_0
+        t_0 = time.perf_counter()
+        grid = ParameterGrid(**d_in)
+        a_grid = grid.k_crt
+        t_grid = time.perf_counter() - t_0
+        t_0 = time.perf_counter()
+        l_par = list(grid)
+        t_rows = time.perf_counter() - t_0
+        assert np.allclose(a_ref, a_grid)
+        print(f'{n_comb:>7} {n_comb / t_scalar:>10.3g} '
+              f'{n_comb / t_grid:>10.3g} {t_scalar / t_grid:>8.1f} '
+              f'{n_comb / t_rows:>10.3g}')
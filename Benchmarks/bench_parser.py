@@ -0,0 +1,73 @@
+"""
+    Benchmark of the instant XML parsers in symuviapy.stepparser
+
+    Time to convert the output of one SymRunNextStepEx call into
+    vehicle data for 10, 100 and 1000 vehicles:
+
+    xmltodict:  xmltodict.parse + typedict (notebooks)
+    expat:      stepparser.parse_inst_expat
+    scanner:    stepparser.parse_inst
+
+    Usage:
+    python bench_parser.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+from xmltodict import parse
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.stepparser import (parse_inst, parse_inst_expat,  # noqa: E402
+                                  format_inst, empty_traj)
+from symuviapy.symfunc import typedict  # noqa: E402
+
+VEHICLES = (10, 100, 1000)
+
+
+def create_request(n_veh, seed=0):
+    """ Instant XML with n_veh vehicles"""
+    rng = np.random.RandomState(seed)
+    aTraj = empty_traj(n_veh)
+    aTraj['id'] = np.arange(n_veh)
+    aTraj['type'] = np.where(rng.rand(n_veh) < 0.5, 'CAV', 'HDV')
+    aTraj['tron'] = 'In_main'
+    aTraj['voie'] = 1
+    aTraj['dst'] = 1000 * rng.rand(n_veh)
+    aTraj['abs'] = 1000 * rng.rand(n_veh)
+    aTraj['vit'] = 25 * rng.rand(n_veh)
+    return format_inst(10.0, aTraj)
+
+
+def parse_xmltodict(bRequest):
+    dParsed = parse(bRequest.decode('UTF8'))
+    ti = dParsed['INST']['@val']
+    lVehDataRaw = dParsed['INST']['TRAJS']['TRAJ']
+    try:
+        return ti, [typedict(lVehDataRaw)]
+    except TypeError:
+        return ti, [typedict(veh) for veh in lVehDataRaw]
+
+
+dparser = {'xmltodict': parse_xmltodict,
+           'expat': parse_inst_expat,
+           'scanner': parse_inst,
+           }
+
+if __name__ == "__main__":
+
+    print('Parse time per step [ms]')
+    print(f'{"N":>6}' + ''.join(f'{p:>11}' for p in dparser) +
+          f'{"speedup":>9}')
+    for n_veh in VEHICLES:
+        bRequest = create_request(n_veh)
+        number = max(10000 // n_veh, 10)
+        dTime = {p: min(timeit.repeat(lambda: f(bRequest), number=number,
+                                      repeat=3)) / number
+                 for p, f in dparser.items()}
+        print(f'{n_veh:>6}' + ''.join(f'{t*1e3:>11.4f}'
+                                      for t in dTime.values()) +
+              f'{dTime["xmltodict"]/dTime["scanner"]:>9.1f}')
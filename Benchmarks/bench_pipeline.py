@@ -0,0 +1,63 @@
+"""
+    Benchmark of the pipelined open loop
+
+    The simulator is replaced by a step function that waits for a fixed
+    time (SymRunNextStepEx releases the GIL the same way) and returns a
+    prepared instant XML. The same stages (parse, spacing, persist) run
+    one after the other and in symuviapy.pipeline.Pipeline.
+
+    Usage:
+    python bench_pipeline.py [n_steps] [n_veh] [simulator ms]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.leaders import LeaderRegistry  # noqa: E402
+from symuviapy.pipeline import (Pipeline, simulator_source,  # noqa: E402
+                                open_loop_stages)
+from symuviapy.writer import TrajectoryWriter  # noqa: E402
+from symuviapy.test_pipeline import create_simulator  # noqa: E402
+
+
+def run_sequential(path, n_steps, n_veh, delay):
+    with TrajectoryWriter(path) as writer:
+        stages = open_loop_stages(LeaderRegistry(), writer)
+        t_0 = timeit.default_timer()
+        for item in simulator_source(create_simulator(n_steps, n_veh,
+                                                      delay)):
+            for stage in stages:
+                item = stage.func(item)
+    return timeit.default_timer() - t_0, None
+
+
+def run_pipeline(path, n_steps, n_veh, delay):
+    with TrajectoryWriter(path) as writer:
+        pipe = Pipeline(simulator_source(create_simulator(n_steps, n_veh,
+                                                          delay)),
+                        open_loop_stages(LeaderRegistry(), writer),
+                        name='simulator')
+        t_0 = timeit.default_timer()
+        pipe.run()
+    return timeit.default_timer() - t_0, pipe
+
+
+if __name__ == "__main__":
+
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_veh = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    delay = float(sys.argv[3]) / 1e3 if len(sys.argv) > 3 else 2e-3
+
+    print(f'{n_steps} steps x {n_veh} vehicles, simulator '
+          f'{delay*1e3:.1f} ms/step')
+    for name, run in (('sequential', run_sequential),
+                      ('pipeline', run_pipeline)):
+        with tempfile.TemporaryDirectory() as dirname:
+            t, pipe = run(os.path.join(dirname, 'SymOut.sqlite'), n_steps,
+                          n_veh, delay)
+        print(f'{name:>10}: {t:.3f} s ({t/n_steps*1e3:.3f} ms/step)')
+    print(pipe)
@@ -0,0 +1,63 @@
+"""
+    Benchmark of time-slice and vehicle queries on the output database
+
+    scan:   WHERE ti = t_i on the float column (notebooks), rows as tuples
+    index:  symuviapy.query.TrajectoryDB (integer step, indexes, arrays)
+
+    Usage:
+    python bench_query.py [n_steps] [n_veh]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.query import TrajectoryDB  # noqa: E402
+from symuviapy.writer import TrajectoryWriter  # noqa: E402
+from symuviapy.test_writer import create_step  # noqa: E402
+
+if __name__ == "__main__":
+
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    n_veh = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'SymOut.sqlite')
+        with TrajectoryWriter(path) as writer:
+            for k in range(n_steps):
+                writer.write('closed', create_step(f'{k / 10:.2f}', n_veh))
+
+        db = TrajectoryDB(path, migrate=True)
+        connection = db.connection
+        k = n_steps // 2
+        ti = k / 10
+        veh_id = n_veh // 2
+
+        dQuery = {
+            'step':
+            (lambda: connection.execute('SELECT * FROM closed WHERE ti = ?',
+                                        (ti,)).fetchall(),
+             lambda: db.step(k, 'closed')),
+            'vehicle':
+            (lambda: connection.execute('SELECT * FROM closed NOT INDEXED '
+                                        'WHERE id = ? ORDER BY ti',
+                                        (veh_id,)).fetchall(),
+             lambda: db.vehicle(veh_id, 'closed')),
+            'window(50)':
+            (lambda: connection.execute('SELECT * FROM closed NOT INDEXED '
+                                        'WHERE ti BETWEEN ? AND ?',
+                                        (ti, ti + 5.0)).fetchall(),
+             lambda: db.window(k, k + 50, 'closed')),
+        }
+
+        print(f'{n_steps} steps x {n_veh} vehicles, time per query [ms]')
+        print(f'{"query":>12} {"scan":>10} {"index":>10} {"speedup":>8}')
+        for name, (f_scan, f_index) in dQuery.items():
+            t_scan = min(timeit.repeat(f_scan, number=5, repeat=3)) / 5
+            t_index = min(timeit.repeat(f_index, number=5, repeat=3)) / 5
+            print(f'{name:>12} {t_scan*1e3:>10.3f} {t_index*1e3:>10.3f} '
+                  f'{t_scan/t_index:>8.1f}')
+        db.close()
@@ -0,0 +1,38 @@
+"""
+    Benchmark of symfunc.getspace / getleaderspeed
+
+    Former leader lookup (scan of all vehicles for every vehicle)
+    against the id join of symfunc.leader_rows, for 20 vehicles (size
+    of Merge_Demand_CAV.xml) up to 5000 vehicles.
+
+    Usage:
+    python bench_spacing.py
+"""
+import os
+import sys
+import timeit
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.symfunc import getspace, getleaderspeed  # noqa: E402
+from symuviapy.test_symfunc import (create_vehicles,  # noqa: E402
+                                    getspace_scan, getleaderspeed_scan)
+
+VEHICLES = (20, 200, 1000, 5000)
+
+if __name__ == "__main__":
+
+    print('Spacing + leader speed per step [ms]')
+    print(f'{"N":>6} {"scan":>10} {"join":>10} {"speedup":>8}')
+    for n_veh in VEHICLES:
+        lTrajVeh = create_vehicles(n_veh)
+        number = max(2000 // n_veh, 1)
+        t_scan = min(timeit.repeat(lambda: (getspace_scan(lTrajVeh),
+                                            getleaderspeed_scan(lTrajVeh)),
+                                   number=number, repeat=3)) / number
+        t_join = min(timeit.repeat(lambda: (getspace(lTrajVeh),
+                                            getleaderspeed(lTrajVeh)),
+                                   number=number, repeat=3)) / number
+        print(f'{n_veh:>6} {t_scan*1e3:>10.3f} {t_join*1e3:>10.3f} '
+              f'{t_scan/t_join:>8.1f}')
@@ -0,0 +1,90 @@
+"""
+    Benchmark of the result store against the former CSV output
+
+    Writes a sweep of scenarios (5 arrays of nSamples x 6 each) as
+    np.savetxt CSV files and with store.ResultStore, then reads one
+    truck's speed across all scenarios.
+
+    Usage:
+    python bench_store.py [n_scenarios]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from store import ResultStore  # noqa: E402
+
+N_SAMPLES = 3000
+N_TRUCKS = 6
+KEYS = ('space', 'speed', 'reference', 'control', 'position')
+
+
+def create_sweep(n_scenarios, seed=0):
+    """ Events and arrays of a synthetic sweep"""
+    rng = np.random.RandomState(seed)
+    return [({'id': i, 'tm': 30.0, 'tg': (1.2, 2.4)},
+             {k: rng.rand(N_SAMPLES, N_TRUCKS) for k in KEYS})
+            for i in range(n_scenarios)]
+
+
+def write_csv(dirname, l_sweep):
+    for event, dArrays in l_sweep:
+        for key, mData in dArrays.items():
+            np.savetxt(os.path.join(dirname, f'{key}_{event["id"]}.csv'),
+                       mData, fmt='%.4f', delimiter='\t', newline='\n')
+
+
+def read_csv(dirname, l_sweep, column):
+    return np.stack([np.loadtxt(os.path.join(dirname,
+                                             f'speed_{event["id"]}.csv'),
+                                delimiter='\t')[:, column]
+                     for event, _ in l_sweep])
+
+
+def write_store(dirname, l_sweep, compress=False):
+    store = ResultStore(dirname, compress)
+    for event, dArrays in l_sweep:
+        store.save(f'_{event["id"]}', event, **dArrays)
+
+
+def read_store(dirname, column):
+    return ResultStore(dirname).stack('speed', column=column)
+
+
+def disk_size(dirname):
+    return sum(os.path.getsize(os.path.join(dirname, f))
+               for f in os.listdir(dirname))
+
+
+if __name__ == "__main__":
+
+    n_scenarios = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    l_sweep = create_sweep(n_scenarios)
+
+    print(f'{n_scenarios} scenarios, {len(KEYS)} arrays of '
+          f'{N_SAMPLES}x{N_TRUCKS}')
+    print(f'{"format":>12} {"write [s]":>10} {"read [s]":>10} '
+          f'{"size [MB]":>10}')
+
+    for sFormat in ('csv', 'npz', 'npz-zip'):
+        with tempfile.TemporaryDirectory() as dirname:
+            if sFormat == 'csv':
+                t_w = timeit.timeit(lambda: write_csv(dirname, l_sweep),
+                                    number=1)
+                t_r = timeit.timeit(lambda: read_csv(dirname, l_sweep, 2),
+                                    number=1)
+            else:
+                compress = sFormat == 'npz-zip'
+                t_w = timeit.timeit(
+                    lambda: write_store(dirname, l_sweep, compress),
+                    number=1)
+                t_r = timeit.timeit(lambda: read_store(dirname, 2),
+                                    number=1)
+            print(f'{sFormat:>12} {t_w:>10.3f} {t_r:>10.3f} '
+                  f'{disk_size(dirname)/1e6:>10.1f}')
@@ -0,0 +1,85 @@
+"""
+    Benchmark of the sweep engines in symuviapy.contfunc
+
+    Times one gradient iteration (forward + backward sweep) of the
+    'loop' and 'vector' engines for horizons of 50-500 samples and
+    platoons of 2-64 CAVs, and full compute_control calls for the
+    notebook case (H = 50, 8 CAVs).
+
+    Usage:
+    python bench_sweep.py [--full]
+
+    --full: also time complete compute_control calls on the whole grid
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.contfunc import compute_control, dsweep, GCAV  # noqa: E402
+
+HORIZONS = (50, 100, 200, 500)
+PLATOONS = (2, 4, 8, 16, 32, 64)
+
+
+def create_problem(h, n_veh, seed=0):
+    """ Platoon rows, leader positions and reference"""
+    rng = np.random.RandomState(seed)
+    results = [(0.0, i, 'CAV', 'In_main', 1, 0.0, -25.0 * i,
+                20.0 + rng.rand(), i-1 if i else 0,
+                30.0 + 5 * rng.rand(), 20.0 + rng.rand())
+               for i in range(n_veh)]
+    ldr_pos = [0] + list(range(n_veh-1))
+    h_ref = GCAV + 0.2 * rng.rand(h, n_veh)
+    return results, ldr_pos, h_ref
+
+
+def time_iteration(sweep, h, n_veh, number=20):
+    """ Time (s) of one forward + backward sweep"""
+    forward, backward = dsweep[sweep]
+    rng = np.random.RandomState(0)
+    S, V, DV, U, DU = (rng.rand(h, n_veh) for _ in range(5))
+    Tgref = GCAV + 0.2 * rng.rand(h, n_veh)
+
+    def run():
+        forward(S, V, DV, U, DU)
+        backward(S, V, DV, Tgref)
+
+    return min(timeit.repeat(run, number=number, repeat=3)) / number
+
+
+def time_call(sweep, h, n_veh):
+    """ Time (s) and iterations of a compute_control call"""
+    results, ldr_pos, h_ref = create_problem(h, n_veh)
+    t_0 = timeit.default_timer()
+    out = compute_control(results, h_ref, 0, ldr_pos, sweep=sweep)
+    return timeit.default_timer() - t_0, out[-1]
+
+
+if __name__ == "__main__":
+
+    print('Time per iteration [ms] (forward + backward)')
+    print(f'{"H":>5} {"N":>4} {"loop":>10} {"vector":>10} {"speedup":>8}')
+    for h in HORIZONS:
+        for n_veh in PLATOONS:
+            t_loop = time_iteration('loop', h, n_veh)
+            t_vect = time_iteration('vector', h, n_veh)
+            print(f'{h:>5} {n_veh:>4} {t_loop*1e3:>10.4f} '
+                  f'{t_vect*1e3:>10.4f} {t_loop/t_vect:>8.1f}')
+
+    grid = [(h, n) for h in HORIZONS for n in PLATOONS] \
+        if '--full' in sys.argv else [(50, 8)]
+
+    print('\nTime per compute_control call [s]')
+    print(f'{"H":>5} {"N":>4} {"iter":>6} {"loop":>10} {"vector":>10} '
+          f'{"speedup":>8}')
+    for h, n_veh in grid:
+        t_loop, n_loop = time_call('loop', h, n_veh)
+        t_vect, n_vect = time_call('vector', h, n_veh)
+        assert n_loop == n_vect
+        print(f'{h:>5} {n_veh:>4} {n_vect:>6} {t_loop:>10.4f} '
+              f'{t_vect:>10.4f} {t_loop/t_vect:>8.1f}')
@@ -0,0 +1,194 @@
+"""
+    Benchmark of the tactical layer of symuviapy.contfunc
+
+    Gap planning for 30 up to 1000 vehicles approaching the merge (30%
+    HDV): the former solve_tactical_problem (one 2x2 solve and one
+    dictionary per vehicle, CAVs allocated one by one) against
+    solve_tactical_arrays, with and without the conversion of the
+    vehicle dictionaries. Both return the same events.
+
+    Usage:
+    python bench_tactical.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.contfunc import (dveh_dwy, dveh_twy,  # noqa: E402
+                                find_anticipation_time, find_projection,
+                                solve_tactical_arrays,
+                                solve_tactical_problem, GCAV, GHDV, VF, W)
+from symuviapy.symfunc import updatelist  # noqa: E402
+
+FLEETS = (30, 100, 300, 1000)
+
+
+def create_approach(n_veh, seed=0):
+    """ Dense approach (5 m spacing, CAV tail): the gaps never overflow"""
+    rng = np.random.RandomState(seed)
+    return [{'id': i, 'type': 'HDV' if 0 < i < n_veh - 1 and rng.rand() < 0.3
+             else 'CAV',
+             'abs': 10000.0 - 5 * i - 2 * rng.rand(),
+             'vit': 20.0 + 2 * rng.rand(), 'ti': '10.0'}
+            for i in range(n_veh)]
+
+
+def solve_tactical_loop(lVehDataFormat):
+    """ Former solve_tactical_problem: 2x2 solve and dict per vehicle"""
+
+    SAFETY = 0  # Put on 0 for flow maximization
+
+    # Find Xm, Tm
+    lArrivalTimes = [(-x['abs']/x['vit'], x['id'],
+                      0.0,
+                      float(x['ti'])-x['abs']/x['vit'])
+                     for x in lVehDataFormat]
+    vehLeader = min(lArrivalTimes, key=lambda t: t[0])
+    gm = (vehLeader[2], vehLeader[3])
+
+    lProj = []
+
+    for veh in lVehDataFormat:
+        gi = (veh['abs'], float(veh['ti']))
+        pg = find_projection(gi, veh['vit'], gm, W)
+        bBoundary = True if veh['id'] == 0 or veh['type'] == 'HDV' else False
+        lProj.append((pg,
+                      veh['id'],
+                      bBoundary,
+                      dveh_twy[veh['type']],
+                      dveh_dwy[veh['type']],
+                      veh['type'],
+                      veh['abs'],
+                      float(veh['ti']),
+                      ))
+
+    keys = ('pg', 'id', 'bound', 'tau', 'd', 'type', 'abs', 'ti')
+    lProj = [dict(zip(keys, x)) for x in lProj]
+
+    # Natural order
+    lProjSort = sorted(lProj, key=lambda t: t['pg'][1])
+
+    # Find only boundaries
+    lBound = [x for x in lProjSort if x['bound']]
+
+    # CAV to allocate
+    lVehAlloc = [x for x in lProjSort if not x['bound']]
+
+    if len(lBound) > 1:
+        # Multiple boundaries
+
+        lBoundHead = lBound[0:-1]
+        lBoundTail = lBound[1:]
+        deltaT = [(x['pg'][1]-y['pg'][1])
+                  for x, y in zip(lBoundTail, lBoundHead)]
+
+        # Veh to allocate
+        lNumVehAlloc = []
+        for delta, lead in zip(deltaT, lBoundHead):
+            tau = lead['tau']
+            nveh = max((delta-(tau+SAFETY*GHDV))//GCAV+1, 0.0)
+            lNumVehAlloc.append(nveh)
+
+        nVehLast = len(lVehAlloc)-sum(lNumVehAlloc)
+        lNumVehAlloc.append(nVehLast)
+
+    else:
+        # Single Boundary
+        lNumVehAlloc = [len(lVehAlloc)]
+
+    # Find order such that matches allocation
+    newProjSort = []
+    veh2Alloc = iter(lVehAlloc)
+    addVeh = 0
+
+    for veh, number in zip(lBound, lNumVehAlloc):
+        cap = number
+
+        # Computation equilibria (Boundary)
+        pg_eq = veh['pg']
+        d_tau = pg_eq[1] - veh['pg'][1]
+        arr_t = find_projection(pg_eq, VF, gm, 0)[1]
+        t_ant, t_yld = find_anticipation_time(veh, d_tau)
+
+        # Updates for follower
+        shift_x = veh['d']
+        shift_t = veh['tau']
+
+        # Storage
+        updt_dict = {'pg_eq': pg_eq,
+                     'd_tau': d_tau,
+                     'arr_t': arr_t,
+                     'tau_f': veh['tau']+d_tau,
+                     't_ant': t_ant,
+                     't_yld': t_yld,
+                     }
+        veh = updatelist(veh, [updt_dict])
+        newProjSort.append(veh)
+        addVeh += 1
+
+        while cap > 0:
+            cav = next(veh2Alloc)
+
+            pg_ref = veh['pg'] if cap == number else \
+                newProjSort[addVeh-1]['pg_eq']
+
+            # Computation new equilibria
+            pg_eq = np.array([pg_ref[0] - shift_x, pg_ref[1] + shift_t])
+            d_tau = pg_eq[1] - cav['pg'][1]
+            arr_t = find_projection(pg_eq, VF, gm, 0)[1]
+            t_ant, t_yld = find_anticipation_time(cav, d_tau)
+
+            # Updates for follower
+            shift_x = veh['d']
+            shift_t = veh['tau']
+
+            # Storage
+            updt_dict = {'pg_eq': pg_eq,
+                         'd_tau': d_tau,
+                         'arr_t': arr_t,
+                         'tau_f': veh['tau']+d_tau,
+                         't_ant': t_ant,
+                         't_yld': t_yld,
+                         }
+            cav = updatelist(cav, [updt_dict])
+            newProjSort.append(cav)
+            addVeh += 1
+            cap = cap - 1
+
+    # Create event dictionary
+
+    d_ev = {np.round(x['t_yld'], 1): (x['id'],
+                                      x['tau'],
+                                      x['tau_f'],
+                                      x['t_ant'])
+            for x in lProj if x['type'] == 'CAV'}
+
+    return d_ev
+
+
+if __name__ == "__main__":
+
+    print('Time of one tactical plan [ms]')
+    print(f'{"N":>6} {"loop":>9} {"arrays":>9} {"+ dicts":>9} '
+          f'{"speedup":>8}')
+    for n_veh in FLEETS:
+        lVeh = create_approach(n_veh)
+        dRef = solve_tactical_loop(lVeh)
+        dEvent = solve_tactical_problem(lVeh)
+        assert list(dRef) == list(dEvent)
+        assert np.allclose(list(dRef.values()), list(dEvent.values()))
+        lArrays = list(zip(*((x['id'], x['type'], x['abs'], x['vit'],
+                              float(x['ti'])) for x in lVeh)))
+        number = max(2000 // n_veh, 1)
+        t_loop, t_arrays, t_dicts = (
+            min(timeit.repeat(func, number=number, repeat=3)) / number
+            for func in (lambda: solve_tactical_loop(lVeh),
+                         lambda: solve_tactical_arrays(*lArrays),
+                         lambda: solve_tactical_problem(lVeh)))
+        print(f'{n_veh:>6} {t_loop * 1e3:>9.3f} {t_arrays * 1e3:>9.3f} '
+              f'{t_dicts * 1e3:>9.3f} {t_loop / t_dicts:>8.1f}')
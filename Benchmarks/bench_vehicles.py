@@ -0,0 +1,87 @@
+"""
+    Memory per vehicle of Operational/models.py
+
+    Former layout (every Vehicle copies the simulation and vehicle
+    parameters in its own __dict__ and wraps its dynamic in its own
+    VehDynamic) against the slot-based Vehicle referencing shared,
+    interned parameter sets. Measured with tracemalloc for 100 up to
+    100000 vehicles, with and without their VehNetwork.
+
+    Usage:
+    python bench_vehicles.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Operational'))
+
+from models import dynamic_3rd, Vehicle, VehNetwork  # noqa: E402
+from parameters import SimParameter, VehParameter  # noqa: E402
+
+FLEETS = (100, 1000, 10000, 100000)
+
+
+class DictDynamic:
+    """ Former VehDynamic: one instance per vehicle"""
+
+    def __init__(self, veh_dyn):
+        self.veh_dyn = veh_dyn
+
+
+class DictVehicle:
+    """ Former Vehicle: parameters recomputed in each instance"""
+
+    def __init__(self, sim_par, veh_par, veh_dyn):
+        for par in (sim_par, veh_par):
+            for name, value in par.as_dict().items():
+                setattr(self, name,
+                        value * 1.0 if isinstance(value, float) else value)
+        self.veh_id = None
+        self.veh_dyn = DictDynamic(veh_dyn)
+        self.veh_type = None
+        self.veh_clane = None
+        self.veh_clink = None
+        self.veh_cstat = None
+        self.veh_ccord = None
+
+
+def measure(create):
+    """ Bytes and seconds per vehicle to build a fleet"""
+    tracemalloc.start()
+    t_0 = time.perf_counter()
+    fleet = create()
+    t_build = time.perf_counter() - t_0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, t_build, fleet
+
+
+if __name__ == "__main__":
+
+    print('Memory [B/vehicle] and construction time [us/vehicle]')
+    print(f'{"N":>7} {"former":>8} {"slots":>8} {"network":>8} '
+          f'{"former us":>10} {"slots us":>9}')
+    for n_veh in FLEETS:
+        def former():
+            return [DictVehicle(SimParameter(), VehParameter(cpcty=0.8),
+                                dynamic_3rd) for _ in range(n_veh)]
+
+        def slots():
+            return [Vehicle(SimParameter(), VehParameter(cpcty=0.8),
+                            dynamic_3rd) for _ in range(n_veh)]
+
+        def network():
+            return VehNetwork(SimParameter(), slots())
+
+        s_former, t_former, fleet = measure(former)
+        del fleet
+        s_slots, t_slots, fleet = measure(slots)
+        del fleet
+        s_network, _, fleet = measure(network)
+        del fleet
+        print(f'{n_veh:>7} {s_former / n_veh:>8.0f} {s_slots / n_veh:>8.0f} '
+              f'{s_network / n_veh:>8.0f} {t_former / n_veh * 1e6:>10.2f} '
+              f'{t_slots / n_veh * 1e6:>9.2f}')
@@ -0,0 +1,69 @@
+"""
+    Benchmark of the trajectory database writes
+
+    Inserts the rows of a simulation (one insert per step into the
+    closed table) with:
+
+    sqlalchemy: insert() committed at every step (notebooks)
+    writer:     symuviapy.writer.TrajectoryWriter
+
+    Reports the time spent by the simulation loop in the write calls
+    and the total time until the data is on disk.
+
+    Usage:
+    python bench_writer.py [n_steps] [n_veh]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from sqlalchemy import create_engine, MetaData, insert
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.writer import TrajectoryWriter, create_tables  # noqa: E402
+from symuviapy.test_writer import create_step  # noqa: E402
+
+
+def run_sqlalchemy(path, l_steps):
+    engine = create_engine('sqlite:///' + path)
+    with engine.begin() as connection:
+        create_tables(connection.connection.driver_connection)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    closed = metadata.tables['closed']
+    stmt = insert(closed)
+    t_0 = timeit.default_timer()
+    for lRows in l_steps:
+        with engine.begin() as connection:
+            connection.execute(stmt, lRows)
+    t_loop = timeit.default_timer() - t_0
+    engine.dispose()
+    return t_loop, t_loop
+
+
+def run_writer(path, l_steps):
+    t_0 = timeit.default_timer()
+    writer = TrajectoryWriter(path)
+    for lRows in l_steps:
+        writer.write('closed', lRows)
+    t_loop = timeit.default_timer() - t_0
+    writer.close()
+    return t_loop, timeit.default_timer() - t_0
+
+
+if __name__ == "__main__":
+
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    n_veh = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    l_steps = [create_step(k / 10, n_veh) for k in range(n_steps)]
+
+    print(f'{n_steps} steps x {n_veh} vehicles')
+    print(f'{"writer":>12} {"loop [s]":>10} {"total [s]":>10}')
+    for name, run in (('sqlalchemy', run_sqlalchemy), ('writer', run_writer)):
+        with tempfile.TemporaryDirectory() as dirname:
+            t_loop, t_total = run(os.path.join(dirname, 'SymOut.sqlite'),
+                                  l_steps)
+        print(f'{name:>12} {t_loop:>10.3f} {t_total:>10.3f}')
@@ -1,7 +1,7 @@
 import numpy as np
 import pandas as pd
 
-from symuviapy.symfunc import updatelist
+from symuviapy.engines import dengine
 
 DT = 0.1  # Sample time
 
@@ -22,6 +22,11 @@ dveh_dwy = {'CAV': 1/KC, 'HDV': 1/KH}
 U_MAX = 1.5  # Max. Acceleration
 U_MIN = -1.5  # Min. Acceleration
 
+# Control
+C1 = 0.1  # Control weight space
+C2 = 1  # Control weight speed difference
+C3 = 0.5  # Control weight control
+
 # Imposed leadership
 dveh_ldr = {0: 0, 1: 0, 2: 1, 3: 2, 5: 3, 6: 5, 8: 6, 9: 8}
 dveh_idx = {0: 0, 1: 1, 2: 2, 3: 3, 5: 4, 6: 5, 8: 6, 9: 7}
@@ -85,9 +90,170 @@ def format_reference(h_ref):
     return refMat
 
 
-def compute_control(results, h_ref, u_lead, lPlatoonLdr=None):
+def forward_evolution_loop(S, V, DV, U_star, DU):
+    """ Forward state evolution (sample by sample)
+    """
+    h = len(S)
+    for i, u_s, du in zip(range(h), U_star, DU):
+        if i < len(S)-1:
+            DV[i+1] = DV[i] + DT * du
+            S[i+1] = S[i] + DT * DV[i]
+            V[i+1] = V[i] + DT * u_s
+    return S, V, DV
+
+
+def backward_evolution_loop(S, V, DV, Tgref):
+    """ Backward costate evolution (sample by sample)
+    """
+    ls = np.zeros(S.shape)
+    lv = np.zeros(S.shape)
+    for i, s, v, dv, tg in reversedEnumerate(S, V, DV, Tgref):
+        if i > 0:
+            sref = v * tg + 1/KC
+            lv[i-1] = lv[i] + DT * \
+                (-2 * C1 * (s-sref) * tg - C2 * dv - ls[i])
+            ls[i-1] = ls[i] + DT * (2 * C1 * (s-sref))
+    return ls, lv
+
+
+def reversedCumsum(X):
+    """ Cumulative sum from the end of the horizon
+        (costate recursion with zero terminal value)
+    """
+    return np.flip(np.cumsum(np.flip(X, axis=0), axis=0), axis=0)
+
+
+def forward_evolution(S, V, DV, U_star, DU):
+    """ Forward state evolution over the whole horizon
+
+        Same recursion as forward_evolution_loop written as
+        cumulative sums, summation order is kept so results
+        are identical.
+    """
+    DV[:] = np.cumsum(np.concatenate((DV[:1], DT * DU[:-1])), axis=0)
+    V[:] = np.cumsum(np.concatenate((V[:1], DT * U_star[:-1])), axis=0)
+    S[:] = np.cumsum(np.concatenate((S[:1], DT * DV[:-1])), axis=0)
+    return S, V, DV
+
+
+def backward_evolution(S, V, DV, Tgref, mask=None):
+    """ Backward costate evolution over the whole horizon
+
+        Same recursion as backward_evolution_loop written as
+        reversed cumulative sums.
+
+        mask: optional 0/1 array removing padded samples/vehicles
+              from the cost (batched problems)
+    """
+    Tgref = np.asarray(Tgref)
+    ls = np.zeros(S.shape)
+    lv = np.zeros(S.shape)
+    es = S - (V * Tgref + 1/KC)
+    if mask is not None:
+        es = es * mask
+        DV = DV * mask
+    ls[:-1] = reversedCumsum(DT * (2 * C1 * es[1:]))
+    lv[:-1] = reversedCumsum(
+        DT * (-2 * C1 * es[1:] * Tgref[1:] - C2 * DV[1:] - ls[1:]))
+    return ls, lv
+
+
+# Sweep engines (forward, backward)
+dsweep = {'loop': (forward_evolution_loop, backward_evolution_loop),
+          'vector': (forward_evolution, backward_evolution)}
+
+
+class SolverState:
+    """
+    Receding horizon solver state
+
+    SolverState(check = bool)
+
+    Keeps the costates (Ls, Lv) of the last solved horizon. The next
+    horizon overlaps the previous one by h-1 samples, so the costates
+    are shifted by one sample and used as initial guess. A change in
+    the problem dimensions (platoon composition) falls back to a cold
+    start.
+
+    check: also solve every warm started sample from zero costates to
+           measure the iterations saved (diagnostics only)
+
+    Stored values:
+
+    l_iter : iterations per call
+    l_warm : True if the call was warm started
+    l_cold : iterations of the cold solve (check = True)
+    """
+
+    def __init__(self, check=False):
+        self.check = check
+        self.Ls = None
+        self.Lv = None
+        self.l_iter = []
+        self.l_warm = []
+        self.l_cold = []
+
+    def initial_guess(self, dims):
+        """ Shifted costates of the previous horizon, zeros otherwise
+        """
+        if self.Ls is None or self.Ls.shape != tuple(dims):
+            return np.zeros(dims), np.zeros(dims), False
+        Ls = np.zeros(dims)
+        Lv = np.zeros(dims)
+        Ls[:-1] = self.Ls[1:]
+        Lv[:-1] = self.Lv[1:]
+        return Ls, Lv, True
+
+    def update(self, Ls, Lv, n, bWarm, n_cold=None):
+        """ Store costates of the solved horizon
+        """
+        self.Ls = Ls
+        self.Lv = Lv
+        self.l_iter.append(n)
+        self.l_warm.append(bWarm)
+        self.l_cold.append(n if not bWarm else n_cold)
+
+    def reset(self):
+        """ Forget the stored costates (next call is a cold start)
+        """
+        self.Ls = None
+        self.Lv = None
+
+    @property
+    def iterations_saved(self):
+        """ Iterations saved by warm starting
+
+            Measured when check = True, otherwise estimated by
+            comparing each warm call with the average iteration
+            count of the cold started calls.
+        """
+        if self.check:
+            return sum(c - n for n, c in zip(self.l_iter, self.l_cold))
+        n_cold = [n for n, b in zip(self.l_iter, self.l_warm) if not b]
+        n_warm = [n for n, b in zip(self.l_iter, self.l_warm) if b]
+        if not n_cold:
+            return 0
+        return int(round(np.mean(n_cold) * len(n_warm) - sum(n_warm)))
+
+    def __str__(self):
+        n_warm = sum(self.l_warm)
+        return (f"{self.__class__.__name__}(calls= {len(self.l_iter)}, "
+                f"warm= {n_warm}, iterations= {sum(self.l_iter)}, "
+                f"saved= {self.iterations_saved})")
+
+
+def compute_control(results, h_ref, u_lead, lPlatoonLdr=None,
+                    sweep='vector', state=None, engine='relax'):
+    """ Computes the platoon control for the horizon h_ref
+
+        sweep:  'vector' (default) or 'loop' evolution engine
+        state:  SolverState, warm starts from the previous horizon
+        engine: costate update, 'relax' (default), 'adaptive',
+                'nesterov' or 'anderson' (see symuviapy.engines)
+    """
 
     _, Tgref, S, V, DV, Ls, Lv = initial_setup_mpc(results, h_ref)
+    forward, backward = dsweep[sweep]
 
     # Static leadership
     if lPlatoonLdr is not None:
@@ -98,25 +264,27 @@ def compute_control(results, h_ref, u_lead, lPlatoonLdr=None):
     S0 = [s[9] for s in results if s[2] == 'CAV']
     V0 = [v[7] for v in results if v[2] == 'CAV']
     DV0 = [dv[10]-dv[7] for dv in results if dv[2] == 'CAV']
-    U_ext = Lv
+    U_ext = np.zeros(Lv.shape)
     # U_ext[:,0] = u_lead # Head acceleration (external)
 
     # Initialize global variables
     S[0] = S0
     V[0] = V0
     DV[0] = DV0
-    h = len(S)
     n = 0
     n_prev = 0
 
+    # Initial guess
+    bWarm = False
+    if state is not None:
+        Ls, Lv, bWarm = state.initial_guess(Lv.shape)
+
     # Parameters
-    C1 = 0.1
-    C2 = 1
-    C3 = 0.5
     ALPHA = 0.01
-    1
     EPS = 0.1
     error = 100
+    update = dengine[engine](ALPHA)
+    L = np.stack((Ls, Lv))
 
     bSuccess = 2
     N = 100001  # number of iterations
@@ -125,43 +293,26 @@ def compute_control(results, h_ref, u_lead, lPlatoonLdr=None):
     while (error > EPS) and (bSuccess > 0):
         try:
             next(step)
-            U_star = -Lv/(2*C3)
+            U_star = -L[1]/(2*C3)
             U_star = np.clip(U_star, U_MIN, U_MAX)
 
             DU = U_star[:, ldr_pos]-U_star[:] + U_ext
 
             # Forward evolution
-            for i, u_s, du in zip(range(h), U_star, DU):
-                if i < len(S)-1:
-                    DV[i+1] = DV[i] + DT * du
-                    S[i+1] = S[i] + DT * DV[i]
-                    V[i+1] = V[i] + DT * u_s
-
-            print(V.shape, Tgref.shape)
-            Sref = V * Tgref + 1/KC
+            S, V, DV = forward(S, V, DV, U_star, DU)
 
             # Forward plots
             # plot_forward(Sref, Tgref, S, V, DV, U_star)
 
-            ls = np.zeros(Ls.shape)
-            lv = np.zeros(Lv.shape)
-
             # Backward evolution
-            for i, s, v, dv, tg in reversedEnumerate(S, V, DV, Tgref):
-                if i > 0:
-                    sref = v * tg + 1/KC
-                    lv[i-1] = lv[i] + DT * \
-                        (-2 * C1 * (s-sref) * tg - C2 * dv - ls[i])
-                    ls[i-1] = ls[i] + DT * (2 * C1 * (s-sref))
+            ls, lv = backward(S, V, DV, Tgref)
 
             # Update
-            Ls = (1 - ALPHA) * Ls + ALPHA * ls
-            Lv = (1 - ALPHA) * Lv + ALPHA * lv
+            L, error = update.update(L, np.stack((ls, lv)))
 
             # Backwards plots
             # plot_backwards(ls, lv, Ls, Lv)
 
-            error = np.linalg.norm(Ls - ls) + np.linalg.norm(Lv-lv)
             # print(f'Iteration: {n}, Error: {error}')
 
             # Routine for changing convergence parameter
@@ -169,7 +320,7 @@ def compute_control(results, h_ref, u_lead, lPlatoonLdr=None):
             if error > 10e5:
                 raise AssertionError('Algorithm does not converge ')
             if n >= 500:
-                ALPHA = max(ALPHA - 0.01, 0.01)
+                update.stall()
                 #print(f'Reaching {n} iterations: Reducing alpha: {ALPHA}')
                 #print(f'Error before update {error}')
                 if n > 10000:
@@ -188,9 +339,116 @@ def compute_control(results, h_ref, u_lead, lPlatoonLdr=None):
             bSuccess = 0
 
     n = n + n_prev
+    if state is not None:
+        n_cold = None
+        if bWarm and state.check:
+            n_cold = compute_control(results, h_ref, u_lead, lPlatoonLdr,
+                                     sweep, engine=engine)[-1]
+        state.update(L[0], L[1], n, bWarm, n_cold)
     return (S, V, DV, U_star, DU, n)
 
 
+def initial_setup_batch(l_results, l_h_ref, l_ldr_pos=None):
+    """ Stack several platoon problems into one padded problem
+
+        Arrays are (horizon, platoon, vehicle) so the sweep
+        engines work unchanged along the first axis.
+    """
+    if l_ldr_pos is None:
+        l_ldr_pos = [None] * len(l_results)
+
+    l_h_ref = [np.asarray(h_ref) for h_ref in l_h_ref]
+    n_plt = len(l_results)
+    h = max(h_ref.shape[0] for h_ref in l_h_ref)
+    n_veh = max(h_ref.shape[1] for h_ref in l_h_ref)
+    dims = (h, n_plt, n_veh)
+
+    Tgref = np.zeros(dims)
+    mask = np.zeros(dims)
+    S, V, DV = (np.zeros(dims) for _ in range(3))
+    ldr_pos = np.tile(np.arange(n_veh), (n_plt, 1))
+
+    for b, (results, h_ref, ldr) in enumerate(zip(l_results, l_h_ref,
+                                                   l_ldr_pos)):
+        h_b, n_b = h_ref.shape
+        if ldr is None:
+            ldr, _ = find_idx_ldr(results)
+        Tgref[:h_b, b, :n_b] = h_ref
+        mask[:h_b, b, :n_b] = 1
+        ldr_pos[b, :n_b] = ldr
+        S[0, b, :n_b] = [s[9] for s in results if s[2] == 'CAV']
+        V[0, b, :n_b] = [v[7] for v in results if v[2] == 'CAV']
+        DV[0, b, :n_b] = [dv[10]-dv[7] for dv in results if dv[2] == 'CAV']
+
+    return Tgref, mask, ldr_pos, S, V, DV
+
+
+def compute_control_batch(l_results, l_h_ref, l_ldr_pos=None):
+    """ Computes the control of several platoons in one problem
+
+        l_results: list of platoon rows (as in compute_control)
+        l_h_ref:   list of references (h_b x n_b), horizons may differ
+        l_ldr_pos: list of leader positions (None: find_idx_ldr)
+
+        Platoons are padded to a common (H, B, N) problem and
+        iterated together, each platoon is retired as soon as it
+        converges. Returns one (S, V, DV, U_star, DU, n) tuple
+        per platoon, as compute_control does.
+    """
+    Tgref, mask, ldr_pos, S, V, DV = initial_setup_batch(l_results,
+                                                         l_h_ref,
+                                                         l_ldr_pos)
+    dims = [np.asarray(h_ref).shape for h_ref in l_h_ref]
+    Ls = np.zeros(S.shape)
+    Lv = np.zeros(S.shape)
+
+    # Parameters
+    ALPHA = 0.01
+    EPS = 0.1
+    N = 100001  # number of iterations
+
+    active = np.arange(len(dims))
+    n = np.zeros(len(dims), dtype=int)
+    l_out = [None] * len(dims)
+
+    while active.size:
+        U_star = np.clip(-Lv/(2*C3), U_MIN, U_MAX)
+        DU = np.take_along_axis(U_star, ldr_pos[None], axis=2) - U_star
+
+        # Forward evolution
+        S, V, DV = forward_evolution(S, V, DV, U_star, DU)
+
+        # Backward evolution
+        ls, lv = backward_evolution(S, V, DV, Tgref, mask)
+
+        # Update
+        Ls = (1 - ALPHA) * Ls + ALPHA * ls
+        Lv = (1 - ALPHA) * Lv + ALPHA * lv
+
+        error = np.sqrt(np.sum((Ls - ls)**2, axis=(0, 2))) + \
+            np.sqrt(np.sum((Lv - lv)**2, axis=(0, 2)))
+        n += 1
+
+        if np.any(error > 10e5):
+            raise AssertionError('Algorithm does not converge ')
+
+        # Retire converged platoons
+        bDone = (error <= EPS) | (n[active] >= N)
+        if np.any(bDone):
+            for j in np.flatnonzero(bDone):
+                b = active[j]
+                h_b, n_b = dims[b]
+                l_out[b] = tuple(x[:h_b, j, :n_b].copy()
+                                 for x in (S, V, DV, U_star, DU)) + (n[b],)
+            keep = ~bDone
+            active = active[keep]
+            Tgref, mask, S, V, DV, Ls, Lv = (
+                x[:, keep] for x in (Tgref, mask, S, V, DV, Ls, Lv))
+            ldr_pos = ldr_pos[keep]
+
+    return l_out
+
+
 def determine_lane_change(CAVabsP):
     """ Returns the tuple (tron, voie) for a 
         CAV vehicle based on positions updates.
@@ -345,136 +603,125 @@ def find_anticipation_time(veh, d_tau):
     return T_a, T_y
 
 
-def solve_tactical_problem(lVehDataFormat):
-    """
-        Create a dictionary indicating the trigger time as a key     
+def find_projections(aX, aT, aV, gm, W):
+    """ Projections of points (aX, aT) at speeds aV over a point gm
+        at speed -W (find_projection in closed form, for arrays)
     """
+    Xm, Tm = gm
+    b1 = Xm + W * Tm
+    aT = (b1 - (aX - aV * aT)) / (W + aV)
+    return b1 - W * aT, aT
+
 
+def solve_tactical_arrays(aId, aType, aAbs, aVit, aTi):
+    """ Tactical problem over arrays of vehicles
+
+        Same allocation as solve_tactical_problem: CAVs sorted by
+        projection time are allocated to the gaps behind the
+        boundaries (id 0 and HDVs), counts from the cumulative sum
+        of the boundary gaps, equilibria from a cumulative sum of
+        the boundary headways. The counts are clamped to the CAVs
+        available: the first gaps are filled, the next ones get the
+        remaining CAVs or none.
+
+        Returns the event table: a dictionary of arrays, one row
+        per vehicle in the input order (see tactical_events).
+    """
     SAFETY = 0  # Put on 0 for flow maximization
 
+    aId = np.asarray(aId)
+    aType = np.asarray(aType)
+    aAbs, aVit, aTi = (np.asarray(x, dtype=float) for x in (aAbs, aVit,
+                                                             aTi))
+    n_veh = len(aId)
+    aTau = np.empty(n_veh)
+    aD = np.empty(n_veh)
+    for sType in np.unique(aType):
+        aTau[aType == sType] = dveh_twy[sType]
+        aD[aType == sType] = dveh_dwy[sType]
+
     # Find Xm, Tm
-    lArrivalTimes = [(-x['abs']/x['vit'], x['id'],
-                      0.0,
-                      float(x['ti'])-x['abs']/x['vit']) for x in lVehDataFormat]
-    vehLeader = min(lArrivalTimes, key=lambda t: t[0])
-    gm = (vehLeader[2], vehLeader[3])
-
-    lProj = []
-
-    for veh in lVehDataFormat:
-        gi = (veh['abs'], float(veh['ti']))
-        pg = find_projection(gi, veh['vit'], gm, W)
-        bBoundary = True if veh['id'] == 0 or veh['type'] == 'HDV' else False
-        lProj.append((pg,
-                      veh['id'],
-                      bBoundary,
-                      dveh_twy[veh['type']],
-                      dveh_dwy[veh['type']],
-                      veh['type'],
-                      veh['abs'],
-                      float(veh['ti']),
-                      ))
-
-    keys = ('pg', 'id', 'bound', 'tau', 'd', 'type', 'abs', 'ti')
-    lProj = [dict(zip(keys, x)) for x in lProj]
-
-    # Natural order
-    lProjSort = sorted(lProj, key=lambda t: t['pg'][1])
-
-    # Find only boundaries
-    lBound = [x for x in lProjSort if x['bound']]
-
-    # CAV to allocate
-    lVehAlloc = [x for x in lProjSort if not x['bound']]
-
-    if len(lBound) > 1:
-        # Multiple boundaries
-
-        lBoundHead = lBound[0:-1]
-        lBoundTail = lBound[1:]
-        deltaT = [(x['pg'][1]-y['pg'][1])
-                  for x, y in zip(lBoundTail, lBoundHead)]
-
-        # Veh to allocate
-        lNumVehAlloc = []
-        for delta, lead in zip(deltaT, lBoundHead):
-            tau = lead['tau']
-            nveh = max((delta-(tau+SAFETY*GHDV))//GCAV+1, 0.0)
-            lNumVehAlloc.append(nveh)
-
-        nVehLast = len(lVehAlloc)-sum(lNumVehAlloc)
-        lNumVehAlloc.append(nVehLast)
+    iLeader = np.argmin(-aAbs / aVit)
+    gm = (0.0, aTi[iLeader] - aAbs[iLeader] / aVit[iLeader])
+    aPgX, aPgT = find_projections(aAbs, aTi, aVit, gm, W)
+
+    # Natural order, boundaries and CAV to allocate
+    bBound = (aId == 0) | (aType == 'HDV')
+    iSort = np.argsort(aPgT, kind='stable')
+    iBound = iSort[bBound[iSort]]
+    iAlloc = iSort[~bBound[iSort]]
+    if not len(iBound):
+        raise ValueError('No boundary vehicle (id 0 or HDV)')
+
+    # Veh to allocate behind each boundary, last one takes the rest
+    aNum = np.maximum((np.diff(aPgT[iBound])
+                       - (aTau[iBound[:-1]] + SAFETY * GHDV)) // GCAV + 1,
+                      0.0).astype(int)
+    aCum = np.minimum(np.cumsum(np.append(aNum, len(iAlloc))),
+                      len(iAlloc))
+    aCum[-1] = len(iAlloc)
+    iOwner = np.searchsorted(aCum, np.arange(len(iAlloc)), side='right')
+    aRank = np.arange(len(iAlloc)) - np.append(0, aCum[:-1])[iOwner] + 1
+
+    # Equilibria: boundary projection shifted by its headway per rank
+    # (one row per boundary with CAVs, summed in the order of the loop)
+    aOwned, iRow = np.unique(iBound[iOwner], return_inverse=True)
+    n_max = int(aRank.max(initial=0))
+    mX = np.empty((len(aOwned), n_max + 1))
+    mT = np.empty((len(aOwned), n_max + 1))
+    mX[:, 0], mX[:, 1:] = aPgX[aOwned], -aD[aOwned, None]
+    mT[:, 0], mT[:, 1:] = aPgT[aOwned], aTau[aOwned, None]
+    mX, mT = np.cumsum(mX, axis=1), np.cumsum(mT, axis=1)
+
+    iLdr = np.arange(n_veh)
+    iLdr[iAlloc] = iBound[iOwner]
+    aEqX, aEqT = aPgX.copy(), aPgT.copy()
+    aEqX[iAlloc] = mX[iRow, aRank]
+    aEqT[iAlloc] = mT[iRow, aRank]
+
+    aDTau = aEqT - aPgT
+    _, aArrT = find_projections(aEqX, aEqT, VF, gm, 0)
+    aTAnt, aTYld = find_anticipation_time({'tau': aTau, 'ti': aTi,
+                                           'abs': aAbs}, aDTau)
+
+    # Position in the new order: boundary followed by its CAVs
+    aOrder = np.empty(n_veh, dtype=int)
+    aOrder[iBound] = np.append(0, aCum[:-1]) + np.arange(len(iBound))
+    aOrder[iAlloc] = np.arange(len(iAlloc)) + iOwner + 1
+
+    return {'id': aId, 'type': aType, 'bound': bBound,
+            'pg': np.column_stack((aPgX, aPgT)),
+            'pg_eq': np.column_stack((aEqX, aEqT)),
+            'ldr': iLdr, 'order': aOrder,
+            'd_tau': aDTau, 'arr_t': aArrT, 'tau': aTau,
+            'tau_f': aTau[iLdr] + aDTau, 't_ant': aTAnt, 't_yld': aTYld}
+
+
+def tactical_events(dTable):
+    """ Event dictionary of solve_tactical_problem from an event table:
+        rounded yield time -> (id, tau, tau_f, t_ant) of each CAV
+    """
+    lCAV = np.flatnonzero(dTable['type'] == 'CAV')
+    lKeys = np.round(dTable['t_yld'][lCAV], 1)
+    lValues = zip(dTable['id'][lCAV].tolist(), dTable['tau'][lCAV].tolist(),
+                  dTable['tau_f'][lCAV], dTable['t_ant'][lCAV])
+    return dict(zip(lKeys, lValues))
 
-    else:
-        # Single Boundary
-        lNumVehAlloc = [len(lVehAlloc)]
-
-    # Find order such that matches allocation
-    newProjSort = []
-    veh2Alloc = iter(lVehAlloc)
-    addVeh = 0
-
-    for veh, number in zip(lBound, lNumVehAlloc):
-        cap = number
-
-        # Computation equilibria (Boundary)
-        pg_eq = veh['pg']
-        d_tau = pg_eq[1] - veh['pg'][1]
-        arr_t = find_projection(pg_eq, VF, gm, 0)[1]
-        t_ant, t_yld = find_anticipation_time(veh, d_tau)
-
-        # Updates for follower
-        shift_x = veh['d']
-        shift_t = veh['tau']
-
-        # Storage
-        updt_dict = {'pg_eq': pg_eq,
-                     'd_tau': d_tau,
-                     'arr_t': arr_t,
-                     'tau_f': veh['tau']+d_tau,
-                     't_ant': t_ant,
-                     't_yld': t_yld,
-                     }
-        veh = updatelist(veh, [updt_dict])
-        newProjSort.append(veh)
-        addVeh += 1
-
-        while cap > 0:
-            cav = next(veh2Alloc)
-
-            pg_ref = veh['pg'] if cap == number else newProjSort[addVeh-1]['pg_eq']
-
-            # Computation new equilibria
-            pg_eq = np.array([pg_ref[0] - shift_x, pg_ref[1] + shift_t])
-            d_tau = pg_eq[1] - cav['pg'][1]
-            arr_t = find_projection(pg_eq, VF, gm, 0)[1]
-            t_ant, t_yld = find_anticipation_time(cav, d_tau)
-
-            # Updates for follower
-            shift_x = veh['d']
-            shift_t = veh['tau']
-
-            # Storage
-            updt_dict = {'pg_eq': pg_eq,
-                         'd_tau': d_tau,
-                         'arr_t': arr_t,
-                         'tau_f': veh['tau']+d_tau,
-                         't_ant': t_ant,
-                         't_yld': t_yld,
-                         }
-            cav = updatelist(cav, [updt_dict])
-            newProjSort.append(cav)
-            addVeh += 1
-            cap = cap - 1
-
-    # Create event dictionary
-
-    d_ev = {np.round(x['t_yld'], 1): (x['id'],
-                                      x['tau'],
-                                      x['tau_f'],
-                                      x['t_ant']) for x in lProj if x['type'] == 'CAV'}
-
-    return d_ev
+
+def solve_tactical_problem(lVehDataFormat):
+    """
+        Create a dictionary indicating the trigger time as a key     
+
+        When the gaps hold more CAVs than available, they are
+        filled in order and the last gaps stay empty (see
+        solve_tactical_arrays); the loop of the notebooks raised
+        StopIteration in this case.
+    """
+    aId, aType, aAbs, aVit, aTi = zip(*((x['id'], x['type'], x['abs'],
+                                         x['vit'], float(x['ti']))
+                                        for x in lVehDataFormat))
+    return tactical_events(solve_tactical_arrays(aId, aType, aAbs, aVit,
+                                                 aTi))
 
 
 def headway_reference(gap_events):
@@ -0,0 +1,164 @@
+"""
+    Update rules (engines) for the costate fixed point iteration
+    of the MPC solver.
+
+    One iteration of the solver evaluates the fixed point map G
+    (forward state sweep + backward costate sweep) at the iterate
+    X = (Ls, Lv). An engine receives X and G(X) and returns the next
+    iterate together with the error compared against EPS.
+
+    All engines use the stopping rule of the original solvers: the
+    error is ||X_next - G(X)|| (fp_error), measured after the update,
+    so iteration counts and accuracy are comparable across engines.
+    The residual ||G(X) - X|| only drives the adaptive step sizes.
+
+    Engines:
+
+    relax:      fixed relaxation (1 - alpha) X + alpha G(X)
+    adaptive:   relaxation with adaptive step size
+    nesterov:   relaxation with Nesterov momentum, adaptive step size
+                and restart when the residual increases
+    anderson:   Anderson acceleration with adaptive damping
+"""
+
+import numpy as np
+
+
+def fp_error(X, GX):
+    """ Error between costates ||Ls - ls|| + ||Lv - lv||"""
+    return np.linalg.norm(X[0] - GX[0]) + np.linalg.norm(X[1] - GX[1])
+
+
+class Relaxation:
+    """
+    Fixed relaxation
+
+    Relaxation(alpha = float)
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+
+    def update(self, X, GX):
+        X = (1 - self.alpha) * X + self.alpha * GX
+        return X, fp_error(X, GX)
+
+    def stall(self):
+        """ Called when the solver stalls, reduces the step"""
+        self.alpha = max(self.alpha - 0.01, 0.01)
+
+
+class AdaptiveRelaxation(Relaxation):
+    """
+    Relaxation with adaptive step size
+
+    AdaptiveRelaxation(alpha = float, alpha_max = float)
+
+    The step grows while the residual ||G(X) - X|| decreases and is
+    halved (down to ALPHA_MIN) when it increases.
+    """
+    GROW = 1.1
+    SHRINK = 0.5
+    ALPHA_MIN = 1e-3
+
+    def __init__(self, alpha: float = 0.01, alpha_max: float = 0.5):
+        super().__init__(alpha)
+        self.alpha_max = alpha_max
+        self.error = np.inf
+
+    def adapt(self, error):
+        """ Updates the step size, True if the residual increased"""
+        bIncrease = error > self.error
+        if bIncrease:
+            self.alpha = max(self.alpha * self.SHRINK, self.ALPHA_MIN)
+        else:
+            self.alpha = min(self.alpha * self.GROW, self.alpha_max)
+        self.error = error
+        return bIncrease
+
+    def update(self, X, GX):
+        self.adapt(fp_error(X, GX))
+        X = X + self.alpha * (GX - X)
+        return X, fp_error(X, GX)
+
+    def stall(self):
+        """ Step size is already adapted"""
+
+
+class Nesterov(AdaptiveRelaxation):
+    """
+    Relaxation with Nesterov momentum
+
+    Nesterov(alpha = float, alpha_max = float)
+
+    Momentum is restarted whenever the residual increases.
+    """
+    GROW = 1.05
+
+    def __init__(self, alpha: float = 0.01, alpha_max: float = 0.5):
+        super().__init__(alpha, alpha_max)
+        self.X_prev = None
+        self.t = 1.0
+
+    def update(self, X, GX):
+        if self.adapt(fp_error(X, GX)):
+            self.X_prev = None
+            self.t = 1.0
+        X_new = X + self.alpha * (GX - X)
+        t_new = (1 + np.sqrt(1 + 4 * self.t ** 2)) / 2
+        if self.X_prev is not None:
+            X_next = X_new + (self.t - 1) / t_new * (X_new - self.X_prev)
+        else:
+            X_next = X_new
+        self.X_prev = X_new
+        self.t = t_new
+        return X_next, fp_error(X_next, GX)
+
+
+class Anderson(AdaptiveRelaxation):
+    """
+    Anderson acceleration
+
+    Anderson(alpha = float, alpha_max = float, m = int)
+
+    Mixes the last m iterates, alpha is the damping of the mixing
+    step. History is dropped and damping halved when the residual
+    increases.
+    """
+
+    def __init__(self, alpha: float = 0.01, alpha_max: float = 0.3,
+                 m: int = 5):
+        super().__init__(alpha, alpha_max)
+        self.m = m
+        self.l_dX = []
+        self.l_dF = []
+        self.X_prev = None
+        self.F_prev = None
+
+    def update(self, X, GX):
+        x = X.ravel()
+        f = (GX - X).ravel()
+
+        if self.adapt(fp_error(X, GX)):
+            self.l_dX, self.l_dF = [], []
+        elif self.X_prev is not None:
+            self.l_dX = (self.l_dX + [x - self.X_prev])[-self.m:]
+            self.l_dF = (self.l_dF + [f - self.F_prev])[-self.m:]
+        self.X_prev, self.F_prev = x, f
+
+        x_next = x + self.alpha * f
+        if self.l_dF:
+            dX = np.array(self.l_dX).T
+            dF = np.array(self.l_dF).T
+            gamma = np.linalg.lstsq(dF, f, rcond=None)[0]
+            x_next = x_next - (dX + self.alpha * dF) @ gamma
+
+        X_next = x_next.reshape(X.shape)
+        return X_next, fp_error(X_next, GX)
+
+
+dengine = {'relax': Relaxation,
+           'adaptive': AdaptiveRelaxation,
+           'nesterov': Nesterov,
+           'anderson': Anderson,
+           }
@@ -0,0 +1,207 @@
+"""
+    Columnar vehicle data for one simulation step
+
+    VehicleFrame stores the vehicles of a step as arrays (one column
+    per field of the trajectory tables) instead of a list of dicts:
+
+        frame = typedict(ti, aTraj)     # from stepparser.parse_inst
+        frame.ldr = ...                 # leaders
+        frame = updatelist(frame, spc=getspace(frame),
+                           vld=getleaderspeed(frame))
+        connection.execute(stmt, frame.to_dicts())
+
+    Vehicle types and links are stored as integer codes (see Codebook),
+    from_dicts / to_dicts convert from / to the list of dicts used by
+    the functions of symfunc and the database inserts. The link codes
+    belong to a Codebook of the run (frame.book): the frames of one
+    session share it, new links get codes in that session only.
+
+        links = Codebook(LINK_NAMES)
+        frame = typedict(ti, aTraj, links)
+"""
+import numpy as np
+
+from symuviapy.symfunc import SCAV, SHDV, leader_rows
+
+
+class Codebook:
+    """
+    Integer codes of names (vehicle types, links)
+
+    Codebook(names = list)
+
+    New names get the next free code when encoded.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """ Code of one name"""
+        try:
+            return self.codes[name]
+        except KeyError:
+            self.codes[name] = len(self.names)
+            self.names.append(name)
+            return self.codes[name]
+
+    def encode(self, aNames):
+        """ Codes of an array of names"""
+        lNames = np.asarray(aNames, dtype=str).tolist()
+        return np.fromiter(map(self.code, lNames), np.int16, len(lNames))
+
+    def decode(self, aCodes):
+        """ Names of an array of codes"""
+        return np.array(self.names, dtype=object)[np.asarray(aCodes)]
+
+
+TYPES = Codebook(('CAV', 'HDV'))
+LINK_NAMES = ('In_main', 'In_onramp', 'Merge_zone', 'Out_main')
+
+CODE_CAV = TYPES.code('CAV')
+
+COLUMNS = {'id': np.int64,
+           'type': np.int16,
+           'tron': np.int16,
+           'voie': np.int16,
+           'dst': np.float64,
+           'abs': np.float64,
+           'vit': np.float64,
+           'ldr': np.int64,
+           'spc': np.float64,
+           'vld': np.float64,
+           }
+
+
+class VehicleFrame:
+    """
+    Vehicles of one simulation step as columns
+
+    VehicleFrame(ti = float, n = int, book = Codebook, **columns)
+
+    Missing columns are zero (ldr defaults to the vehicle itself), n is
+    only needed when no column is given. book: Codebook of the link
+    codes (a new Codebook(LINK_NAMES) if not given).
+    """
+    __slots__ = ('ti', 'book') + tuple(COLUMNS)
+
+    def __init__(self, ti=0.0, n=0, book=None, **dColumns):
+        self.ti = ti
+        self.book = book if book is not None else Codebook(LINK_NAMES)
+        if dColumns:
+            n = len(next(iter(dColumns.values())))
+        for name, dtype in COLUMNS.items():
+            if name in dColumns:
+                setattr(self, name, np.asarray(dColumns[name], dtype=dtype))
+            else:
+                setattr(self, name, np.zeros(n, dtype=dtype))
+        if 'ldr' not in dColumns:
+            self.ldr = self.id.copy()
+
+    def __len__(self):
+        return len(self.id)
+
+    def __repr__(self):
+        return f'VehicleFrame(ti={self.ti}, n={len(self)})'
+
+    @property
+    def types(self):
+        """ Vehicle types as names"""
+        return TYPES.decode(self.type)
+
+    @property
+    def links(self):
+        """ Links as names"""
+        return self.book.decode(self.tron)
+
+    @classmethod
+    def from_traj(cls, ti, aTraj, book=None):
+        """ Frame from the structured array of stepparser"""
+        book = book if book is not None else Codebook(LINK_NAMES)
+        return cls(ti, book=book, id=aTraj['id'],
+                   type=TYPES.encode(aTraj['type']),
+                   tron=book.encode(aTraj['tron']), voie=aTraj['voie'],
+                   dst=aTraj['dst'], abs=aTraj['abs'], vit=aTraj['vit'])
+
+    @classmethod
+    def from_dicts(cls, lTrajVeh, book=None):
+        """ Frame from a dict (single vehicle) or a list of dicts"""
+        book = book if book is not None else Codebook(LINK_NAMES)
+        if isinstance(lTrajVeh, dict):
+            lTrajVeh = [lTrajVeh]
+        if not lTrajVeh:
+            return cls(book=book)
+        dColumns = {name: [veh[name] for veh in lTrajVeh]
+                    for name in COLUMNS if name in lTrajVeh[0]}
+        dColumns['type'] = TYPES.encode(dColumns['type'])
+        dColumns['tron'] = book.encode(dColumns['tron'])
+        for name in ('spc', 'vld'):
+            if name in dColumns:
+                dColumns[name] = np.array(dColumns[name], dtype=float)
+        return cls(lTrajVeh[0].get('ti', 0.0), book=book, **dColumns)
+
+    def to_dicts(self, columns=None):
+        """ List of dicts (one per vehicle) as built by symfunc"""
+        columns = columns or COLUMNS
+        lValues = [getattr(self, name).tolist() for name in columns]
+        dNames = {'type': self.types.tolist(), 'tron': self.links.tolist()}
+        lValues = [dNames.get(name, values)
+                   for name, values in zip(columns, lValues)]
+        return [dict(zip(columns, row), ti=self.ti) for row in zip(*lValues)]
+
+    def take(self, index):
+        """ Frame with the rows index (mask or integer array)"""
+        return VehicleFrame(self.ti, book=self.book,
+                            **{name: getattr(self, name)[index]
+                               for name in COLUMNS})
+
+
+def typedict(ti, aTraj, book=None):
+    """ Frame of a step (vectorized symfunc.typedict)"""
+    return VehicleFrame.from_traj(ti, aTraj, book)
+
+
+def updatelist(frame, **dColumns):
+    """ Sets columns of the frame (vectorized symfunc.updatelist)"""
+    for name, aValues in dColumns.items():
+        if name not in COLUMNS:
+            raise KeyError(f'Unknown column {name}')
+        setattr(frame, name, np.broadcast_to(
+            np.asarray(aValues, dtype=COLUMNS[name]), len(frame)).copy())
+    return frame
+
+
+def _single_follower(frame):
+    """ Single vehicle whose leader left the network"""
+    return len(frame) == 1 and frame.id[0] != frame.ldr[0]
+
+
+def getspace(frame):
+    """ Spacing to the leader (vectorized symfunc.getspace)
+
+        Platoon heads (ldr == id) get the equilibrium spacing of their
+        type, vehicles whose leader left the network get 0 (None when
+        the vehicle is alone, as in symfunc; NaN once in a column).
+    """
+    if _single_follower(frame):
+        return np.array([None])
+    rows = leader_rows(frame.id, frame.ldr)
+    bHead = frame.id == frame.ldr
+    aSpace = np.where(rows >= 0, frame.abs[rows] - frame.abs, 0.0)
+    aEq = np.where(frame.type == CODE_CAV, SCAV, SHDV)
+    return np.where(bHead, aEq, aSpace)
+
+
+def getleaderspeed(frame):
+    """ Speed of the leader (vectorized symfunc.getleaderspeed)
+
+        Platoon heads and vehicles whose leader left the network get
+        their own speed (None when the vehicle is alone, as in symfunc).
+    """
+    if _single_follower(frame):
+        return np.array([None])
+    rows = leader_rows(frame.id, frame.ldr)
+    return np.where(rows >= 0, frame.vit[rows], frame.vit)
@@ -0,0 +1,497 @@
+"""
+    Headless stand-in for libSymuVia
+
+    Vectorized Newell car-following model (Lagrangian LWR with the
+    triangular fundamental diagram of each vehicle type) on the
+    networks of Network/Merge*.xml, with the functions of libSymuVia
+    used by the notebooks:
+
+        library = HeadlessSymuVia()
+        session = SymuviaSession('../Network/Merge.xml', library)
+        for k, ti, aTraj in session.run(1200):
+            ...
+
+    The network file gives the links (TRONCONS, geometry, lanes and
+    allowed movements of the REPARTITEURS), the vehicle types
+    (TYPES_DE_VEHICULE: w, kx, vx, ACCELERATION_PLAGES) and the demand
+    of each entry (DEMANDES, REP_TYPEVEHICULES). The speed of a vehicle
+    is
+
+        v(t+dt) = min(vx, v(t) + ax(v) dt, (s - 1/kx) * w kx)
+
+    with s the spacing to its leader (same link and lane, or the last
+    vehicle downstream for the head of a lane). Vehicles on a lane
+    without exit movement change to the exit lane at chgtvoie_dstfin.
+    SymDriveVehicleEx overrides the position computed at the next step.
+    Without trace the step output is not formatted; traj() gives the
+    vehicles as the structured array of stepparser.
+"""
+import ctypes
+import logging
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from symuviapy.stepparser import empty_traj, format_inst, str_width
+from symuviapy.symfunc import leader_rows
+
+logger = logging.getLogger(__name__)
+
+# SymDriveVehicleEx / SymCreateVehicleEx errors
+UNKNOWN_VEHICLE = -1
+UNKNOWN_LINK = -2
+UNKNOWN_LANE = -3
+OUT_OF_LINK = -4
+UNKNOWN_TYPE = -5
+UNKNOWN_ORIGIN = -6
+
+
+def seconds(sTime):
+    """ Seconds of a hh:mm:ss time"""
+    h, m, s = (float(x) for x in sTime.split(':'))
+    return 3600 * h + 60 * m + s
+
+
+def periods(lPeriods, t):
+    """ Value of the period containing t in [(value, duration)]
+
+        The last value holds after the last period.
+    """
+    t_end = 0.0
+    for value, duration in lPeriods:
+        t_end += duration
+        if t < t_end:
+            return value
+    return lPeriods[-1][0] if lPeriods else None
+
+
+class Link:
+    """
+    Link of the network
+
+    Link(id = str, length = float, lanes = int, start = tuple,
+         end = tuple, dstfin = float)
+    """
+
+    def __init__(self, id: str, length: float, lanes: int, start: tuple,
+                 end: tuple, dstfin: float):
+        self.id = id
+        self.length = length
+        self.lanes = lanes
+        self.start = start
+        self.end = end
+        self.dstfin = dstfin
+        self.dNext = {}  # lane -> (next link index, lane)
+
+
+class Network:
+    """
+    Links, vehicle types and demand of a network file
+
+    Network(path = str)
+    """
+
+    def __init__(self, path: str):
+        root = ET.parse(path).getroot()
+        eSimulation = root.find('SIMULATIONS/SIMULATION')
+        self.dt = float(eSimulation.get('pasdetemps'))
+        self.n_steps = int(round((seconds(eSimulation.get('fin'))
+                                  - seconds(eSimulation.get('debut')))
+                                 / self.dt))
+        self.seed = int(eSimulation.get('seed', 0))
+        eTrafic = root.find('TRAFICS/TRAFIC')
+        self.read_types(eTrafic)
+        self.read_links(root.find('RESEAUX/RESEAU'))
+        self.read_entries(eTrafic)
+
+    def read_types(self, eTrafic):
+        self.types = []
+        lW, lKx, lVx, lAx, lVsup = [], [], [], [], []
+        for eType in eTrafic.iterfind('TYPES_DE_VEHICULE/TYPE_DE_VEHICULE'):
+            self.types.append(eType.get('id'))
+            lW.append(abs(float(eType.get('w'))))
+            lKx.append(float(eType.get('kx')))
+            lVx.append(float(eType.get('vx')))
+            lRanges = [(float(e.get('ax')), float(e.get('vit_sup').replace(
+                'infini', 'inf'))) for e in eType.iter('ACCELERATION_PLAGE')]
+            lAx.append([ax for ax, _ in lRanges] or [np.inf])
+            lVsup.append([vsup for _, vsup in lRanges] or [np.inf])
+        self.dType = {name: i for i, name in enumerate(self.types)}
+        self.aW = np.array(lW)
+        self.aKx = np.array(lKx)
+        self.aVx = np.array(lVx)
+        # Acceleration ranges as (type, range) tables padded with inf
+        n_ranges = max(len(lAx_i) for lAx_i in lAx)
+        self.aAx = np.full((len(lAx), n_ranges), np.inf)
+        self.aVsup = np.full((len(lAx), n_ranges), np.inf)
+        for i, (lAx_i, lVsup_i) in enumerate(zip(lAx, lVsup)):
+            self.aAx[i, :len(lAx_i)] = lAx_i
+            self.aVsup[i, :len(lVsup_i)] = lVsup_i
+
+    def read_links(self, eReseau):
+        self.links = []
+        dUpstream, dDownstream = {}, {}
+        for eLink in eReseau.iterfind('TRONCONS/TRONCON'):
+            start = tuple(float(x) for x in
+                          eLink.get('extremite_amont').split())
+            end = tuple(float(x) for x in
+                        eLink.get('extremite_aval').split())
+            length = float(np.hypot(end[0] - start[0], end[1] - start[1]))
+            link = Link(eLink.get('id'), length,
+                        int(eLink.get('nb_voie', 1)), start, end,
+                        float(eLink.get('chgtvoie_dstfin', length)))
+            dUpstream.setdefault(eLink.get('id_eltaval'), []).append(
+                len(self.links))
+            dDownstream.setdefault(eLink.get('id_eltamont'), []).append(
+                len(self.links))
+            self.links.append(link)
+        self.dLink = {link.id: i for i, link in enumerate(self.links)}
+        self.dEntryLink = {node: lOut[0] for node, lOut in dDownstream.items()}
+
+        # Movements: (link, lane) -> (next link, lane)
+        dMovement = {}
+        for eMove in eReseau.iter('MOUVEMENT_AUTORISE'):
+            for eOut in eMove.iter('MOUVEMENT_SORTIE'):
+                dMovement.setdefault(eMove.get('id_troncon_amont'), []).append(
+                    (eMove.get('num_voie_amont'), eOut.get('id_troncon_aval'),
+                     eOut.get('num_voie_aval')))
+        for node, lIn in dUpstream.items():
+            lOut = dDownstream.get(node, [])
+            for i in lIn:
+                link = self.links[i]
+                lMoves = dMovement.get(link.id) or [
+                    (None, self.links[j].id, None) for j in lOut]
+                for sLaneIn, sNext, sLaneOut in lMoves:
+                    j = self.dLink[sNext]
+                    lLanes = ([int(sLaneIn)] if sLaneIn
+                              else range(1, link.lanes + 1))
+                    for lane in lLanes:
+                        lane_out = (int(sLaneOut) if sLaneOut
+                                    else min(lane, self.links[j].lanes))
+                        link.dNext.setdefault(lane, (j, lane_out))
+
+        # Lane to reach for lanes without exit movement
+        self.aExitLane = np.zeros((len(self.links),
+                                   max(link.lanes for link in self.links) + 1),
+                                  dtype=int)
+        for i, link in enumerate(self.links):
+            for lane in range(1, link.lanes + 1):
+                self.aExitLane[i, lane] = lane if (
+                    lane in link.dNext or not link.dNext) else min(
+                    link.dNext, key=lambda x: abs(x - lane))
+
+    def read_entries(self, eTrafic):
+        """ Demand [(level, duration)] and type split of each entry"""
+        self.entries = {}
+        for eEnd in eTrafic.iterfind('EXTREMITES/EXTREMITE'):
+            if eEnd.find('.//DEMANDES') is None:
+                continue
+            self.entries[eEnd.get('id')] = (
+                [(float(e.get('niveau')), float(e.get('duree')))
+                 for e in eEnd.iter('DEMANDE')],
+                [(np.array(e.get('coeffs').split(), dtype=float),
+                  float(e.get('duree')))
+                 for e in eEnd.iter('REP_TYPEVEHICULE')])
+
+
+class HeadlessSymuVia:
+    """
+    libSymuVia functions on a vectorized Newell model
+
+    HeadlessSymuVia()
+
+    SymLoadNetworkEx, SymRunNextStepEx, SymCreateVehicleEx and
+    SymDriveVehicleEx take the arguments of the C functions (bytes for
+    names). Demand vehicles wait at their entry until there is a
+    jam spacing on the first link.
+    """
+
+    def __init__(self):
+        self.network = None
+
+    # libSymuVia interface
+
+    def SymLoadNetworkEx(self, sFile):
+        """ Loads a network file, returns 1 (0 on error)"""
+        try:
+            self.load(Network(_to_str(sFile)))
+        except (OSError, ET.ParseError, AttributeError, KeyError,
+                ValueError) as e:
+            logger.error('Could not load %s: %r', sFile, e)
+            return 0
+        return 1
+
+    def SymRunNextStepEx(self, sRequest, bTrace, pbEnd):
+        """ Runs one step, writes the instant XML when bTrace"""
+        bEnd = getattr(pbEnd, '_obj', None)
+        if bEnd is None:
+            bEnd = pbEnd.contents
+        if self.network is None or self.k >= self.network.n_steps:
+            bEnd.value = 1
+            return False
+        self.step()
+        if bTrace:
+            bOutput = format_inst(self.ti, self.traj())
+            n = min(len(bOutput), ctypes.sizeof(sRequest) - 1)
+            ctypes.memmove(sRequest, bOutput, n)
+            sRequest[n] = b'\0'
+        bEnd.value = int(self.k >= self.network.n_steps)
+        return True
+
+    def SymCreateVehicleEx(self, sType, sOrigin, sDestination, nLane,
+                           dTime):
+        """ Queues a vehicle at an entry, returns its id
+
+            The vehicle enters at the next step with room on the first
+            link (dTime within the step is not used).
+        """
+        nType = self.network.dType.get(_to_str(sType))
+        if nType is None:
+            return UNKNOWN_TYPE
+        sOrigin = _to_str(sOrigin)
+        if sOrigin not in self.network.dEntryLink:
+            return UNKNOWN_ORIGIN
+        return self.queue(sOrigin, nType, int(nLane))
+
+    def SymDriveVehicleEx(self, nId, sLink, nLane, dPos, bForce):
+        """ Moves a vehicle at the next step, returns 0 or an error"""
+        nLink = self.network.dLink.get(_to_str(sLink))
+        if nLink is None:
+            return UNKNOWN_LINK
+        if not 1 <= nLane <= self.network.links[nLink].lanes:
+            return UNKNOWN_LANE
+        if not 0 <= dPos <= self.network.links[nLink].length:
+            return OUT_OF_LINK
+        if nId not in self.sId:
+            return UNKNOWN_VEHICLE
+        self.dDrive[int(nId)] = (nLink, int(nLane), float(dPos))
+        return 0
+
+    # Simulation
+
+    def load(self, network):
+        """ Empty network at t = 0"""
+        self.network = network
+        self.rng = np.random.RandomState(network.seed)
+        self.k = 0
+        self.n_created = 0
+        self.n_exited = 0
+        self.dDrive = {}
+        self.dPending = {sEntry: [] for sEntry in network.dEntryLink}
+        self.dCount = {sEntry: 0.0 for sEntry in network.entries}
+
+        lLinks = network.links
+        n_lanes = network.aExitLane.shape[1]
+        self.aLength = np.array([link.length for link in lLinks])
+        self.aDstfin = np.array([link.dstfin for link in lLinks])
+        self.aX0 = np.array([link.start[0] for link in lLinks])
+        self.aX1 = np.array([link.end[0] for link in lLinks])
+        self.aLinkName = np.array([link.id for link in lLinks])
+        self.aTypeName = np.array(network.types)
+        # Next (link, lane) of every lane, through its exit lane
+        self.aNextLink = np.full((len(lLinks), n_lanes), -1)
+        self.aNextLane = np.zeros((len(lLinks), n_lanes), dtype=int)
+        for i, link in enumerate(lLinks):
+            for lane in range(1, link.lanes + 1):
+                next_lane = network.aExitLane[i, lane]
+                if next_lane in link.dNext:
+                    self.aNextLink[i, lane], self.aNextLane[i, lane] = \
+                        link.dNext[next_lane]
+
+        self.aId = np.zeros(0, dtype=np.int64)
+        self.aType = np.zeros(0, dtype=int)
+        self.aLink = np.zeros(0, dtype=int)
+        self.aLane = np.zeros(0, dtype=int)
+        self.aDst = np.zeros(0)
+        self.aVit = np.zeros(0)
+        self.aAcc = np.zeros(0)
+        self.sId = set()
+
+    @property
+    def ti(self):
+        return self.k * self.network.dt
+
+    def __len__(self):
+        return len(self.aId)
+
+    def queue(self, sEntry, nType, nLane=1):
+        """ Reserves an id for a vehicle waiting at an entry"""
+        nId = self.n_created
+        self.n_created += 1
+        self.dPending[sEntry].append((nId, nType, nLane))
+        return nId
+
+    def demand(self):
+        """ Queues the vehicles of the demand of this step"""
+        t = self.ti - self.network.dt  # start of the step
+        for sEntry, (lDemand, lSplit) in self.network.entries.items():
+            self.dCount[sEntry] += (periods(lDemand, t) or 0.0) \
+                * self.network.dt
+            while self.dCount[sEntry] >= 1.0 - 1e-9:
+                self.dCount[sEntry] -= 1.0
+                aCoeff = periods(lSplit, t)
+                nType = (0 if aCoeff is None else
+                         int(self.rng.choice(len(aCoeff),
+                                             p=aCoeff / aCoeff.sum())))
+                self.queue(sEntry, nType)
+
+    def spacing(self):
+        """ Distance to the leader of every vehicle (inf for none)"""
+        n = len(self)
+        aGap = np.full(n, np.inf)
+        if not n:
+            return aGap
+        n_lanes = self.aNextLink.shape[1]
+        aStream = self.aLink * n_lanes + self.aLane
+        order = np.lexsort((-self.aDst, aStream))
+        aSorted = aStream[order]
+        bHead = np.ones(n, dtype=bool)
+        bHead[1:] = aSorted[1:] != aSorted[:-1]
+        aDst = self.aDst[order]
+        aGapSorted = np.where(bHead, np.inf, np.roll(aDst, 1) - aDst)
+
+        # Heads: last vehicle of the next non-empty lanes downstream
+        bTail = np.ones(n, dtype=bool)
+        bTail[:-1] = bHead[1:]
+        dTail = dict(zip(aSorted[bTail].tolist(), aDst[bTail].tolist()))
+        for i in np.flatnonzero(bHead).tolist():
+            nLink, nLane = self.aLink[order[i]], self.aLane[order[i]]
+            dGap = self.aLength[nLink] - aDst[i]
+            for _ in range(len(self.aLength)):
+                nLink, nLane = (self.aNextLink[nLink, nLane],
+                                self.aNextLane[nLink, nLane])
+                if nLink < 0:
+                    break
+                nStream = nLink * n_lanes + nLane
+                if nStream in dTail:
+                    aGapSorted[i] = dGap + dTail[nStream]
+                    break
+                dGap += self.aLength[nLink]
+        aGap[order] = aGapSorted
+        return aGap
+
+    def enter(self):
+        """ Pending vehicles enter when their first lane has room"""
+        dTail = {}  # (link, lane) -> position of the last vehicle
+        for key, dst in zip(zip(self.aLink.tolist(), self.aLane.tolist()),
+                            self.aDst.tolist()):
+            dTail[key] = min(dst, dTail.get(key, np.inf))
+        network = self.network
+        lNew = []
+        for sEntry, lPending in self.dPending.items():
+            nLink = network.dEntryLink[sEntry]
+            while lPending:
+                nId, nType, nLane = lPending[0]
+                dGap = dTail.get((nLink, nLane), np.inf)
+                delta = 1 / network.aKx[nType]
+                if dGap < delta:
+                    break
+                lPending.pop(0)
+                vit = min(network.aVx[nType], (dGap - delta)
+                          * network.aW[nType] * network.aKx[nType])
+                lNew.append((nId, nType, nLink, nLane, 0.0, vit))
+                dTail[(nLink, nLane)] = 0.0
+        if lNew:
+            for name, values in zip(('aId', 'aType', 'aLink', 'aLane',
+                                     'aDst', 'aVit'), zip(*lNew)):
+                setattr(self, name, np.concatenate([
+                    getattr(self, name),
+                    np.array(values, dtype=getattr(self, name).dtype)]))
+            self.aAcc = np.concatenate([self.aAcc, np.zeros(len(lNew))])
+
+    def speed(self, aGap):
+        """ Newell speed of every vehicle for the spacings aGap"""
+        network = self.network
+        dt = network.dt
+        aType = self.aType
+        aVit = self.aVit
+        # Acceleration range of the current speed
+        n_range = (aVit[:, None] >= network.aVsup[aType]).sum(axis=1)
+        n_range = np.minimum(n_range, network.aVsup.shape[1] - 1)
+        aAx = network.aAx[aType, n_range]
+        aKx = network.aKx[aType]
+        aCong = (aGap - 1 / aKx) * network.aW[aType] * aKx
+        aNew = np.minimum.reduce([network.aVx[aType], aVit + aAx * dt,
+                                  aCong, aGap / dt])
+        return np.maximum(aNew, 0.0)
+
+    def move(self):
+        """ Lane changes and transfers to the next links, exits"""
+        bChange = ((self.aLane != self.network.aExitLane[self.aLink,
+                                                        self.aLane])
+                   & (self.aDst >= self.aDstfin[self.aLink]))
+        self.aLane[bChange] = self.network.aExitLane[self.aLink[bChange],
+                                                     self.aLane[bChange]]
+        bKeep = np.ones(len(self), dtype=bool)
+        bOut = self.aDst >= self.aLength[self.aLink]
+        while bOut.any():
+            idx = np.flatnonzero(bOut)
+            aNext = self.aNextLink[self.aLink[idx], self.aLane[idx]]
+            bKeep[idx[aNext < 0]] = False
+            idx, aNext = idx[aNext >= 0], aNext[aNext >= 0]
+            self.aDst[idx] -= self.aLength[self.aLink[idx]]
+            self.aLane[idx] = self.aNextLane[self.aLink[idx],
+                                             self.aLane[idx]]
+            self.aLink[idx] = aNext
+            bOut[:] = False
+            bOut[idx] = self.aDst[idx] >= self.aLength[aNext]
+        if not bKeep.all():
+            self.n_exited += int((~bKeep).sum())
+            for name in ('aId', 'aType', 'aLink', 'aLane', 'aDst', 'aVit',
+                         'aAcc'):
+                setattr(self, name, getattr(self, name)[bKeep])
+
+    def drive(self, aOld):
+        """ Positions given by SymDriveVehicleEx (aOld: before the step)"""
+        if not self.dDrive:
+            return
+        aDriveId = np.fromiter(self.dDrive, np.int64, len(self.dDrive))
+        rows = leader_rows(self.aId, aDriveId)
+        for row, (nLink, nLane, dPos) in zip(rows.tolist(),
+                                             self.dDrive.values()):
+            if row < 0:
+                continue  # left the network
+            if self.aLink[row] == nLink and aOld[row] <= dPos:
+                self.aVit[row] = (dPos - aOld[row]) / self.network.dt
+            self.aLink[row], self.aLane[row], self.aDst[row] = \
+                nLink, nLane, dPos
+        self.dDrive = {}
+
+    def step(self):
+        """ Advances the simulation by one time step"""
+        self.k += 1
+        dt = self.network.dt
+        if len(self):
+            aNew = self.speed(self.spacing())
+            aOld = self.aDst.copy()
+            aLinkOld = self.aLink.copy()
+            self.aAcc = (aNew - self.aVit) / dt
+            self.aVit = aNew
+            self.aDst += aNew * dt
+            self.drive(np.where(self.aLink == aLinkOld, aOld, np.inf))
+            self.move()
+        else:
+            self.dDrive = {}
+        self.demand()
+        self.enter()
+        self.sId = set(self.aId.tolist())
+
+    def traj(self):
+        """ Vehicles of the current step (structured array of stepparser)"""
+        aTraj = empty_traj(len(self),
+                           {'type': str_width(self.aTypeName.dtype),
+                            "tron": str_width(self.aLinkName.dtype)})
+        aTraj['id'] = self.aId
+        aTraj['type'] = self.aTypeName[self.aType]
+        aTraj['tron'] = self.aLinkName[self.aLink]
+        aTraj['voie'] = self.aLane
+        aTraj['dst'] = self.aDst
+        aTraj['abs'] = self.aX0[self.aLink] + (
+            self.aX1[self.aLink] - self.aX0[self.aLink]) \
+            * self.aDst / self.aLength[self.aLink]
+        aTraj['vit'] = self.aVit
+        return aTraj
+
+
+def _to_str(name):
+    return name.decode('UTF8') if isinstance(name, bytes) else name
@@ -0,0 +1,136 @@
+"""
+    Leader registry per link
+
+    Replaces the queues of symfunc.queueveh / getlead. At every step
+    the registry receives the vehicles in the network, orders them by
+    position on each link (the head of a link is its own leader, as in
+    getlead) and keeps an id -> leader map for O(1) lookups. Vehicles
+    absent from the step are evicted, so the registry only holds the
+    vehicles currently in the network. The map is updated for the
+    vehicles entering, leaving or changing leader only: the vehicles of
+    the step are matched with those of the previous step by id.
+
+        registry = LeaderRegistry()
+        frame.ldr = registry.update(frame)
+        registry.leader(veh_id)
+
+    The registry also records its memory footprint and the time spent
+    in update (see __str__).
+"""
+import sys
+import time
+
+import numpy as np
+
+
+class LeaderRegistry:
+    """
+    Leaders of the vehicles in the network, per link
+
+    LeaderRegistry()
+    """
+
+    def __init__(self):
+        self.dLeader = {}  # id -> leader id
+        self.dQueue = {}  # link -> ids ordered from the head
+        self.aPrevId = np.zeros(0, dtype=int)  # vehicles of the last step
+        self.aPrevLdr = np.zeros(0, dtype=int)  # and their leaders
+        self.n_updates = 0
+        self.n_evicted = 0
+        self.n_changed = 0
+        self.t_update = 0.0
+
+    def update_arrays(self, aId, aTron, aAbs):
+        """ Leader of each vehicle of a step (given as arrays)
+
+            aTron: link of each vehicle (codes or names)
+            aAbs: position used to order the vehicles on a link
+        """
+        t_0 = time.perf_counter()
+        aId = np.asarray(aId)
+        aTron = np.asarray(aTron)
+        aAbs = np.asarray(aAbs, dtype=float)
+        n = len(aId)
+
+        # Link, then position from the head, then id for ties
+        order = np.lexsort((aId, -aAbs, aTron))
+        aIdSorted = aId[order]
+        bHead = np.ones(n, dtype=bool)
+        bHead[1:] = aTron[order][1:] != aTron[order][:-1]
+        aLdrSorted = np.where(bHead, aIdSorted,
+                              np.roll(aIdSorted, 1))
+        aLdr = np.empty_like(aId)
+        aLdr[order] = aLdrSorted
+
+        # Incremental update of the id -> leader map
+        iSort = np.argsort(aId, kind='stable')
+        aIdSort = aId[iSort]
+        iPrev = np.searchsorted(aIdSort, self.aPrevId).clip(max=max(n - 1, 0))
+        bStay = aIdSort[iPrev] == self.aPrevId if n else \
+            np.zeros(len(self.aPrevId), dtype=bool)
+        for veh_id in self.aPrevId[~bStay].tolist():
+            del self.dLeader[veh_id]
+            self.n_evicted += 1
+        iStay = iSort[iPrev[bStay]]
+        bChanged = np.ones(n, dtype=bool)
+        bChanged[iStay] = aLdr[iStay] != self.aPrevLdr[bStay]
+        for veh_id, ldr in zip(aId[bChanged].tolist(),
+                               aLdr[bChanged].tolist()):
+            self.dLeader[veh_id] = ldr
+        self.n_changed += int(bChanged.sum())
+        self.aPrevId, self.aPrevLdr = aId, aLdr
+
+        lStart = np.flatnonzero(bHead).tolist() + [n]
+        self.dQueue = {aTron[order[i]].item(): aIdSorted[i:j]
+                       for i, j in zip(lStart[:-1], lStart[1:])}
+
+        self.n_updates += 1
+        self.t_update += time.perf_counter() - t_0
+        return aLdr
+
+    def update(self, frame):
+        """ Leaders of the vehicles of a VehicleFrame"""
+        return self.update_arrays(frame.id, frame.tron, frame.abs)
+
+    def update_dicts(self, lTrajVeh):
+        """ Sets 'ldr' in a list of vehicle dicts (or a single dict)"""
+        if isinstance(lTrajVeh, dict):
+            lVeh = [lTrajVeh]
+        else:
+            lVeh = lTrajVeh
+        aLdr = self.update_arrays([v['id'] for v in lVeh],
+                                  [v['tron'] for v in lVeh],
+                                  [v['abs'] for v in lVeh])
+        for veh, ldr in zip(lVeh, aLdr.tolist()):
+            veh['ldr'] = ldr
+        return lTrajVeh
+
+    def leader(self, veh_id):
+        """ Leader of a vehicle (itself for the head of a link)"""
+        return self.dLeader[veh_id]
+
+    def queue(self, tron):
+        """ Ids on a link ordered from the head"""
+        return self.dQueue.get(tron, np.zeros(0, dtype=int))
+
+    def __contains__(self, veh_id):
+        return veh_id in self.dLeader
+
+    def __len__(self):
+        return len(self.dLeader)
+
+    def memory(self):
+        """ Size of the registry in bytes"""
+        return (sys.getsizeof(self.dLeader) + sys.getsizeof(self.dQueue)
+                + sum(a.nbytes for a in self.dQueue.values())
+                + self.aPrevId.nbytes + self.aPrevLdr.nbytes)
+
+    @property
+    def time_per_step(self):
+        return self.t_update / max(self.n_updates, 1)
+
+    def __str__(self):
+        return (f'LeaderRegistry(vehicles= {len(self)}, '
+                f'links= {len(self.dQueue)}, memory= {self.memory()} B, '
+                f'evicted= {self.n_evicted}, changed= {self.n_changed}, '
+                f'time/step= {self.time_per_step*1e3:.3f} ms)')
@@ -0,0 +1,308 @@
+"""
+    Pipelined simulation loop
+
+    A simulation step goes through stages (simulator, parsing, leaders
+    and spacing, control, persistence). Pipeline runs every stage in
+    its own thread, connected by bounded queues, so that step k is
+    parsed and written while the simulator computes step k+1. The
+    simulator (ctypes call) and SQLite release the GIL while they run.
+
+        pipe = Pipeline(source, [Stage('parse', parse_step),
+                                 Stage('spacing', spacing_step),
+                                 Stage('persist', persist_step)])
+        pipe.run()
+        print(pipe.report())
+
+    source is an iterable (e.g. a generator calling SymRunNextStepEx).
+    A stage returning None drops the item. In closed loop the control
+    of step k must be applied before step k+1 is simulated: the control
+    stage puts its output in a feedback queue and the source (a
+    generator) receives it through send() before the next step. Parse,
+    spacing and control then take turns with the simulator, only the
+    persistence overlaps the next steps, so a closed loop is not faster
+    than the sequential loop: the pipeline gives the share of the step
+    of each stage (see closed_loop_stages).
+
+    report() gives for each stage its occupancy (busy time / wall time)
+    and the mean fill of its input queue.
+"""
+import queue
+import threading
+import time
+from functools import partial
+
+import numpy as np
+
+from symuviapy import frame as vf
+from symuviapy.stepparser import parse_inst
+
+_END = object()
+
+
+class Stage:
+    """
+    One step of the pipeline
+
+    Stage(name = str, func = callable, maxsize = int)
+
+    func(item) -> item for the next stage (None drops the item)
+    maxsize: capacity of the input queue of the stage
+    """
+
+    def __init__(self, name: str, func, maxsize: int = 8):
+        self.name = name
+        self.func = func
+        self.maxsize = maxsize
+        self.reset()
+
+    def reset(self):
+        self.n_items = 0
+        self.t_busy = 0.0
+        self.l_fill = []
+
+    def stats(self, t_wall):
+        """ Items, occupancy, time per item and mean queue fill"""
+        return {'items': self.n_items,
+                'occupancy': self.t_busy / t_wall if t_wall else 0.0,
+                'time/item': self.t_busy / max(self.n_items, 1),
+                'queue': float(np.mean(self.l_fill)) if self.l_fill
+                else 0.0,
+                }
+
+
+class Pipeline:
+    """
+    Stages in threads joined by bounded queues
+
+    Pipeline(source = iterable, stages = list, name = str,
+             feedback = queue.Queue)
+
+    With feedback, source is a generator: after each item the source
+    waits for the next value of feedback and sends it to the generator
+    (the wait is not counted in the occupancy of the source).
+    """
+
+    def __init__(self, source, stages, name: str = 'source',
+                 feedback=None):
+        self.source = Stage(name, None)
+        self.l_source = source
+        self.stages = list(stages)
+        self.feedback = feedback
+        self.t_wall = 0.0
+        self.error = None
+        self._stop = threading.Event()
+
+    def _fail(self, e):
+        if self.error is None:
+            self.error = e
+        self._stop.set()
+
+    def _put(self, q_out, item):
+        """ Put that gives up when the pipeline stops"""
+        while not self._stop.is_set():
+            try:
+                q_out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q_in):
+        """ Get that gives up when the pipeline stops"""
+        while not self._stop.is_set():
+            try:
+                return True, q_in.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return False, None
+
+    def _run_source(self, q_out):
+        stage = self.source
+        iterator = iter(self.l_source)
+        value = None
+        try:
+            while not self._stop.is_set():
+                t_0 = time.perf_counter()
+                try:
+                    item = next(iterator) if self.feedback is None \
+                        else iterator.send(value)
+                except StopIteration:
+                    break
+                stage.t_busy += time.perf_counter() - t_0
+                stage.n_items += 1
+                if not self._put(q_out, item):
+                    break
+                if self.feedback is not None:
+                    bValue, value = self._get(self.feedback)
+                    if not bValue:
+                        break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            q_out.put(_END)  # the next stage drains its queue until _END
+
+    def _run_stage(self, stage, q_in, q_out):
+        try:
+            while True:
+                stage.l_fill.append(q_in.qsize())
+                item = q_in.get()
+                if item is _END:
+                    break
+                if self._stop.is_set():
+                    continue  # drain until _END
+                t_0 = time.perf_counter()
+                item = stage.func(item)
+                stage.t_busy += time.perf_counter() - t_0
+                stage.n_items += 1
+                if item is not None and q_out is not None:
+                    if not self._put(q_out, item):
+                        break
+        except Exception as e:
+            self._fail(e)
+            while q_in.get() is not _END:  # unblock upstream
+                pass
+        finally:
+            if q_out is not None:
+                q_out.put(_END)
+
+    def run(self):
+        """ Runs the source through all stages, returns the report"""
+        for stage in [self.source] + self.stages:
+            stage.reset()
+        self.error = None
+        self._stop.clear()
+        while self.feedback is not None and not self.feedback.empty():
+            self.feedback.get()
+
+        l_queue = [queue.Queue(stage.maxsize) for stage in self.stages]
+        l_thread = [threading.Thread(target=self._run_source,
+                                     args=(l_queue[0],), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            q_out = l_queue[i+1] if i + 1 < len(self.stages) else None
+            l_thread.append(threading.Thread(
+                target=self._run_stage, args=(stage, l_queue[i], q_out),
+                name=stage.name, daemon=True))
+
+        t_0 = time.perf_counter()
+        for thread in l_thread:
+            thread.start()
+        for thread in l_thread:
+            thread.join()
+        self.t_wall = time.perf_counter() - t_0
+
+        if self.error is not None:
+            raise self.error
+        return self.report()
+
+    def report(self):
+        """ Stats of every stage (see Stage.stats)"""
+        return {stage.name: stage.stats(self.t_wall)
+                for stage in [self.source] + self.stages}
+
+    def __str__(self):
+        lLines = [f'Pipeline: {self.t_wall:.3f} s',
+                  f'{"stage":>10} {"items":>7} {"busy":>6} {"ms/item":>8} '
+                  f'{"queue":>6}']
+        for name, dStats in self.report().items():
+            lLines.append(f'{name:>10} {dStats["items"]:>7} '
+                          f'{dStats["occupancy"]:>6.1%} '
+                          f'{dStats["time/item"]*1e3:>8.3f} '
+                          f'{dStats["queue"]:>6.2f}')
+        return '\n'.join(lLines)
+
+
+def simulator_source(step, n_steps=None):
+    """ Output bytes of each step of step() until the simulation ends
+
+        step() -> (bContinue, bytes), e.g. wraps SymRunNextStepEx and
+        returns a copy of sRequest.value
+    """
+    k = 0
+    while n_steps is None or k < n_steps:
+        bContinue, bRequest = step()
+        if not bContinue:
+            break
+        yield bRequest
+        k += 1
+
+
+def closed_loop_source(step, drive, n_steps=None):
+    """ simulator_source applying the control of each step
+
+        drive(value) receives the feedback sent for the step (the output
+        of control, see closed_loop_stages) before the next step runs.
+    """
+    k = 0
+    while n_steps is None or k < n_steps:
+        bContinue, bRequest = step()
+        if not bContinue:
+            break
+        value = yield bRequest
+        drive(value)
+        k += 1
+
+
+def parse_step(bRequest, book=None):
+    """ Parsing stage: instant XML -> VehicleFrame
+
+        book: Codebook of the link codes, shared by the frames of a run
+    """
+    return vf.typedict(*parse_inst(bRequest), book)
+
+
+def spacing_stage(registry):
+    """ Leaders, spacing and leader speed of a frame"""
+    def spacing_step(frame):
+        frame.ldr = registry.update(frame)
+        return vf.updatelist(frame, spc=vf.getspace(frame),
+                             vld=vf.getleaderspeed(frame))
+    return spacing_step
+
+
+def control_stage(control, feedback):
+    """ Control of a frame, its output is put in the feedback queue"""
+    def control_step(frame):
+        feedback.put(control(frame))
+        return frame
+    return control_step
+
+
+def persist_stage(writer, table='traj'):
+    """ Writes non empty frames to a table of a TrajectoryWriter"""
+    def persist_step(frame):
+        if len(frame):
+            writer.write(table, frame)
+        return frame
+    return persist_step
+
+
+def open_loop_stages(registry, writer, table='traj', book=None):
+    """ Stages of an open loop run (fully pipelined)
+
+        book: Codebook of the link codes (a new one for the run if None)
+    """
+    book = book if book is not None else vf.Codebook(vf.LINK_NAMES)
+    return [Stage('parse', partial(parse_step, book=book)),
+            Stage('spacing', spacing_stage(registry)),
+            Stage('persist', persist_stage(writer, table))]
+
+
+def closed_loop_stages(registry, control, writer, table='closed',
+                       book=None):
+    """ Stages of a closed loop run and their feedback queue
+
+        control(frame) -> value given to drive of closed_loop_source.
+        The stages before the control must not drop frames. book as in
+        open_loop_stages.
+
+            stages, feedback = closed_loop_stages(registry, control,
+                                                  writer)
+            Pipeline(closed_loop_source(step, drive), stages,
+                     feedback=feedback).run()
+    """
+    feedback = queue.Queue(1)
+    book = book if book is not None else vf.Codebook(vf.LINK_NAMES)
+    return [Stage('parse', partial(parse_step, book=book)),
+            Stage('spacing', spacing_stage(registry)),
+            Stage('control', control_stage(control, feedback)),
+            Stage('persist', persist_stage(writer, table))], feedback
@@ -0,0 +1,154 @@
+"""
+    Indexed queries over the simulation output database
+
+    Time is queried by integer step k = round(ti / DT) (column k, see
+    writer.py) through (k, id) and (id, k) indexes, instead of
+    comparing the float ti column on a full scan. Results are NumPy
+    structured arrays with the columns of the table:
+
+        db = TrajectoryDB('../Output/SymOut.sqlite')
+        aStep = db.step(120, 'closed')          # vehicles at k = 120
+        aVeh = db.vehicle(3, 'closed')          # trajectory of id 3
+        aWin = db.window(100, 150, 'closed')    # k in [100, 150]
+        aStep['vit']
+
+    Opening a database does not modify it. Databases written by the
+    notebooks (without the k column) and databases without the indexes
+    are migrated explicitly, once:
+
+        TrajectoryDB('../Output/SymOut.sqlite', migrate=True)
+
+    Rows inserted afterwards without k (e.g. by the notebooks) get it
+    from ti through a trigger added by the migration.
+"""
+import re
+import sqlite3
+
+import numpy as np
+
+from symuviapy.writer import (TABLES, existing_tables, migrate_tables,
+                              to_step)
+
+DTYPES = {'FLOAT': np.float64, 'INTEGER': np.int64}
+STR_LENGTH = 16  # min. length of string columns
+INT_NULL = -1  # NULL in integer columns
+
+
+def column_dtype(sql):
+    """ NumPy dtype of an SQL type of TABLES"""
+    if sql in DTYPES:
+        return np.dtype(DTYPES[sql])
+    match = re.fullmatch(r'VARCHAR\((\d+)\)', sql)
+    n = int(match.group(1)) if match else 0
+    return np.dtype(f'U{max(n, STR_LENGTH)}')
+
+
+def create_indexes(connection, tables=TABLES):
+    """ Adds the (k, id), (id, k) indexes to the existing tables"""
+    for table in existing_tables(connection, tables):
+        columns = tables[table]
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_k_id '
+                           f'ON {table} (k, id)')
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_id_k '
+                           f'ON {table} (id, k)')
+        if 'scenario' in dict(columns):
+            connection.execute(f'CREATE INDEX IF NOT EXISTS '
+                               f'{table}_scenario ON {table} '
+                               f'(scenario, k, id)')
+
+
+class TrajectoryDB:
+    """
+    Queries by step and vehicle on the output database
+
+    TrajectoryDB(path = str, migrate = bool)
+
+    migrate: calls migrate() when opened
+    """
+
+    def __init__(self, path: str, migrate: bool = False):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        if migrate:
+            self.migrate()
+
+    def migrate(self):
+        """ Adds the step column k and the indexes to the existing tables"""
+        with self.connection:
+            migrate_tables(self.connection)
+            create_indexes(self.connection)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def dtype(self, table, columns=None):
+        """ Structured dtype of (a selection of) the columns of a table"""
+        dSql = dict(TABLES[table])
+        columns = columns or list(dSql)
+        return np.dtype([(name, column_dtype(dSql[name]))
+                         for name in columns])
+
+    def select(self, table, where='', params=(), columns=None,
+               order='k, id'):
+        """ Rows of a table as a structured array"""
+        dtype = self.dtype(table, columns)
+        sql = (f'SELECT {", ".join(dtype.names)} FROM {table}'
+               + (f' WHERE {where}' if where else '')
+               + (f' ORDER BY {order}' if order else ''))
+        lRows = self.connection.execute(sql, params).fetchall()
+        aData = np.zeros(len(lRows), dtype=dtype)
+        if lRows:
+            for name, lValues in zip(dtype.names, zip(*lRows)):
+                if dtype[name].kind == 'i':
+                    lValues = [INT_NULL if v is None else v for v in lValues]
+                elif dtype[name].kind == 'U':
+                    lValues = ['' if v is None else v for v in lValues]
+                aData[name] = lValues
+        return aData
+
+    def step(self, k, table='traj', columns=None):
+        """ Vehicles at step k, ordered by id"""
+        return self.select(table, 'k = ?', (int(k),), columns)
+
+    def at(self, ti, table='traj', columns=None):
+        """ Vehicles at time ti (float or str)"""
+        return self.step(to_step(ti), table, columns)
+
+    def vehicle(self, veh_id, table='traj', columns=None):
+        """ Trajectory of one vehicle, ordered by step"""
+        return self.select(table, 'id = ?', (int(veh_id),), columns,
+                           order='k')
+
+    def window(self, k0, k1, table='traj', columns=None):
+        """ Vehicles for steps k0 <= k <= k1, ordered by step and id"""
+        return self.select(table, 'k BETWEEN ? AND ?', (int(k0), int(k1)),
+                           columns)
+
+    def scenario(self, name, table='runs', columns=None):
+        """ Rows of one scenario of a batch (see runner.py)"""
+        return self.select(table, 'scenario = ?', (name,), columns)
+
+    def scenarios(self, table='runs'):
+        """ Scenario names present in a table"""
+        return [row[0] for row in self.connection.execute(
+            f'SELECT DISTINCT scenario FROM {table} ORDER BY scenario')]
+
+    def table(self, table='traj', columns=None):
+        """ Whole table, ordered by step and id"""
+        return self.select(table, columns=columns)
+
+    def steps(self, table='traj'):
+        """ Steps present in a table"""
+        return np.array([row[0] for row in self.connection.execute(
+            f'SELECT DISTINCT k FROM {table} ORDER BY k')], dtype=np.int64)
+
+    def vehicles(self, table='traj'):
+        """ Vehicle ids present in a table"""
+        return np.array([row[0] for row in self.connection.execute(
+            f'SELECT DISTINCT id FROM {table} ORDER BY id')], dtype=np.int64)
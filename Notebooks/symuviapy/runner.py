@@ -0,0 +1,303 @@
+"""
+    Parallel SymuVia runs of demand scenarios
+
+    libSymuVia keeps the loaded network in global state, so a process
+    can only simulate one scenario at a time. run_batch starts worker
+    processes (spawned, each loads its own library instance) that take
+    scenarios from a shared queue. A scenario is a network file with
+    overrides of the demand levels and of the seed:
+
+        lScenario = [Scenario('../Network/Merge.xml', seed=s,
+                              demand={'Ext_In_onramp': f})
+                     for s in (1, 2, 3) for f in (0.5, 1.0, 1.5)]
+        lReport = run_batch(lScenario, '../Output/batch', processes=4)
+
+    Every worker streams the open loop trajectories of its scenarios
+    (leaders and spacing included) into its own database
+    (worker_<i>.sqlite, table runs, column scenario), see query.py:
+
+        TrajectoryDB(worker_path('../Output/batch', 0)).scenario(name)
+
+    The networks of a worker are written with their schema to
+    worker_<i>/, where SymuVia also writes its own outputs.
+"""
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from symuviapy import frame as vf
+from symuviapy.leaders import LeaderRegistry
+from symuviapy.session import SymuviaSession
+from symuviapy.writer import TrajectoryWriter
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+ERROR = 'error'
+
+TABLE = 'runs'
+XSI = 'http://www.w3.org/2001/XMLSchema-instance'
+
+
+def worker_path(dirname, index):
+    """ Database of a worker"""
+    return os.path.join(dirname, f'worker_{index}.sqlite')
+
+
+def worker_dir(dirname, index):
+    """ Networks of a worker, SymuVia writes its outputs next to them"""
+    return os.path.join(dirname, f'worker_{index}')
+
+
+def set_demand(extremity, demand):
+    """ Overrides the DEMANDE levels of an extremity
+
+        demand: factor applied to all levels (number) or list of
+        (level, duration) replacing the demand profile
+    """
+    eDemands = extremity.find('.//DEMANDES')
+    if eDemands is None:
+        raise KeyError(f'No DEMANDES for {extremity.get("id")}')
+    if isinstance(demand, (int, float)):
+        for eDemand in eDemands.iter('DEMANDE'):
+            eDemand.set('niveau', repr(float(eDemand.get('niveau'))
+                                       * demand))
+        return
+    for eDemand in list(eDemands):
+        eDemands.remove(eDemand)
+    for level, duration in demand:
+        ET.SubElement(eDemands, 'DEMANDE', niveau=repr(float(level)),
+                      duree=repr(duration))
+
+
+def copy_schema(source, root, dirname):
+    """ Copies the schema of a network (noNamespaceSchemaLocation) to
+        dirname, if it is not there
+    """
+    sSchema = root.get(f'{{{XSI}}}noNamespaceSchemaLocation')
+    if not sSchema or os.path.isabs(sSchema):
+        return None
+    source = os.path.join(os.path.dirname(os.path.abspath(source)), sSchema)
+    target = os.path.join(dirname, sSchema)
+    if os.path.exists(source) and not os.path.exists(target):
+        shutil.copyfile(source, target)
+    return target
+
+
+def write_network(source, target, demand=None, seed=None):
+    """ Copy of a network file with demand / seed overrides
+
+        demand: {extremity id: factor or [(level, duration)]}
+        The schema of the network is copied next to target.
+    """
+    ET.register_namespace('xsi', XSI)
+    tree = ET.parse(source)
+    root = tree.getroot()
+    if seed is not None:
+        for eSimulation in root.iter('SIMULATION'):
+            eSimulation.set('seed', str(seed))
+    dExtremity = {e.get('id'): e for e in
+                  root.iterfind('TRAFICS/TRAFIC/EXTREMITES/EXTREMITE')}
+    for sExtremity, value in (demand or {}).items():
+        if sExtremity not in dExtremity:
+            raise KeyError(f'Unknown extremity {sExtremity}')
+        set_demand(dExtremity[sExtremity], value)
+    tree.write(target, encoding='UTF-8', xml_declaration=True)
+    copy_schema(source, root, os.path.dirname(os.path.abspath(target)))
+    return target
+
+
+class Scenario:
+    """
+    Network file with demand and seed overrides
+
+    Scenario(network = str, demand = dict, seed = int, name = str)
+
+    demand: {extremity id: factor or [(level, duration)]}, see
+    write_network. The default name is built from the overrides.
+    """
+
+    def __init__(self, network: str, demand: dict = None, seed: int = None,
+                 name: str = None):
+        self.network = network
+        self.demand = dict(demand or {})
+        self.seed = seed
+        self.name = name or self.default_name()
+
+    def default_name(self):
+        sName = os.path.splitext(os.path.basename(self.network))[0]
+        for sExtremity, value in sorted(self.demand.items()):
+            sValue = (f'{value:g}' if isinstance(value, (int, float))
+                      else '-'.join(f'{level:g}' for level, _ in value))
+            sName += f'_{sExtremity}_{sValue}'
+        if self.seed is not None:
+            sName += f'_seed_{self.seed}'
+        return sName
+
+    def write(self, dirname):
+        """ Network file of the scenario in dirname"""
+        if not self.demand and self.seed is None:
+            return self.network
+        return write_network(self.network,
+                             os.path.join(dirname, self.name + '.xml'),
+                             self.demand, self.seed)
+
+    def to_dict(self):
+        return {'network': self.network, 'demand': self.demand,
+                'seed': self.seed, 'name': self.name}
+
+    def __repr__(self):
+        return f'Scenario({self.name})'
+
+
+class RunReport:
+    """
+    Outcome of one scenario of a batch
+
+    RunReport(index = int, scenario = Scenario)
+    """
+
+    def __init__(self, index: int, scenario: Scenario):
+        self.index = index
+        self.scenario = scenario
+        self.status = None
+        self.error = None
+        self.worker = None
+        self.n_steps = 0
+        self.n_rows = 0
+        self.elapsed = 0.0
+
+    @property
+    def name(self):
+        return self.scenario.name
+
+    def __str__(self):
+        return (f'{self.name}: {self.status} (worker {self.worker}, '
+                f'{self.n_steps} steps, {self.n_rows} rows, '
+                f'{self.elapsed:.1f} s)'
+                + (f' {self.error}' if self.error else ''))
+
+
+def simulate(session, scenario, writer, n_steps, sample_every):
+    """ Open loop run of one (loaded) scenario, returns (steps, rows)"""
+    registry = LeaderRegistry()
+    n_rows = 0
+    for k, ti, aTraj in session.run(n_steps, sample_every):
+        frame = vf.typedict(ti, aTraj, session.links)
+        if not len(frame):
+            continue
+        frame.ldr = registry.update(frame)
+        frame = vf.updatelist(frame, spc=vf.getspace(frame),
+                              vld=vf.getleaderspeed(frame))
+        lRows = frame.to_dicts()
+        for dRow in lRows:
+            dRow['scenario'] = scenario.name
+        writer.write(TABLE, lRows)
+        n_rows += len(lRows)
+    return session.n_steps, n_rows
+
+
+def _worker(index, library, dirname, n_steps, sample_every, q_in, q_out):
+    """ Runs scenarios from q_in until None, reports to q_out"""
+    if callable(library):
+        library = library()
+    writer = TrajectoryWriter(worker_path(dirname, index))
+    network_dir = worker_dir(dirname, index)
+    os.makedirs(network_dir, exist_ok=True)
+    session = None
+    try:
+        while True:
+            task = q_in.get()
+            if task is None:
+                break
+            i, scenario = task
+            t_0 = time.monotonic()
+            dResult = {'worker': index}
+            try:
+                network = scenario.write(network_dir)
+                if session is None:
+                    session = SymuviaSession(network, library)
+                else:
+                    session.load(network)
+                dResult['n_steps'], dResult['n_rows'] = simulate(
+                    session, scenario, writer, n_steps, sample_every)
+                writer.flush()
+                status, error = OK, None
+            except Exception as e:
+                status, error = ERROR, repr(e)
+            dResult['elapsed'] = time.monotonic() - t_0
+            q_out.put((i, status, error, dResult))
+    finally:
+        if session is not None:
+            session.close()
+        writer.close()
+
+
+def run_batch(l_scenario, dirname, processes=None, library=None,
+              n_steps=None, sample_every=1, callback=None):
+    """ Runs all scenarios in worker processes
+
+        library: path of libSymuVia (default of session.load_library)
+        or a picklable factory of a library object
+        n_steps: max. steps of a run (default: until the end of the
+        simulation)
+        callback(report) is called in the parent when a scenario ends.
+        Returns one RunReport per scenario, in the order of l_scenario.
+    """
+    os.makedirs(dirname, exist_ok=True)
+    processes = min(processes or os.cpu_count() or 1, len(l_scenario))
+    n_steps = n_steps or sys.maxsize
+    l_report = [RunReport(i, scenario) for i, scenario in
+                enumerate(l_scenario)]
+    if not l_report:
+        return l_report
+
+    context = mp.get_context('spawn')  # no library state inherited
+    q_in, q_out = context.Queue(), context.Queue()
+    for report in l_report:
+        q_in.put((report.index, report.scenario))
+    for _ in range(processes):
+        q_in.put(None)
+    l_proc = [context.Process(target=_worker, daemon=True,
+                              args=(i, library, dirname, n_steps,
+                                    sample_every, q_in, q_out))
+              for i in range(processes)]
+    for proc in l_proc:
+        proc.start()
+
+    n_pending = len(l_report)
+    while n_pending:
+        try:
+            i, status, error, dResult = q_out.get(timeout=1.0)
+        except queue.Empty:
+            if not any(proc.is_alive() for proc in l_proc):
+                break
+            continue
+        report = l_report[i]
+        report.status, report.error = status, error
+        for key, value in dResult.items():
+            setattr(report, key, value)
+        n_pending -= 1
+        if status != OK:
+            logger.warning('%s', report)
+        if callback is not None:
+            callback(report)
+
+    for proc in l_proc:
+        proc.join()
+    for report in l_report:
+        if report.status is None:
+            report.status = ERROR
+            report.error = 'worker exited before the end of the scenario'
+
+    with open(os.path.join(dirname, 'scenarios.json'), 'w') as f:
+        json.dump([dict(report.scenario.to_dict(), status=report.status,
+                        worker=report.worker) for report in l_report],
+                  f, indent=1)
+    return l_report
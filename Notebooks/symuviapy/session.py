@@ -0,0 +1,271 @@
+"""
+    SymuVia session
+
+    Loads libSymuVia once per process, declares the prototypes of the
+    functions used by the notebooks and keeps the output buffer and
+    the encoded link / type names between calls:
+
+        session = SymuviaSession(network_file)
+        for k, ti, aTraj in session.run(1200, sample_every=10):
+            ...
+        session.drive_many(aId, aLink, aLane, aPos)   # aLink: link codes
+
+    The link codes are those of session.links, the Codebook of the
+    session (see frame.py).
+
+    Steps that are not sampled are run without trace (no XML output).
+    SymRunNextStepEx returns a C++ bool and sets its bEnd out-parameter
+    at the end of the simulation: the session finishes when bEnd is set
+    and raises a RuntimeError when a step returns False before the end.
+    The output buffer grows when a step fills more than GROW_RATIO of
+    it (SymRunNextStepEx does not receive the size of the buffer).
+
+    library may also be an object with the same functions (e.g. the
+    headless simulator of symuviapy.headless).
+"""
+import logging
+import os
+from ctypes import (cdll, create_string_buffer, byref, c_int, c_double,
+                    c_bool, c_char, c_char_p, POINTER)
+
+import numpy as np
+
+from symuviapy.frame import Codebook, LINK_NAMES
+from symuviapy.stepparser import parse_inst
+
+logger = logging.getLogger(__name__)
+
+LIB_PATH = ('..', 'Symuvia', 'Contents', 'Frameworks', 'libSymuVia.dylib')
+BUFFER_SIZE = 100000
+GROW_RATIO = 0.5
+
+# (argtypes, restype) of the library functions
+PROTOTYPES = {
+    'SymLoadNetworkEx': ([c_char_p], c_int),
+    'SymRunNextStepEx': ([POINTER(c_char), c_bool, POINTER(c_int)], c_bool),
+    'SymCreateVehicleEx': ([c_char_p, c_char_p, c_char_p, c_int, c_double],
+                           c_int),
+    'SymDriveVehicleEx': ([c_int, c_char_p, c_int, c_double, c_int], c_int),
+}
+
+_LIBRARIES = {}
+
+
+def load_library(path=None):
+    """ libSymuVia loaded once per process, with its prototypes"""
+    path = os.path.realpath(path or os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), '..', *LIB_PATH))
+    if path not in _LIBRARIES:
+        library = cdll.LoadLibrary(path)
+        for name, (argtypes, restype) in PROTOTYPES.items():
+            function = getattr(library, name)
+            function.argtypes = argtypes
+            function.restype = restype
+        _LIBRARIES[path] = library
+    return _LIBRARIES[path]
+
+
+class SymuviaSession:
+    """
+    Simulation of one network with a loaded library
+
+    SymuviaSession(network = str, library = str or object,
+                   buffer_size = int)
+    """
+
+    def __init__(self, network: str, library=None,
+                 buffer_size: int = BUFFER_SIZE):
+        if library is None or isinstance(library, str):
+            library = load_library(library)
+        self.library = library
+        self.network = network
+        self.sRequest = create_string_buffer(buffer_size)
+        self.bEnd = c_int()
+        self.status = None
+        self.dName = {}
+        self.links = Codebook(LINK_NAMES)
+        self.n_steps = 0
+        self.n_grow = 0
+        self._batch = None
+        self.load()
+
+    def close(self):
+        """ Releases the buffers and the library, the session ends"""
+        self.bEnd.value = 1
+        self._batch = None
+        self.sRequest = None
+        self.library = None
+
+    def encode(self, name):
+        """ Encoded link / type name (cached)"""
+        try:
+            return self.dName[name]
+        except KeyError:
+            self.dName[name] = name.encode('UTF8')
+            return self.dName[name]
+
+    def load(self, network=None):
+        """ (Re)loads the network, the simulation starts at t = 0"""
+        self.network = network or self.network
+        self.n_steps = 0
+        self.bEnd.value = 0
+        self.status = None
+        result = self.library.SymLoadNetworkEx(self.encode(self.network))
+        if not result:
+            raise RuntimeError(f'SymuVia could not load {self.network}')
+        return result
+
+    @property
+    def buffer_size(self):
+        return len(self.sRequest)
+
+    def _grow(self, n_used):
+        """ Larger buffer for the next steps when this one is nearly full"""
+        if n_used >= self.buffer_size - 1:
+            logger.warning('Step %d: output filled the buffer (%d bytes), '
+                           'it may be truncated', self.n_steps,
+                           self.buffer_size)
+        if n_used > GROW_RATIO * self.buffer_size:
+            size = self.buffer_size
+            while n_used > GROW_RATIO * size:
+                size *= 2
+            self.sRequest = create_string_buffer(size)
+            self.n_grow += 1
+
+    def step(self, trace=True, parse=True):
+        """ Runs one step
+
+            Returns (ti, aTraj) when parse, the output bytes when only
+            trace, None without trace or once the simulation has ended.
+            Raises a RuntimeError when SymuVia fails to run the step.
+        """
+        if self.bEnd.value:
+            return None
+        self.status = bool(self.library.SymRunNextStepEx(
+            self.sRequest, trace, byref(self.bEnd)))
+        if not self.status:
+            if self.bEnd.value:
+                logger.info('End of the simulation after %d steps',
+                            self.n_steps)
+                return None
+            raise RuntimeError(f'SymuVia failed at step {self.n_steps + 1}')
+        self.n_steps += 1
+        if self.bEnd.value:
+            logger.info('End of the simulation after %d steps',
+                        self.n_steps)
+        if not trace:
+            return None
+        bRequest = self.sRequest.value
+        self._grow(len(bRequest))
+        return parse_inst(bRequest) if parse else bRequest
+
+    @property
+    def finished(self):
+        return bool(self.bEnd.value)
+
+    def run(self, n_steps, sample_every=1, parse=True):
+        """ Runs n_steps steps, yields (k, output) every sample_every
+
+            Intermediate steps run without trace. output is (ti, aTraj)
+            when parse, else the output bytes.
+        """
+        for k in range(n_steps):
+            bSample = (k + 1) % sample_every == 0
+            output = self.step(trace=bSample, parse=parse)
+            if self.finished and output is None:
+                return
+            if bSample and output is not None:
+                yield (k, *output) if parse else (k, output)
+
+    def create(self, sType, sOrigin, sDestination, nLane=1, dTime=0.0):
+        """ Creates a vehicle, returns its id"""
+        return self.library.SymCreateVehicleEx(
+            self.encode(sType), self.encode(sOrigin),
+            self.encode(sDestination), int(nLane), float(dTime))
+
+    def drive(self, nId, sLink, nLane, dPos, bForce=True):
+        """ Moves one vehicle, returns the status of SymDriveVehicleEx"""
+        return self.library.SymDriveVehicleEx(int(nId), self.encode(sLink),
+                                              int(nLane), float(dPos),
+                                              int(bForce))
+
+    def drive_many(self, aId, aLink, aLane, aPos, bForce=True):
+        """ Moves many vehicles (see DriveBatch), returns the statuses"""
+        if self._batch is None:
+            self._batch = DriveBatch(self)
+        return self._batch(aId, aLink, aLane, aPos, bForce)
+
+
+class DriveBatch:
+    """
+    SymDriveVehicleEx for arrays of vehicles
+
+    DriveBatch(session = SymuviaSession, links = Codebook, size = int)
+
+    Links are given as codes of links (session.links by default), their
+    encoded names are kept in a table indexed by code. The arguments
+    are converted to Python lists once per batch and SymDriveVehicleEx
+    is still called once per vehicle (libSymuVia has no batched entry
+    point): the batch saves the encoding and the ctypes objects built
+    at every call in the notebooks, not the cost of the calls. The
+    status array is reused between batches (doubled when a batch is
+    larger). A failing vehicle (negative status or rejected call) is
+    logged and does not stop the batch.
+    """
+    FAILED_CALL = -1000  # status of a call rejected before reaching C
+
+    def __init__(self, session, links=None, size=64):
+        self.session = session
+        self.links = links if links is not None else session.links
+        self.lLink = []
+        self.aStatus = np.zeros(size, dtype=np.int32)
+        self.n_calls = 0
+        self.n_failed = 0
+
+    def _link_table(self, max_code):
+        """ Encoded names of the links up to max_code"""
+        for code in range(len(self.lLink), max_code + 1):
+            self.lLink.append(self.session.encode(self.links.names[code]))
+        return self.lLink
+
+    def __call__(self, aId, aLink, aLane, aPos, bForce=True):
+        """ Drives all vehicles, returns the status of each vehicle
+
+            The returned array is reused by the next batch.
+        """
+        aLink = np.asarray(aLink)
+        n = len(aLink)
+        if n > len(self.aStatus):
+            self.aStatus = np.zeros(max(n, 2 * len(self.aStatus)),
+                                    dtype=np.int32)
+        aStatus = self.aStatus[:n]
+        if not n:
+            return aStatus
+
+        if aLink.dtype.kind in 'US':
+            aLink = self.links.encode(aLink)
+        lTable = self._link_table(int(aLink.max()))
+        lId = np.asarray(aId).tolist()
+        lLink = [lTable[code] for code in aLink.tolist()]
+        lLane = np.asarray(aLane).tolist()
+        lPos = np.asarray(aPos, dtype=float).tolist()
+
+        drive = self.session.library.SymDriveVehicleEx
+        nForce = int(bForce)
+        lStatus = []
+        for nId, sLink, nLane, dPos in zip(lId, lLink, lLane, lPos):
+            try:
+                lStatus.append(drive(nId, sLink, nLane, dPos, nForce))
+            except Exception as e:
+                logger.warning('SymDriveVehicleEx(%d) rejected: %s', nId, e)
+                lStatus.append(self.FAILED_CALL)
+        aStatus[:] = lStatus
+
+        self.n_calls += n
+        bFailed = aStatus < 0
+        if bFailed.any():
+            self.n_failed += int(bFailed.sum())
+            logger.warning('SymDriveVehicleEx failed for ids %s (status %s)',
+                           np.asarray(aId)[bFailed].tolist(),
+                           aStatus[bFailed].tolist())
+        return aStatus
@@ -0,0 +1,213 @@
+"""
+    Parser for the instant XML returned by SymRunNextStepEx
+
+    Reads the vehicles of INST/TRAJS/TRAJ directly from the bytes of
+    the ctypes buffer into a NumPy structured array with the fields of
+    typedict (id, type, tron, voie, dst, abs, vit):
+
+        ti, aTraj = parse_inst(sRequest)
+
+    aTraj has one row per vehicle, zero rows for an empty network and
+    one row for a single vehicle (no special cases for the caller).
+    The string fields (type, tron) are widened to the longest value of
+    the step when it does not fit TRAJ_DTYPE: names are never truncated.
+
+    parse_inst matches all TRAJ elements with one regular expression
+    built from the attribute order of the first vehicle, and falls back
+    to the expat parser (parse_inst_expat) when the other vehicles do
+    not follow the same layout, or when the vehicles contain an entity
+    or character reference (&amp;, &#38;...) to unescape.
+"""
+import re
+from functools import lru_cache
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+TRAJ_DTYPE = np.dtype([('id', 'i8'),
+                       ('type', 'U8'),
+                       ('tron', 'U32'),
+                       ('voie', 'i4'),
+                       ('dst', 'f8'),
+                       ('abs', 'f8'),
+                       ('vit', 'f8'),
+                       ])
+
+RE_TI = re.compile(rb'<INST\b[^>]*?\sval="([^"]*)"')
+RE_TRAJ = re.compile(rb'<TRAJ\s')
+RE_FIRST = re.compile(rb'<TRAJ\s([^>]*?)/?>')
+RE_NAME = re.compile(rb'([\w:.-]+)\s*=\s*"')
+
+
+STR_FIELDS = tuple(name for name in TRAJ_DTYPE.names
+                   if TRAJ_DTYPE[name].kind == 'U')
+
+
+def str_width(dtype):
+    """ Number of characters of a unicode dtype"""
+    return dtype.itemsize // np.dtype('U1').itemsize
+
+
+@lru_cache(maxsize=8)
+def traj_regex(tAttr):
+    """ Regex of a TRAJ element with attributes in the order tAttr
+
+        Captures the fields of TRAJ_DTYPE in the order of tAttr.
+    """
+    lPattern = [rb'<TRAJ']
+    for name in tAttr:
+        value = rb'([^"]*)' if name.decode() in TRAJ_DTYPE.names \
+            else rb'[^"]*'
+        lPattern.append(rb'\s+' + re.escape(name) + rb'="' + value + rb'"')
+    lPattern.append(rb'\s*/?>')
+    return re.compile(b''.join(lPattern))
+
+
+def _to_bytes(sRequest):
+    """ Bytes of a ctypes buffer, bytes or str"""
+    if hasattr(sRequest, 'value'):
+        sRequest = sRequest.value
+    if isinstance(sRequest, str):
+        sRequest = sRequest.encode('UTF8')
+    return sRequest
+
+
+@lru_cache(maxsize=32)
+def traj_dtype(tWidth=()):
+    """ TRAJ_DTYPE with string fields widened to tWidth ((name, width),)"""
+    dWidth = dict(tWidth)
+    lFields = []
+    for name in TRAJ_DTYPE.names:
+        dtype = TRAJ_DTYPE[name]
+        if name in dWidth and dWidth[name] > str_width(dtype):
+            dtype = np.dtype(f'U{dWidth[name]}')
+        lFields.append((name, dtype))
+    return np.dtype(lFields)
+
+
+def empty_traj(n=0, dWidth=None):
+    """ Structured array of n vehicles
+
+        dWidth: {field: characters} of string fields longer than
+        TRAJ_DTYPE
+    """
+    if not dWidth:
+        return np.zeros(n, dtype=TRAJ_DTYPE)
+    return np.zeros(n, dtype=traj_dtype(tuple(sorted(dWidth.items()))))
+
+
+def decode(aBytes):
+    """ Unicode array of a bytes array (UTF8)"""
+    try:
+        return aBytes.astype(str)
+    except UnicodeDecodeError:
+        return np.char.decode(aBytes, 'UTF8')
+
+
+def trajs_block(bRequest):
+    """ Content of the TRAJS element (empty for <TRAJS/> or no TRAJS)"""
+    i_start = bRequest.find(b'<TRAJS')
+    if i_start < 0:
+        return b''
+    i_start = bRequest.find(b'>', i_start) + 1
+    if bRequest[i_start-2:i_start] == b'/>':
+        return b''
+    i_end = bRequest.find(b'</TRAJS', i_start)
+    if i_end < 0:
+        raise ValueError('TRAJS element is not closed')
+    return bRequest[i_start:i_end]
+
+
+def parse_inst(sRequest):
+    """ Time and vehicles (structured array) of an instant XML"""
+    bRequest = _to_bytes(sRequest)
+
+    match = RE_TI.search(bRequest)
+    if match is None:
+        raise ValueError('No INST element in the step output')
+    ti = float(match.group(1))
+
+    bTrajs = trajs_block(bRequest)
+    n = len(RE_TRAJ.findall(bTrajs))
+    if not n:
+        return ti, empty_traj()
+    if b'&' in bTrajs:
+        return parse_inst_expat(bRequest)
+
+    # Attribute order of the first vehicle (the same for all vehicles)
+    tAttr = tuple(RE_NAME.findall(RE_FIRST.search(bTrajs).group(1)))
+    lFields = [name.decode() for name in tAttr
+               if name.decode() in TRAJ_DTYPE.names]
+    if sorted(lFields) != sorted(TRAJ_DTYPE.names):
+        return parse_inst_expat(bRequest)
+    lRows = traj_regex(tAttr).findall(bTrajs)
+    if len(lRows) != n:
+        return parse_inst_expat(bRequest)
+
+    dValues = dict(zip(lFields, zip(*lRows)))
+    dStr = {name: decode(np.array(dValues[name])) for name in STR_FIELDS}
+    aTraj = empty_traj(n, {name: str_width(aStr.dtype)
+                           for name, aStr in dStr.items()})
+    for name, lValues in dValues.items():
+        dtype = TRAJ_DTYPE[name]
+        if dtype.kind == 'U':
+            aTraj[name] = dStr[name]
+        elif dtype.kind == 'f':
+            aTraj[name] = np.fromiter(map(float, lValues), dtype, n)
+        else:
+            aTraj[name] = np.fromiter(map(int, lValues), dtype, n)
+    return ti, aTraj
+
+
+def parse_inst_expat(sRequest):
+    """ Time and vehicles of an instant XML (expat parser)"""
+    ti = None
+    lRows = []
+    names = TRAJ_DTYPE.names
+    bInTrajs = []
+
+    def start(tag, dAttr):
+        nonlocal ti
+        if tag == 'INST':
+            ti = float(dAttr['val'])
+        elif tag == 'TRAJS':
+            bInTrajs.append(True)
+        elif tag == 'TRAJ' and bInTrajs:
+            lRows.append(tuple(dAttr[name] for name in names))
+
+    def end(tag):
+        if tag == 'TRAJS':
+            bInTrajs.pop()
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.Parse(_to_bytes(sRequest), True)
+
+    if ti is None:
+        raise ValueError('No INST element in the step output')
+
+    if not lRows:
+        return ti, empty_traj()
+    aRaw = np.array(lRows)
+    dStr = {name: aRaw[:, names.index(name)] for name in STR_FIELDS}
+    aTraj = empty_traj(len(lRows), {name: int(np.char.str_len(aStr).max())
+                                    for name, aStr in dStr.items()})
+    for j, name in enumerate(names):
+        aTraj[name] = aRaw[:, j].astype(aTraj.dtype[name])
+    return ti, aTraj
+
+
+def format_inst(ti, aTraj):
+    """ Instant XML (bytes) of time ti and vehicles aTraj"""
+    dQuote = {'"': '&quot;'}
+    lTraj = [f'<TRAJ abs="{v["abs"]:.2f}" acc="0.00" dst="{v["dst"]:.2f}" '
+             f'id="{v["id"]}" tron="{escape(v["tron"], dQuote)}" '
+             f'type="{escape(v["type"], dQuote)}" '
+             f'vit="{v["vit"]:.2f}" voie="{v["voie"]}" z="0.00"/>'
+             for v in aTraj]
+    sTrajs = f'<TRAJS>{"".join(lTraj)}</TRAJS>' if lTraj else '<TRAJS/>'
+    return (f'<INST nbVeh="{len(aTraj)}" val="{ti:.2f}"><CREATIONS/>'
+            f'<SORTIES/>{sTrajs}<STREAMS/><LINKS/><SGTS/><FEUX/>'
+            f'<ENTREES/><REGULATIONS/></INST>').encode('UTF8')
@@ -19,6 +19,8 @@ U_MIN = -1.5 # Min. AccelerationDT = 0.1 # Sample time
 
 from collections import Counter
 
+import numpy as np
+
 # Identify Leader 
 def queueveh(dLeader, veh):
     """
@@ -44,6 +46,19 @@ def getlead(dLeader, veh):
         return dLeader[veh['tron']][idx]
         # Spacing 
 
+def leader_rows(aId, aLdr):
+    """
+        Row of the leader of each vehicle (-1 if the leader is
+        not in the network): ids are sorted once and every leader
+        is found by binary search
+    """
+    if not len(aId):
+        return np.full(len(aLdr), -1)
+    idx = np.argsort(aId, kind='stable')
+    aSorted = aId[idx]
+    pos = np.minimum(np.searchsorted(aSorted, aLdr), len(aId) - 1)
+    return np.where(aSorted[pos] == aLdr, idx[pos], -1)
+
 def getspace(lTrajVeh):    
     """
         This function obtains spacing between two vehicles 
@@ -61,20 +76,15 @@ def getspace(lTrajVeh):
             return [{'spc':None}] 
     except (TypeError, IndexError):        
         # Multiple veh @ ti
-        space = []
-        for veh in lTrajVeh:
-            if veh['id'] == veh['ldr']:
-                space.append(0.0+det_eq_s(veh))
-            else:             
-                veh_pos = veh['abs']
-                ldr_id = veh['ldr']
-                ldr_pos = [ldr['abs'] for ldr in lTrajVeh if ldr['id']==ldr_id]
-                if ldr_pos:
-                    space.append(ldr_pos[0]-veh_pos)
-                else:
-                    # Leader out of Network @ ti
-                    space.append(0.0)
-        space_dct = [{'spc': val} for val in space]
+        aId = np.array([veh['id'] for veh in lTrajVeh], dtype=int)
+        aLdr = np.array([veh['ldr'] for veh in lTrajVeh], dtype=int)
+        aAbs = np.array([veh['abs'] for veh in lTrajVeh], dtype=float)
+        aEq = np.array([det_eq_s(veh) for veh in lTrajVeh], dtype=float)
+        rows = leader_rows(aId, aLdr)
+        # Leader out of Network @ ti: 0.0
+        space = np.where(rows >= 0, aAbs[rows] - aAbs, 0.0)
+        space = np.where(aId == aLdr, 0.0 + aEq, space)
+        space_dct = [{'spc': val} for val in space.tolist()]
         return space_dct
 
 # Spacing 
@@ -92,18 +102,13 @@ def getleaderspeed(lTrajVeh):
             return [{'vld':None}]                     
     except (TypeError, IndexError):        
         # Multiple veh @ ti
-        speedldr = []
-        for veh in lTrajVeh:
-            if veh['id'] == veh['ldr']:
-                speedldr.append(veh['vit'])
-            else:             
-                ldr_id = veh['ldr']
-                ldr_vit = [ldr['vit'] for ldr in lTrajVeh if ldr['id']==ldr_id]
-                if ldr_vit:
-                    speedldr.append(ldr_vit[0])
-                else:
-                    speedldr.append(veh['vit'])
-        speedldr_dct = [{'vld': val} for val in speedldr]
+        aId = np.array([veh['id'] for veh in lTrajVeh], dtype=int)
+        aLdr = np.array([veh['ldr'] for veh in lTrajVeh], dtype=int)
+        aVit = np.array([veh['vit'] for veh in lTrajVeh], dtype=float)
+        rows = leader_rows(aId, aLdr)
+        # Platoon head or leader out of Network @ ti: own speed
+        speedldr = np.where(rows >= 0, aVit[rows], aVit)
+        speedldr_dct = [{'vld': val} for val in speedldr.tolist()]
         return speedldr_dct    
     
 def updatelist(lTrajVeh,lDict):
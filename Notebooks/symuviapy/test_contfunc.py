@@ -0,0 +1,299 @@
+"""
+    Unit test for control functions
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+from symuviapy.contfunc import (compute_control, compute_control_batch,
+                                SolverState, forward_evolution,
+                                forward_evolution_loop, backward_evolution,
+                                backward_evolution_loop, GCAV,
+                                find_projection, find_projections,
+                                find_anticipation_time,
+                                solve_tactical_arrays, solve_tactical_problem,
+                                dveh_dwy, dveh_twy, W)
+import unittest
+
+
+def create_platoon(n_veh, seed=0):
+    """ Platoon rows as returned by the database query"""
+    rng = np.random.RandomState(seed)
+    return [(0.0, i, 'CAV', 'In_main', 1, 0.0, -25.0 * i,
+             20.0 + rng.rand(), i-1 if i else 0,
+             30.0 + 5 * rng.rand(), 20.0 + rng.rand())
+            for i in range(n_veh)]
+
+
+def create_approach(n_veh, seed=0):
+    """ Vehicles approaching the merge (id 0 leads, 30% HDV)"""
+    rng = np.random.RandomState(seed)
+    return [{'id': i, 'type': 'HDV' if i and rng.rand() < 0.3 else 'CAV',
+             'abs': 1000.0 - 40 * i - 20 * rng.rand(),
+             'vit': 15.0 + 10 * rng.rand(), 'ti': '10.0'}
+            for i in range(n_veh)]
+
+
+def create_reference(h, n_veh, seed=0):
+    """ Time headway reference around equilibrium"""
+    rng = np.random.RandomState(seed)
+    return GCAV + 0.2 * rng.rand(h, n_veh)
+
+
+def solve_tactical_reference(lVehDataFormat):
+    """ Events of the tactical problem as solved in the notebooks"""
+    # Find Xm, Tm
+    vehLeader = min(((-x['abs'] / x['vit'],
+                      float(x['ti']) - x['abs'] / x['vit'])
+                     for x in lVehDataFormat), key=lambda t: t[0])
+    gm = (0.0, vehLeader[1])
+
+    lProj = [{'pg': find_projection((x['abs'], float(x['ti'])), x['vit'],
+                                    gm, W),
+              'id': x['id'], 'bound': x['id'] == 0 or x['type'] == 'HDV',
+              'tau': dveh_twy[x['type']], 'd': dveh_dwy[x['type']],
+              'type': x['type'], 'abs': x['abs'], 'ti': float(x['ti'])}
+             for x in lVehDataFormat]
+    lProjSort = sorted(lProj, key=lambda t: t['pg'][1])
+    lBound = [x for x in lProjSort if x['bound']]
+    veh2Alloc = iter([x for x in lProjSort if not x['bound']])
+
+    # Veh to allocate behind each boundary, last one takes the rest
+    lNumVehAlloc = [max((y['pg'][1] - x['pg'][1] - x['tau']) // GCAV + 1,
+                        0.0) for x, y in zip(lBound[:-1], lBound[1:])]
+    lNumVehAlloc.append(len(lProjSort) - len(lBound) - sum(lNumVehAlloc))
+
+    for veh, number in zip(lBound, lNumVehAlloc):
+        pg_eq = veh['pg']
+        t_ant, t_yld = find_anticipation_time(veh, 0.0)
+        veh.update(d_tau=0.0, tau_f=veh['tau'], t_ant=t_ant, t_yld=t_yld)
+        for _ in range(int(number)):
+            cav = next(veh2Alloc)  # StopIteration: gaps exceed the CAVs
+            pg_eq = np.array([pg_eq[0] - veh['d'], pg_eq[1] + veh['tau']])
+            d_tau = pg_eq[1] - cav['pg'][1]
+            t_ant, t_yld = find_anticipation_time(cav, d_tau)
+            cav.update(d_tau=d_tau, tau_f=veh['tau'] + d_tau, t_ant=t_ant,
+                       t_yld=t_yld)
+
+    return {np.round(x['t_yld'], 1): (x['id'], x['tau'], x['tau_f'],
+                                      x['t_ant'])
+            for x in lProj if x['type'] == 'CAV'}
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_forward_evolution(self):
+        """
+        Vector and loop forward sweeps are identical
+        """
+        rng = np.random.RandomState(1)
+        X = [rng.rand(50, 8) for _ in range(3)]
+        U, DU = rng.rand(50, 8), rng.rand(50, 8)
+        loop = forward_evolution_loop(*(x.copy() for x in X), U, DU)
+        vect = forward_evolution(*(x.copy() for x in X), U, DU)
+        for a, b in zip(loop, vect):
+            assert_array_equal(a, b)
+
+    def test_backward_evolution(self):
+        """
+        Vector and loop backward sweeps are identical
+        """
+        rng = np.random.RandomState(2)
+        X = [rng.rand(50, 8) for _ in range(3)]
+        Tgref = create_reference(50, 8)
+        loop = backward_evolution_loop(*X, Tgref)
+        vect = backward_evolution(*X, Tgref)
+        for a, b in zip(loop, vect):
+            assert_array_equal(a, b)
+
+    def test_compute_control(self):
+        """
+        Both sweep engines return the same control
+        """
+        results = create_platoon(4)
+        h_ref = create_reference(20, 4)
+        ldr = [0, 0, 1, 2]
+        loop = compute_control(results, h_ref, 0, ldr, sweep='loop')
+        vect = compute_control(results, h_ref, 0, ldr, sweep='vector')
+        self.assertEqual(loop[-1], vect[-1])
+        for a, b in zip(loop[:-1], vect[:-1]):
+            assert_array_equal(a, b)
+
+    def test_engines(self):
+        """
+        Accelerated engines reach the control of the relaxation
+        """
+        results = create_platoon(4)
+        h_ref = create_reference(20, 4)
+        ldr = [0, 0, 1, 2]
+        relax = compute_control(results, h_ref, 0, ldr)
+        for engine in ('adaptive', 'nesterov', 'anderson'):
+            out = compute_control(results, h_ref, 0, ldr, engine=engine)
+            with self.subTest(engine=engine):
+                self.assertLess(out[-1], relax[-1])
+                assert_allclose(out[3], relax[3], atol=5e-2)
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_compute_control_batch(self):
+        """
+        Batched solve matches platoon by platoon solves
+        """
+        dims = [(20, 4), (20, 2), (15, 3)]
+        l_results = [create_platoon(n, b) for b, (_, n) in enumerate(dims)]
+        l_h_ref = [create_reference(h, n, b)
+                   for b, (h, n) in enumerate(dims)]
+        l_ldr = [[0] + list(range(n-1)) for _, n in dims]
+        l_out = compute_control_batch(l_results, l_h_ref, l_ldr)
+        self.assertEqual(len(l_out), len(dims))
+        for results, h_ref, ldr, batch in zip(l_results, l_h_ref,
+                                              l_ldr, l_out):
+            single = compute_control(results, h_ref, 0, ldr)
+            self.assertEqual(single[-1], batch[-1])
+            for a, b in zip(single[:-1], batch[:-1]):
+                assert_allclose(a, b)
+
+
+class TestSolverState(unittest.TestCase):
+
+    def test_shift(self):
+        """
+        Costates are shifted by one sample, last sample is zero
+        """
+        state = SolverState()
+        Ls, Lv, bWarm = state.initial_guess((5, 2))
+        self.assertFalse(bWarm)
+        state.update(np.arange(10.).reshape(5, 2), np.ones((5, 2)), 10,
+                     bWarm)
+        Ls, Lv, bWarm = state.initial_guess((5, 2))
+        self.assertTrue(bWarm)
+        assert_array_equal(Ls[:-1], np.arange(2., 10.).reshape(4, 2))
+        assert_array_equal(Ls[-1], 0)
+        assert_array_equal(Lv[-1], 0)
+        # New platoon composition
+        _, _, bWarm = state.initial_guess((5, 3))
+        self.assertFalse(bWarm)
+
+    def test_warm_start(self):
+        """
+        Warm started horizon needs fewer iterations
+        """
+        results = create_platoon(4)
+        h_ref = create_reference(21, 4)
+        ldr = [0, 0, 1, 2]
+        state = SolverState(check=True)
+        compute_control(results, h_ref[:-1], 0, ldr, state=state)
+        compute_control(results, h_ref[1:], 0, ldr, state=state)
+        self.assertEqual(state.l_warm, [False, True])
+        self.assertLess(state.l_iter[1], state.l_cold[1])
+        self.assertGreater(state.iterations_saved, 0)
+
+
+class TestTactical(unittest.TestCase):
+
+    def test_projections(self):
+        """
+        Closed form projections solve the 2x2 systems
+        """
+        rng = np.random.RandomState(0)
+        aX, aT, aV = rng.rand(3, 20) * [[1000], [10], [25]]
+        gm = (0.0, -30.0)
+        aPgX, aPgT = find_projections(aX, aT, aV, gm, W)
+        for x, t, v, pgx, pgt in zip(aX, aT, aV, aPgX, aPgT):
+            assert_allclose(find_projection((x, t), v, gm, W), (pgx, pgt))
+
+    def test_allocation(self):
+        """
+        CAVs follow their boundary at its headway, in projection order
+        """
+        for seed in range(20):
+            lVeh = create_approach(50, seed)
+            dTable = solve_tactical_arrays(*zip(*(
+                (x['id'], x['type'], x['abs'], x['vit'], float(x['ti']))
+                for x in lVeh)))
+            aOrder, iLdr = dTable['order'], dTable['ldr']
+            assert_array_equal(np.sort(aOrder), np.arange(50))
+            assert_array_equal(dTable['bound'],
+                               (dTable['id'] == 0) |
+                               (dTable['type'] == 'HDV'))
+            aRank = aOrder - aOrder[iLdr]
+            aD = np.array([dveh_dwy[x] for x in dTable['type']])[iLdr]
+            aTau = np.array([dveh_twy[x] for x in dTable['type']])[iLdr]
+            assert_allclose(dTable['pg_eq'], dTable['pg'][iLdr]
+                            + aRank[:, None] * np.column_stack((-aD, aTau)))
+            assert_allclose(dTable['tau_f'], aTau + dTable['d_tau'])
+            # Boundaries and CAVs keep their natural order
+            iSeq = np.argsort(aOrder)
+            bBound = dTable['bound'][iSeq]
+            for b in (bBound, ~bBound):
+                self.assertTrue((np.diff(dTable['pg'][iSeq][b, 1]) >= 0)
+                                .all())
+            # Gaps hold at most the CAVs fitting before the next boundary
+            aBoundT = dTable['pg'][iSeq][bBound, 1]
+            aNum = np.diff(np.flatnonzero(np.append(bBound, True))) - 1
+            aFit = (np.diff(aBoundT) - aTau[iSeq][bBound][:-1]) // GCAV + 1
+            self.assertTrue((aNum[:-1] <= np.maximum(aFit, 0)).all())
+
+            dEvent = solve_tactical_problem(lVeh)
+            bCAV = dTable['type'] == 'CAV'
+            self.assertEqual(set(dEvent),
+                             set(np.round(dTable['t_yld'][bCAV], 1)))
+
+    def test_reference(self):
+        """
+        Same events as the notebook solver when it finds a solution
+        """
+        n_solved = 0
+        for n_veh, seed in zip((5, 10, 20) * 30, range(90)):
+            lVeh = create_approach(n_veh, seed)
+            try:
+                dRef = solve_tactical_reference(lVeh)
+            except StopIteration:
+                continue
+            n_solved += 1
+            dEvent = solve_tactical_problem(lVeh)
+            self.assertEqual(set(dEvent), set(dRef))
+            for key, tRef in dRef.items():
+                self.assertEqual(dEvent[key][0], tRef[0])
+                assert_allclose(dEvent[key][1:], tRef[1:])
+        self.assertGreater(n_solved, 5)
+
+    def test_clamping(self):
+        """
+        Gaps holding more CAVs than available are filled in order
+
+        The notebook solver raised StopIteration in this case.
+        """
+        n_clamped = 0
+        for seed in range(20):
+            lVeh = create_approach(30, seed)
+            try:
+                solve_tactical_reference(lVeh)
+                continue
+            except StopIteration:
+                n_clamped += 1
+            dTable = solve_tactical_arrays(*zip(*(
+                (x['id'], x['type'], x['abs'], x['vit'], float(x['ti']))
+                for x in lVeh)))
+            iSeq = np.argsort(dTable['pg'][:, 1], kind='stable')
+            iBound = iSeq[dTable['bound'][iSeq]]
+            n_alloc = len(lVeh) - len(iBound)
+            aCount = np.bincount(dTable['ldr'][~dTable['bound']],
+                                 minlength=len(lVeh))[iBound]
+            aGap = (np.diff(dTable['pg'][iBound, 1])
+                    - dTable['tau'][iBound][:-1])
+            aFit = np.maximum(aGap // GCAV + 1, 0)
+            n_left = n_alloc
+            for n, n_fit in zip(aCount, aFit):
+                self.assertEqual(n, min(n_fit, n_left))
+                n_left -= n
+            self.assertEqual(aCount.sum(), n_alloc)
+            self.assertEqual(len(solve_tactical_problem(lVeh)),
+                             len(set(np.round(dTable['t_yld'][
+                                 dTable['type'] == 'CAV'], 1))))
+        self.assertGreater(n_clamped, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+    Unit test for costate update engines
+"""
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from symuviapy.engines import dengine, fp_error, Relaxation
+import unittest
+
+
+def affine_map(X):
+    """ Contractive affine map with fixed point 1"""
+    return 0.5 * (X - 1) + 1
+
+
+class TestEngine(unittest.TestCase):
+
+    def test_relaxation(self):
+        """
+        Fixed relaxation step and error after the update
+        """
+        X = np.zeros((2, 3, 2))
+        GX = np.ones((2, 3, 2))
+        X_new, error = Relaxation(0.1).update(X, GX)
+        assert_allclose(X_new, 0.1)
+        self.assertAlmostEqual(error, 2 * 0.9 * np.sqrt(6))
+
+    def test_stopping_rule(self):
+        """
+        All engines measure the error after the update
+        """
+        rng = np.random.RandomState(0)
+        for name, engine in dengine.items():
+            update = engine(0.1)
+            X = np.zeros((2, 5, 3))
+            for n in range(5):
+                GX = affine_map(X) + 0.1 * rng.normal(size=X.shape)
+                X, error = update.update(X, GX)
+                with self.subTest(engine=name, n=n):
+                    self.assertAlmostEqual(error, fp_error(X, GX))
+
+    def test_fixed_point(self):
+        """
+        All engines reach the fixed point
+        """
+        for name, engine in dengine.items():
+            update = engine(0.02)
+            X = np.zeros((2, 5, 3))
+            for n in range(5000):
+                X, error = update.update(X, affine_map(X))
+                if error < 1e-8:
+                    break
+            with self.subTest(engine=name):
+                self.assertLess(error, 1e-8)
+                assert_allclose(X, 1, atol=1e-7)
+
+    def test_acceleration(self):
+        """
+        Accelerated engines need fewer iterations than relaxation
+        """
+        l_iter = {}
+        for name, engine in dengine.items():
+            update = engine(0.02)
+            X = np.zeros((2, 5, 3))
+            for n in range(5000):
+                X, error = update.update(X, affine_map(X))
+                if error < 1e-3:
+                    break
+            l_iter[name] = n
+        for name in ('adaptive', 'nesterov', 'anderson'):
+            self.assertLess(l_iter[name], l_iter['relax'])
+
+
+if __name__ == "__main__":
+    unittest.main()
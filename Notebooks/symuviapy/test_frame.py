@@ -0,0 +1,99 @@
+"""
+    Unit test for the columnar vehicle frame
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from symuviapy.frame import (VehicleFrame, Codebook, LINK_NAMES, typedict,
+                             updatelist, getspace, getleaderspeed)
+from symuviapy import symfunc
+from symuviapy.test_stepparser import create_traj
+import unittest
+
+LEGACY = ('id', 'type', 'tron', 'voie', 'dst', 'abs', 'vit', 'ldr')
+
+
+def create_frame(n_veh, seed=0):
+    """ Frame with leaders: heads, vehicles in the frame and out of it"""
+    rng = np.random.RandomState(seed)
+    frame = typedict(1.0, create_traj(n_veh, seed))
+    frame.ldr = np.where(rng.rand(n_veh) < 0.2, frame.id,
+                         rng.randint(0, n_veh + 5, n_veh))
+    return frame
+
+
+class TestFrame(unittest.TestCase):
+
+    def test_legacy(self):
+        """
+        Spacing and leader speed equal the list of dicts functions
+        """
+        for n_veh in (2, 10, 100):
+            with self.subTest(n_veh=n_veh):
+                frame = create_frame(n_veh)
+                lTrajVeh = frame.to_dicts(LEGACY)
+                lTrajVeh = symfunc.updatelist(lTrajVeh,
+                                              symfunc.getspace(lTrajVeh))
+                lTrajVeh = symfunc.updatelist(
+                    lTrajVeh, symfunc.getleaderspeed(lTrajVeh))
+                frame = updatelist(frame, spc=getspace(frame),
+                                   vld=getleaderspeed(frame))
+                assert_array_equal(frame.spc, [v['spc'] for v in lTrajVeh])
+                assert_array_equal(frame.vld, [v['vld'] for v in lTrajVeh])
+
+    def test_dicts(self):
+        """
+        Conversion from and to a list of dicts, single and empty steps
+        """
+        frame = create_frame(20)
+        lTrajVeh = frame.to_dicts()
+        self.assertEqual(lTrajVeh[3]['tron'], frame.links[3])
+        frame_back = VehicleFrame.from_dicts(lTrajVeh)
+        for name in ('id', 'type', 'tron', 'abs', 'ldr'):
+            assert_array_equal(getattr(frame_back, name), getattr(frame, name))
+
+        single = VehicleFrame.from_dicts(lTrajVeh[0])
+        self.assertEqual(len(single), 1)
+        self.assertEqual(len(VehicleFrame.from_dicts([])), 0)
+        self.assertEqual(len(getspace(VehicleFrame())), 0)
+
+    def test_single(self):
+        """
+        A single vehicle gets the values of symfunc for a single dict
+        """
+        for ldr in (0, 3):
+            with self.subTest(ldr=ldr):
+                frame = create_frame(1)
+                frame.ldr[:] = ldr
+                dVeh = frame.to_dicts(LEGACY)[0]
+                self.assertEqual(getspace(frame)[0],
+                                 symfunc.getspace(dVeh)[0]['spc'])
+                self.assertEqual(getleaderspeed(frame)[0],
+                                 symfunc.getleaderspeed(dVeh)[0]['vld'])
+        frame = updatelist(frame, spc=getspace(frame))
+        self.assertTrue(np.isnan(frame.spc[0]))
+
+    def test_codes(self):
+        """
+        Codes are stable and new names are appended
+        """
+        book = Codebook(('CAV', 'HDV'))
+        assert_array_equal(book.encode(['HDV', 'BUS', 'CAV', 'BUS']),
+                           [1, 2, 0, 2])
+        assert_array_equal(book.decode([2, 0]), ['BUS', 'CAV'])
+
+        # Link codes of one run, new links do not leak to other runs
+        aTraj = create_traj(4)
+        aTraj['tron'][0] = 'Ext_link'
+        links = Codebook(LINK_NAMES)
+        frame = typedict(0.1, aTraj, links)
+        self.assertIs(frame.take([0]).book, links)
+        self.assertEqual(frame.links[0], 'Ext_link')
+        self.assertEqual(len(links.names), len(LINK_NAMES) + 1)
+        self.assertEqual(len(typedict(0.1, create_traj(4)).book.names),
+                         len(LINK_NAMES))
+
+
+if __name__ == '__main__':
+    unittest.main()
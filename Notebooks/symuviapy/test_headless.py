@@ -0,0 +1,98 @@
+"""
+    Unit test for the headless simulator
+"""
+
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from symuviapy.headless import (HeadlessSymuVia, Network, UNKNOWN_LANE,
+                                UNKNOWN_LINK, UNKNOWN_ORIGIN, UNKNOWN_TYPE,
+                                UNKNOWN_VEHICLE)
+from symuviapy.session import SymuviaSession
+import unittest
+
+NETWORK = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..',
+                       '..', 'Network', 'Merge_Demand_CAV.xml')
+
+
+class TestHeadless(unittest.TestCase):
+
+    def test_network(self):
+        """
+        Time, vehicle types, links, movements and demand are read
+        """
+        network = Network(NETWORK)
+        self.assertEqual((network.dt, network.n_steps), (0.1, 1200))
+        self.assertEqual(network.types, ['CAV', 'HDV'])
+        assert_allclose(network.aKx, [0.16, 0.0896])
+        assert_allclose(network.aAx[0], [1.5, 1, 0.5])
+        dLink = {link.id: link for link in network.links}
+        self.assertAlmostEqual(dLink['In_main'].length, 1000.0, places=2)
+        iMerge = network.dLink['Merge_zone']
+        self.assertEqual(dLink['In_main'].dNext, {1: (iMerge, 2)})
+        self.assertEqual(dLink['In_onramp'].dNext, {1: (iMerge, 1)})
+        self.assertEqual(network.aExitLane[iMerge, 1], 2)
+        self.assertEqual(network.entries['Ext_In_main'][0],
+                         [(0.8, 10.0), (0.0, 100.0)])
+
+    def test_run(self):
+        """
+        Demand enters, vehicles follow the Newell model and exit
+        """
+        library = HeadlessSymuVia()
+        session = SymuviaSession(NETWORK, library)
+        dTraj = {}
+        for k, ti, aTraj in session.run(2000):
+            assert_allclose(aTraj['vit'], library.aVit, atol=5e-3)
+            for veh in aTraj:
+                dTraj.setdefault(veh['id'], []).append(
+                    (ti, veh['tron'], veh['abs'], veh['vit']))
+        self.assertTrue(session.finished)
+        self.assertEqual(session.n_steps, 1200)
+        lIn = [lTraj[0][1] for lTraj in dTraj.values()]
+        self.assertEqual(lIn.count('In_main'), 8)
+        self.assertEqual(lIn.count('In_onramp'), 2)
+        self.assertEqual(library.n_exited, 10)
+        for lTraj in dTraj.values():
+            aVit = np.array([v for _, _, _, v in lTraj])
+            self.assertTrue(((aVit >= 0) & (aVit <= 25.0)).all())
+            self.assertLessEqual(np.diff(aVit).max(), 1.5 * 0.1 + 1e-2)
+            self.assertEqual([tron for _, tron, _, _ in lTraj][-1],
+                             'Out_main')
+
+    def test_create_drive(self):
+        """
+        A stopped vehicle makes the followers stop at the jam spacing
+        """
+        library = HeadlessSymuVia()
+        session = SymuviaSession(NETWORK, library)
+        nId = session.create('HDV', 'Ext_In_onramp', 'Ext_Out_main')
+        self.assertEqual(session.create('BUS', 'Ext_In_main', 'Ext_Out_main'),
+                         UNKNOWN_TYPE)
+        self.assertEqual(session.create('CAV', 'Ext_Out', 'Ext_Out_main'),
+                         UNKNOWN_ORIGIN)
+        ti, aTraj = session.step()
+        assert_array_equal(aTraj['id'], [nId])
+        self.assertEqual((aTraj['type'][0], aTraj['tron'][0]),
+                         ('HDV', 'In_onramp'))
+
+        self.assertEqual(session.drive(nId, 'Ramp', 1, 1.0), UNKNOWN_LINK)
+        self.assertEqual(session.drive(nId, 'In_main', 2, 1.0),
+                         UNKNOWN_LANE)
+        self.assertEqual(session.drive(99, 'In_main', 1, 1.0),
+                         UNKNOWN_VEHICLE)
+        for k in range(400):
+            ti, aTraj = session.step()
+            session.drive(nId, 'In_main', 1, 300.0)
+        bMain = aTraj['tron'] == 'In_main'
+        aDst = np.sort(aTraj['dst'][bMain])[::-1]
+        self.assertEqual(aDst[0], 300.0)
+        self.assertEqual(len(aDst), 9)  # demand of In_main + nId
+        assert_allclose(-np.diff(aDst), 1 / 0.16, atol=0.05)
+        assert_allclose(aTraj['vit'][bMain], 0.0, atol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
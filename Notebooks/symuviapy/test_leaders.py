@@ -0,0 +1,101 @@
+"""
+    Unit test for the leader registry
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from symuviapy.leaders import LeaderRegistry
+from symuviapy.symfunc import queueveh, getlead
+import unittest
+
+
+class TestLeaders(unittest.TestCase):
+
+    def test_order(self):
+        """
+        Leader is the next vehicle ahead on the same link
+        """
+        registry = LeaderRegistry()
+        aLdr = registry.update_arrays([4, 1, 7, 2, 9],
+                                      ['In_main', 'In_main', 'In_onramp',
+                                       'In_main', 'In_onramp'],
+                                      [-300.0, -10.0, -50.0, -200.0, -20.0])
+        assert_array_equal(aLdr, [2, 1, 9, 1, 9])
+        self.assertEqual(registry.leader(4), 2)
+        assert_array_equal(registry.queue('In_main'), [1, 2, 4])
+
+    def test_queueveh(self):
+        """
+        Same leaders as queueveh/getlead when vehicles enter in order
+        """
+        lVeh = [{'id': i, 'tron': 'In_main', 'abs': -25.0 * i}
+                for i in range(6)]
+        dLeader = {}
+        lRef = []
+        for veh in lVeh:
+            dLeader = queueveh(dLeader, veh)
+            lRef.append(getlead(dLeader, veh))
+        LeaderRegistry().update_dicts(lVeh)
+        self.assertEqual([veh['ldr'] for veh in lVeh], lRef)
+
+    def test_eviction(self):
+        """
+        Vehicles leaving the network are dropped, changes are counted
+        """
+        registry = LeaderRegistry()
+        registry.update_arrays([0, 1, 2], [0, 0, 0], [30.0, 20.0, 10.0])
+        aLdr = registry.update_arrays([1, 2, 3], [1, 0, 0],
+                                      [40.0, 15.0, 5.0])
+        assert_array_equal(aLdr, [1, 2, 2])
+        self.assertNotIn(0, registry)
+        self.assertEqual(len(registry), 3)
+        self.assertEqual(registry.n_evicted, 1)
+        self.assertEqual(len(registry.update_arrays([], [], [])), 0)
+        self.assertEqual(len(registry), 0)
+        self.assertIn('evicted= 4', str(registry))
+
+    def test_incremental(self):
+        """
+        The map follows queueveh/getlead over the steps of a run
+        """
+        rng = np.random.RandomState(0)
+        registry = LeaderRegistry()
+        dLeader = {}
+        lId, lTron, lStart = [], [], []
+        for k in range(120):
+            # Vehicles enter two links (every 4 and 6 steps) and move
+            # along them without overtaking (queueveh never drops a
+            # vehicle from a link, so none leaves its link)
+            for link, period in (('In_main', 4), ('In_onramp', 6)):
+                if k % period == 0:
+                    lId.append(len(lId))
+                    lTron.append(link)
+                    lStart.append(k)
+            aId = np.array(lId)
+            aTron = np.array(lTron)
+            aAbs = 10.0 * (k - np.array(lStart)) + rng.uniform(0, 1,
+                                                               len(aId))
+            aPerm = rng.permutation(len(aId))
+            aId, aTron, aAbs = aId[aPerm], aTron[aPerm], aAbs[aPerm]
+
+            lVeh = [{'id': i, 'tron': t}
+                    for i, t in zip(aId.tolist(), aTron.tolist())]
+            for veh in lVeh:
+                dLeader = queueveh(dLeader, veh)
+            lRef = [getlead(dLeader, veh) for veh in lVeh]
+
+            aLdr = registry.update_arrays(aId, aTron, aAbs)
+            assert_array_equal(aLdr, lRef)
+            self.assertEqual(registry.dLeader,
+                             dict(zip(aId.tolist(), lRef)))
+        # Only the vehicles entering get a leader
+        self.assertEqual(registry.n_changed, len(lId))
+
+        # Same vehicles and leaders: the map is not updated
+        registry.update_arrays(aId[::-1], aTron[::-1], aAbs[::-1] + 1.0)
+        self.assertEqual(registry.n_changed, len(lId))
+
+
+if __name__ == '__main__':
+    unittest.main()
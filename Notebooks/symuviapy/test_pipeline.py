@@ -0,0 +1,117 @@
+"""
+    Unit test for the pipelined simulation loop
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from symuviapy.pipeline import (Pipeline, Stage, simulator_source,
+                                closed_loop_source, open_loop_stages,
+                                closed_loop_stages, parse_step)
+from symuviapy.leaders import LeaderRegistry
+from symuviapy.query import TrajectoryDB
+from symuviapy.stepparser import format_inst
+from symuviapy.writer import TrajectoryWriter
+from symuviapy.test_stepparser import create_traj
+import unittest
+
+
+def create_simulator(n_steps, n_veh, delay=0.0):
+    """ step() returning the instant XML of n_steps steps"""
+    l_steps = [format_inst(k / 10, create_traj(n_veh, k))
+               for k in range(n_steps)]
+    iterator = iter(l_steps)
+
+    def step():
+        time.sleep(delay)  # simulator computing (GIL released)
+        bRequest = next(iterator, None)
+        return bRequest is not None, bRequest
+    return step
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_open_loop(self):
+        """
+        All steps go through parsing, spacing and persistence in order
+        """
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, 'SymOut.sqlite')
+            with TrajectoryWriter(path) as writer:
+                pipe = Pipeline(simulator_source(create_simulator(30, 8)),
+                                open_loop_stages(LeaderRegistry(), writer))
+                dReport = pipe.run()
+            with TrajectoryDB(path) as db:
+                assert_array_equal(db.steps('traj'), np.arange(30))
+                aStep = db.step(7)
+        self.assertEqual([d['items'] for d in dReport.values()], [30] * 4)
+        frame = parse_step(format_inst(0.7, create_traj(8, 7)))
+        assert_array_equal(aStep['abs'], frame.abs[np.argsort(frame.id)])
+        self.assertIn('persist', str(pipe))
+
+    def test_overlap(self):
+        """
+        Stages run concurrently and keep the order of the items
+        """
+        lOut = []
+
+        def work(item):
+            time.sleep(0.01)
+            return item
+
+        pipe = Pipeline(range(20), [Stage('a', work), Stage('b', work),
+                                    Stage('sink', lOut.append)])
+        dReport = pipe.run()
+        self.assertEqual(lOut, list(range(20)))
+        # Sequential stages would share the wall time (sum below 100 %)
+        self.assertGreater(dReport['a']['occupancy']
+                           + dReport['b']['occupancy'], 1.0)
+
+    def test_closed_loop(self):
+        """
+        The control of step k is applied before step k+1 is simulated
+        """
+        lEvents = []
+        simulator = create_simulator(12, 5)
+
+        def step():
+            lEvents.append('step')
+            return simulator()
+
+        def control(frame):
+            return ('drive', len(frame))
+
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, 'SymOut.sqlite')
+            with TrajectoryWriter(path) as writer:
+                stages, feedback = closed_loop_stages(LeaderRegistry(),
+                                                      control, writer)
+                pipe = Pipeline(closed_loop_source(step, lEvents.append),
+                                stages, feedback=feedback)
+                dReport = pipe.run()
+            with TrajectoryDB(path) as db:
+                assert_array_equal(db.steps('closed'), np.arange(12))
+        self.assertEqual(lEvents, ['step', ('drive', 5)] * 12 + ['step'])
+        self.assertEqual([d['items'] for d in dReport.values()], [12] * 5)
+
+    def test_error(self):
+        """
+        An error in a stage stops the pipeline and is raised
+        """
+        def fail(item):
+            if item == 5:
+                raise ValueError('stage failed')
+            return item
+
+        pipe = Pipeline(range(1000), [Stage('fail', fail, maxsize=2),
+                                      Stage('sink', lambda x: x)])
+        with self.assertRaises(ValueError):
+            pipe.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+    Unit test for the indexed queries over the output database
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+from symuviapy.query import TrajectoryDB
+from symuviapy.writer import TrajectoryWriter
+from symuviapy.test_writer import create_step
+import unittest
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'SymOut.sqlite')
+        with TrajectoryWriter(self.path) as writer:
+            for k in range(50):
+                lRows = create_step(f'{k / 10:.2f}', 5 + k % 3)
+                lRows[-1]['spc'] = None
+                writer.write('closed', lRows)
+
+    def test_accessors(self):
+        """
+        Step, time, vehicle and window queries return typed arrays
+        """
+        with TrajectoryDB(self.path) as db:
+            aStep = db.step(13, 'closed')
+            self.assertEqual(len(aStep), 5 + 13 % 3)
+            assert_array_equal(aStep['id'], np.arange(len(aStep)))
+            assert_allclose(aStep['ti'], 1.3)
+            self.assertTrue(np.isnan(aStep['spc'][-1]))
+            self.assertEqual(aStep['tron'][0], 'In_main')
+            assert_array_equal(db.at('1.30', 'closed')['id'], aStep['id'])
+
+            aVeh = db.vehicle(6, 'closed', columns=['k', 'vit'])
+            assert_array_equal(aVeh['k'], np.arange(2, 50, 3))
+            self.assertEqual(aVeh.dtype.names, ('k', 'vit'))
+
+            aWin = db.window(10, 12, 'closed')
+            assert_array_equal(np.unique(aWin['k']), [10, 11, 12])
+            self.assertEqual(len(db.step(100, 'closed')), 0)
+            assert_array_equal(db.steps('closed'), np.arange(50))
+
+    def test_index(self):
+        """
+        Step queries use the (k, id) index, old tables are migrated
+        """
+        with TrajectoryDB(self.path, migrate=True) as db:
+            plan = db.connection.execute('EXPLAIN QUERY PLAN SELECT * FROM '
+                                         'closed WHERE k = 3').fetchall()
+        self.assertIn('closed_k_id', str(plan))
+
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('CREATE TABLE old (ti FLOAT, id INTEGER)')
+            connection.execute('DROP TABLE headway')
+            connection.execute('DROP TABLE runs')
+            connection.execute('CREATE TABLE headway (ti FLOAT, id INTEGER, '
+                               'gapt FLOAT)')
+            connection.execute('INSERT INTO headway VALUES (0.3, 1, 1.5)')
+        with TrajectoryDB(self.path) as db:
+            db.migrate()
+            assert_array_equal(db.step(3, 'headway')['gapt'], [1.5])
+
+            # Rows inserted without k, as by the notebooks
+            db.connection.execute('INSERT INTO headway (ti, id, gapt) '
+                                  "VALUES ('0.40', 2, 1.2)")
+            assert_array_equal(db.step(4, 'headway')['id'], [2])
+            lTables = [row[0] for row in db.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        self.assertNotIn('runs', lTables)
+
+    def test_read_only(self):
+        """
+        Opening a database without migrate leaves it unchanged
+        """
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('CREATE TABLE headway_old (ti FLOAT)')
+            lBefore = list(connection.iterdump())
+        with TrajectoryDB(self.path) as db:
+            self.assertEqual(len(db.step(3, 'closed')), 5)
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(list(connection.iterdump()), lBefore)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+    Unit test for the parallel scenario runner
+
+    Workers use the recording library of test_session instead of
+    libSymuVia.
+"""
+
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+from symuviapy.query import TrajectoryDB
+from symuviapy.runner import (Scenario, run_batch, worker_dir,
+                              worker_path, write_network, OK)
+from symuviapy.test_session import RecordingLibrary
+import unittest
+
+NETWORK = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..',
+                       '..', 'Network', 'Merge_Demand_CAV.xml')
+
+
+class TestRunner(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dirname = tmp.name
+
+    def test_write_network(self):
+        """
+        Demand factors, demand profiles and the seed are overridden
+        """
+        target = write_network(
+            NETWORK, os.path.join(self.dirname, 'net.xml'), seed=7,
+            demand={'Ext_In_main': 0.5,
+                    'Ext_In_onramp': [(0.3, 20), (0, 99)]})
+        root = ET.parse(target).getroot()
+        self.assertEqual(root.find('.//SIMULATION').get('seed'), '7')
+        dDemand = {e.get('id'): [(float(d.get('niveau')), d.get('duree'))
+                                 for d in e.iter('DEMANDE')]
+                   for e in root.iterfind('.//EXTREMITES/EXTREMITE')
+                   if e.find('.//DEMANDES') is not None}
+        self.assertEqual(dDemand['Ext_In_main'], [(0.4, '10'), (0.0, '100')])
+        self.assertEqual(dDemand['Ext_In_onramp'], [(0.3, '20'), (0.0, '99')])
+        self.assertEqual(len(list(root.iter('TRONCON'))), 8)
+        self.assertTrue(os.path.exists(os.path.join(self.dirname,
+                                                    'reseau.xsd')))
+        with self.assertRaises(KeyError):
+            write_network(NETWORK, target, demand={'Ext_Unknown': 1.0})
+
+    def test_run_batch(self):
+        """
+        Scenarios are shared among workers, each worker has its store
+        """
+        lScenario = [Scenario(NETWORK, seed=seed,
+                              demand={'Ext_In_onramp': factor})
+                     for seed in (1, 2) for factor in (0.5, 1.5)]
+        lScenario.append(Scenario(NETWORK, demand={'Ext_Unknown': 1.0}))
+        lReport = run_batch(lScenario, self.dirname, processes=2,
+                            library=RecordingLibrary, n_steps=10)
+
+        self.assertEqual([r.status == OK for r in lReport],
+                         [True] * 4 + [False])
+        self.assertIn('KeyError', lReport[-1].error)
+        dRows = {}
+        for index in {r.worker for r in lReport}:
+            with TrajectoryDB(worker_path(self.dirname, index)) as db:
+                for name in db.scenarios():
+                    dRows[name] = db.scenario(name)
+        self.assertEqual(sorted(dRows), sorted(s.name for s in lScenario[:4]))
+        for report in lReport[:4]:
+            aRows = dRows[report.name]
+            self.assertEqual(len(aRows), report.n_rows)
+            self.assertEqual(len(aRows), sum(range(1, 11)))
+            self.assertTrue((aRows['scenario'] == report.name).all())
+        self.assertTrue(os.path.exists(os.path.join(self.dirname,
+                                                    'scenarios.json')))
+
+        # Networks and schema are kept next to the outputs
+        for report in lReport[:4]:
+            network_dir = worker_dir(self.dirname, report.worker)
+            self.assertTrue(os.path.exists(os.path.join(
+                network_dir, report.name + '.xml')))
+            self.assertTrue(os.path.exists(os.path.join(network_dir,
+                                                        'reseau.xsd')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+    Unit test for the SymuVia session
+
+    libSymuVia is replaced by a recording object with the same
+    functions.
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from symuviapy.session import SymuviaSession, DriveBatch
+from symuviapy.stepparser import format_inst
+from symuviapy.test_stepparser import create_traj
+import unittest
+
+
+class RecordingLibrary:
+    """ Functions of libSymuVia, step k outputs k vehicles"""
+
+    def __init__(self, n_steps=20, lFail=()):
+        self.n_steps = n_steps
+        self.lFail = lFail
+        self.l_calls = []
+
+    def SymLoadNetworkEx(self, sFile):
+        self.k = 0
+        self.l_calls.append(('load', sFile))
+        return 1
+
+    def SymRunNextStepEx(self, sRequest, bTrace, pbEnd):
+        self.l_calls.append(('step', bool(bTrace)))
+        if self.k + 1 in self.lFail:
+            return False
+        if self.k >= self.n_steps:
+            pbEnd._obj.value = 1
+            return False
+        self.k += 1
+        if bTrace:
+            bOutput = format_inst(self.k / 10, create_traj(self.k))
+            sRequest[:len(bOutput) + 1] = bOutput + b'\0'
+        pbEnd._obj.value = int(self.k >= self.n_steps)
+        return True
+
+    def SymDriveVehicleEx(self, nId, sLink, nLane, dPos, bForce):
+        self.l_calls.append(('drive', nId, sLink, nLane, dPos, bForce))
+        if nId == 0:
+            raise ValueError('unknown vehicle')
+        return -1 if nId < 0 else 0
+
+    def SymCreateVehicleEx(self, sType, sOrigin, sDestination, nLane, dTime):
+        self.l_calls.append(('create', sType, sOrigin, sDestination))
+        return 42
+
+
+class TestSession(unittest.TestCase):
+
+    def test_run(self):
+        """
+        Sampled steps are traced and parsed, the run stops at the end
+        """
+        library = RecordingLibrary(20)
+        session = SymuviaSession('Merge.xml', library, buffer_size=2000)
+        lOut = list(session.run(100, sample_every=5))
+        self.assertEqual([k for k, ti, aTraj in lOut], [4, 9, 14, 19])
+        self.assertEqual([len(aTraj) for k, ti, aTraj in lOut],
+                         [5, 10, 15, 20])
+        self.assertEqual(lOut[1][1], 1.0)
+        lTrace = [call[1] for call in library.l_calls if call[0] == 'step']
+        self.assertEqual(sum(lTrace), 4)
+        self.assertTrue(session.finished)
+        self.assertIsNone(session.step())
+
+    def test_status(self):
+        """
+        bEnd ends the simulation, False before the end raises
+        """
+        session = SymuviaSession('Merge.xml', RecordingLibrary(10))
+        lOut = list(session.run(100, sample_every=5))
+        self.assertEqual([k for k, ti, aTraj in lOut], [4, 9])
+        self.assertTrue(session.finished)
+        self.assertEqual((session.n_steps, session.status), (10, True))
+
+        # False with bEnd set: end, not a failure
+        session.bEnd.value = 0
+        self.assertIsNone(session.step())
+        self.assertTrue(session.finished)
+        self.assertEqual(session.n_steps, 10)
+
+        session = SymuviaSession('Merge.xml', RecordingLibrary(20, [3]))
+        with self.assertRaisesRegex(RuntimeError, 'failed at step 3'):
+            list(session.run(100))
+        self.assertFalse(session.finished)
+        self.assertEqual((session.n_steps, session.status), (2, False))
+
+    def test_close(self):
+        """
+        A closed session ends and no longer calls the library
+        """
+        library = RecordingLibrary(10)
+        session = SymuviaSession('Merge.xml', library)
+        session.step()
+        session.close()
+        n_calls = len(library.l_calls)
+        self.assertTrue(session.finished)
+        self.assertIsNone(session.step())
+        self.assertEqual(list(session.run(5)), [])
+        self.assertEqual(len(library.l_calls), n_calls)
+
+    def test_buffer(self):
+        """
+        The buffer grows before the output reaches its size
+        """
+        session = SymuviaSession('Merge.xml', RecordingLibrary(40),
+                                 buffer_size=4000)
+        for k, ti, aTraj in session.run(40):
+            self.assertEqual(len(aTraj), k + 1)
+        self.assertGreater(session.n_grow, 0)
+        self.assertGreater(session.buffer_size, 2 * 40 * 140)
+
+    def test_drive(self):
+        """
+        Names are encoded once, statuses are returned per vehicle
+        """
+        library = RecordingLibrary()
+        session = SymuviaSession('Merge.xml', library)
+        aStatus = session.drive_many([1, -2, 3], ['In_main'] * 3, [1, 1, 2],
+                                     np.array([10.0, 20.0, 30.0]))
+        assert_array_equal(aStatus, [0, -1, 0])
+        self.assertEqual(library.l_calls[-1],
+                         ('drive', 3, b'In_main', 2, 30.0, 1))
+        nCode = int(session.links.encode(['In_main'])[0])
+        self.assertIs(session._batch.lLink[nCode], session.dName['In_main'])
+        self.assertEqual(session.create('CAV', 'Ext_In_main',
+                                        'Ext_Out_main'), 42)
+
+    def test_drive_batch(self):
+        """
+        Link codes are mapped to names, failures do not stop the batch
+        """
+        library = RecordingLibrary()
+        session = SymuviaSession('Merge.xml', library)
+        batch = DriveBatch(session, size=2)
+        aLink = session.links.encode(['Out_main', 'Merge_zone', 'In_onramp',
+                                      'Out_main'])
+        with self.assertLogs('symuviapy.session', 'WARNING'):
+            aStatus = batch(np.array([4, 0, -6, 7]), aLink,
+                            np.array([1, 1, 1, 2]), [1.0, 2.0, 3.0, 4.0])
+        assert_array_equal(aStatus, [0, DriveBatch.FAILED_CALL, -1, 0])
+        lDrive = [call for call in library.l_calls if call[0] == 'drive']
+        self.assertEqual([call[2] for call in lDrive],
+                         [b'Out_main', b'Merge_zone', b'In_onramp',
+                          b'Out_main'])
+        self.assertEqual(lDrive[-1], ('drive', 7, b'Out_main', 2, 4.0, 1))
+        self.assertEqual((batch.n_calls, batch.n_failed), (4, 2))
+        self.assertEqual(len(batch.aStatus), 4)
+
+        # Status array reused by the next (smaller) batch
+        aNext = batch([8], aLink[:1], [1], [5.0], bForce=False)
+        assert_array_equal(aNext, [0])
+        self.assertTrue(np.shares_memory(aNext, aStatus))
+        self.assertEqual(library.l_calls[-1][-1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+    Unit test for the instant XML parser
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+from xmltodict import parse
+
+from symuviapy.stepparser import (parse_inst, parse_inst_expat, format_inst,
+                                  empty_traj, TRAJ_DTYPE)
+from symuviapy.symfunc import typedict
+import unittest
+
+
+def create_traj(n_veh, seed=0):
+    """ Vehicles on the merge network"""
+    rng = np.random.RandomState(seed)
+    aTraj = empty_traj(n_veh)
+    aTraj['id'] = np.arange(n_veh)
+    aTraj['type'] = np.where(rng.rand(n_veh) < 0.5, 'CAV', 'HDV')
+    aTraj['tron'] = rng.choice(['In_main', 'In_onramp', 'Merge_zone'],
+                               n_veh)
+    aTraj['voie'] = 1
+    aTraj['dst'] = np.round(1000 * rng.rand(n_veh), 2)
+    aTraj['abs'] = np.round(1000 * rng.rand(n_veh), 2)
+    aTraj['vit'] = np.round(25 * rng.rand(n_veh), 2)
+    return aTraj
+
+
+def typedict_reference(bRequest):
+    """ Vehicles as converted in the notebooks"""
+    dParsed = parse(bRequest.decode('UTF8'))
+    if dParsed['INST']['TRAJS'] is None:
+        return []
+    lVehDataRaw = dParsed['INST']['TRAJS']['TRAJ']
+    try:
+        return [typedict(lVehDataRaw)]
+    except TypeError:
+        return [typedict(veh) for veh in lVehDataRaw]
+
+
+class TestParser(unittest.TestCase):
+
+    def test_parse(self):
+        """
+        Same vehicles as xmltodict + typedict for 0, 1 and many vehicles
+        """
+        for n_veh in (0, 1, 2, 50):
+            with self.subTest(n_veh=n_veh):
+                bRequest = format_inst(12.3, create_traj(n_veh))
+                l_ref = typedict_reference(bRequest)
+                for parser in (parse_inst, parse_inst_expat):
+                    ti, aTraj = parser(bRequest)
+                    self.assertEqual(ti, 12.3)
+                    self.assertEqual(aTraj.dtype, TRAJ_DTYPE)
+                    self.assertEqual(len(aTraj), n_veh)
+                    for name in TRAJ_DTYPE.names:
+                        assert_array_equal(aTraj[name],
+                                           [v[name] for v in l_ref])
+
+    def test_no_trajs(self):
+        """
+        Output without TRAJS and input as str or ctypes buffer
+        """
+        from ctypes import create_string_buffer
+        sRequest = create_string_buffer(100)
+        sRequest.value = b'<INST nbVeh="0" val="0.10"><CREATIONS/></INST>'
+        ti, aTraj = parse_inst(sRequest)
+        self.assertEqual((ti, len(aTraj)), (0.1, 0))
+        ti, aTraj = parse_inst(sRequest.value.decode('UTF8'))
+        self.assertEqual((ti, len(aTraj)), (0.1, 0))
+
+    def test_fallback(self):
+        """
+        Attribute order does not matter, missing attributes use expat
+        """
+        bRequest = (b'<INST val="1.00"><TRAJS>'
+                    b'<TRAJ vit="2.5" id="3" type="CAV" tron="In_main" '
+                    b'voie="1" dst="4.0" abs="5.0"/>'
+                    b'<TRAJ id="4" type="HDV" tron="In_main" voie="1" '
+                    b'dst="1.0" abs="2.0" vit="3.0" etat="x"/>'
+                    b'</TRAJS></INST>')
+        ti, aTraj = parse_inst(bRequest)
+        assert_array_equal(aTraj['id'], [3, 4])
+        assert_allclose(aTraj['vit'], [2.5, 3.0])
+        with self.assertRaises(KeyError):
+            parse_inst(bRequest.replace(b' vit="3.0"', b''))
+
+    def test_long_names(self):
+        """
+        Link and type names longer than TRAJ_DTYPE are not truncated
+        """
+        sTron = 'Link_' + 'x' * 40 + '_end'
+        bRequest = ('<INST val="1.00"><TRAJS>'
+                    '<TRAJ id="3" type="CAV" tron="In_main" voie="1" '
+                    'dst="4.0" abs="5.0" vit="2.5"/>'
+                    f'<TRAJ id="4" type="Truck_heavy_1" tron="{sTron}" '
+                    'voie="1" dst="1.0" abs="2.0" vit="3.0"/>'
+                    '</TRAJS></INST>').encode('UTF8')
+        for parser in (parse_inst, parse_inst_expat):
+            with self.subTest(parser=parser.__name__):
+                ti, aTraj = parser(bRequest)
+                self.assertEqual(aTraj['tron'][1], sTron)
+                self.assertEqual(aTraj['type'][1], 'Truck_heavy_1')
+                self.assertEqual(aTraj.dtype['tron'], np.dtype('U49'))
+
+        # Headless vehicles of long link names
+        aTraj = empty_traj(1, {'tron': len(sTron)})
+        aTraj['tron'] = sTron
+        self.assertEqual(aTraj['tron'][0], sTron)
+        self.assertEqual(empty_traj(1, {'tron': 4}).dtype, TRAJ_DTYPE)
+
+    def test_entities(self):
+        """
+        Entities in names are unescaped as by expat and xmltodict
+        """
+        aTraj = create_traj(3)
+        aTraj['tron'] = ['A&B', 'In<main>', 'Merge"zone']
+        bRequest = format_inst(0.5, aTraj)
+        self.assertIn(b'A&amp;B', bRequest)
+        bRequest = bRequest.replace(b'In&lt;main&gt;', b'In&#60;main&#x3E;')
+        l_ref = typedict_reference(bRequest)
+        for parser in (parse_inst, parse_inst_expat):
+            with self.subTest(parser=parser.__name__):
+                ti, aTraj = parser(bRequest)
+                assert_array_equal(aTraj['tron'], [v['tron'] for v in l_ref])
+                assert_array_equal(aTraj['tron'],
+                                   ['A&B', 'In<main>', 'Merge"zone'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+    Unit test for spacing and leader speed of symfunc
+"""
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from symuviapy.symfunc import (getspace, getleaderspeed, leader_rows,
+                               SCAV, SHDV)
+import unittest
+
+
+def getspace_scan(lTrajVeh):
+    """ Spacing by scanning all vehicles (former implementation)"""
+    space = []
+    for veh in lTrajVeh:
+        if veh['id'] == veh['ldr']:
+            space.append(SCAV if veh['type'] == 'CAV' else SHDV)
+        else:
+            ldr_pos = [ldr['abs'] for ldr in lTrajVeh
+                       if ldr['id'] == veh['ldr']]
+            space.append(ldr_pos[0] - veh['abs'] if ldr_pos else 0.0)
+    return space
+
+
+def getleaderspeed_scan(lTrajVeh):
+    """ Leader speed by scanning all vehicles (former implementation)"""
+    speedldr = []
+    for veh in lTrajVeh:
+        ldr_vit = [ldr['vit'] for ldr in lTrajVeh if ldr['id'] == veh['ldr']]
+        speedldr.append(ldr_vit[0] if ldr_vit else veh['vit'])
+    return speedldr
+
+
+def create_vehicles(n_veh, seed=0):
+    """ Vehicles with heads and leaders out of the network"""
+    rng = np.random.RandomState(seed)
+    aId = rng.permutation(2 * n_veh)[:n_veh]
+    return [{'id': int(i), 'type': 'CAV' if rng.rand() < 0.5 else 'HDV',
+             'abs': 1000 * rng.rand(), 'vit': 25 * rng.rand(),
+             'ldr': int(i) if rng.rand() < 0.2 else
+             int(rng.randint(2 * n_veh))}
+            for i in aId]
+
+
+class TestSymfunc(unittest.TestCase):
+
+    def test_join(self):
+        """
+        Spacing and leader speed equal the scan over all vehicles
+        """
+        for n_veh in (0, 2, 10, 200):
+            with self.subTest(n_veh=n_veh):
+                lTrajVeh = create_vehicles(n_veh)
+                self.assertEqual([v['spc'] for v in getspace(lTrajVeh)],
+                                 getspace_scan(lTrajVeh))
+                self.assertEqual(
+                    [v['vld'] for v in getleaderspeed(lTrajVeh)],
+                    getleaderspeed_scan(lTrajVeh))
+
+    def test_single(self):
+        """
+        Single vehicle: head or leader out of the network
+        """
+        veh = {'id': 3, 'ldr': 3, 'type': 'HDV', 'abs': 10.0, 'vit': 5.0}
+        self.assertEqual(getspace(veh), [{'spc': SHDV}])
+        self.assertEqual(getleaderspeed(veh), [{'vld': 5.0}])
+        veh['ldr'] = 2
+        self.assertEqual(getspace(veh), [{'spc': None}])
+        self.assertEqual(getleaderspeed(veh), [{'vld': None}])
+
+    def test_leader_rows(self):
+        """
+        Leader rows for unsorted ids, -1 for leaders not in the step
+        """
+        aId = np.array([7, 3, 9, 1])
+        assert_array_equal(leader_rows(aId, np.array([3, 7, 4, 10, 1])),
+                           [1, 0, -1, -1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+    Unit test for the background trajectory writer
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from symuviapy.writer import TrajectoryWriter
+from symuviapy.frame import VehicleFrame
+import unittest
+
+
+def create_step(ti, n_veh):
+    """ Vehicle rows of one step as built in the notebooks"""
+    return [{'ti': ti, 'id': i, 'type': 'CAV', 'tron': 'In_main', 'voie': 1,
+             'dst': 10.0 * i, 'abs': -10.0 * i, 'vit': 20.0, 'ldr': i-1,
+             'spc': 10.0, 'vld': 20.0} for i in range(n_veh)]
+
+
+class TestWriter(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'SymOut.sqlite')
+
+    def query(self, sql):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute(sql).fetchall()
+
+    def test_batch(self):
+        """
+        Rows of many steps are written in few transactions
+        """
+        with TrajectoryWriter(self.path, batch_size=500) as writer:
+            for k in range(100):
+                writer.write('closed', create_step(k / 10, 10))
+                writer.write('headway', {'ti': k / 10, 'id': 0, 'gapt': 1.})
+        self.assertEqual(self.query('SELECT COUNT(*) FROM closed'), [(1000,)])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM headway'), [(100,)])
+        self.assertLess(writer.n_commits, 10)
+        self.assertEqual(self.query('PRAGMA journal_mode'), [('wal',)])
+        self.assertEqual(self.query('SELECT * FROM closed WHERE id=3 AND '
+                                    'ti=0.5')[0][:4],
+                         (0.5, 3, 'CAV', 'In_main'))
+
+    def test_flush_clear(self):
+        """
+        flush() commits queued rows, clear() empties a table in order
+        """
+        writer = TrajectoryWriter(self.path, flush_interval=60)
+        writer.write('traj', create_step(0.0, 5))
+        writer.flush()
+        self.assertEqual(self.query('SELECT COUNT(*) FROM traj'), [(5,)])
+        writer.clear('traj')
+        frame = VehicleFrame.from_dicts(create_step(0.1, 3))
+        writer.write('traj', frame)
+        writer.close()
+        self.assertEqual(self.query('SELECT ti, COUNT(*) FROM traj'),
+                         [(0.1, 3)])
+        with self.assertRaises(RuntimeError):
+            writer.write('traj', create_step(0.2, 1))
+
+    def test_error(self):
+        """
+        Errors of the writer thread are raised in the simulation thread
+        """
+        writer = TrajectoryWriter(self.path)
+        writer.write('headway', [(0.0, 1)])  # missing column
+        with self.assertRaises(RuntimeError):
+            writer.flush()
+
+        # Flush queued after the thread stopped: raises, does not block
+        writer = TrajectoryWriter(self.path, flush_interval=0.05)
+        writer.close()
+        writer._put = writer.queue.put
+        with self.assertRaisesRegex(RuntimeError, 'stopped'):
+            writer.flush()
+
+    def test_baseline_schema(self):
+        """
+        Tables created without the step column are migrated and written
+        """
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('CREATE TABLE traj (ti FLOAT, id INTEGER, '
+                               'type VARCHAR(3), tron VARCHAR(10), '
+                               'voie INTEGER, dst FLOAT, abs FLOAT, '
+                               'vit FLOAT, ldr INTEGER, spc FLOAT, '
+                               'vld FLOAT)')
+            connection.execute("INSERT INTO traj VALUES (0.3, 9, 'HDV', "
+                               "'In_main', 1, 0, 0, 20, 0, 0, 0)")
+        with TrajectoryWriter(self.path) as writer:
+            writer.write('traj', create_step(0.5, 2))
+            writer.flush()
+        self.assertIsNone(writer.error)
+        self.assertEqual(self.query('SELECT id, k FROM traj ORDER BY ti'),
+                         [(9, 3), (0, 5), (1, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,311 @@
+"""
+    Background writer for the simulation output database
+
+    Rows of the traj, closed, headway and control tables are queued by
+    the simulation loop and inserted by a background thread. The thread
+    gathers the rows of many steps and inserts them with executemany in
+    one transaction. The database uses WAL journaling, so readers
+    (e.g. the analysis notebooks) are not blocked by the writer.
+
+        writer = TrajectoryWriter('../Output/SymOut.sqlite')
+        writer.clear('closed')
+        ...
+        writer.write('closed', lVehDataFormat)   # each step
+        ...
+        writer.close()                            # flush + stop
+
+    write() only blocks when the queue is full (backpressure). Rows
+    must not be modified after being passed to write(). Each row also
+    gets the integer step k = round(ti / DT), see query.py. Rows inserted
+    by other code get it from a trigger of the table.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from symuviapy.symfunc import DT
+
+# Tables of the notebooks (column, SQL type), k = integer step of ti
+TABLES = {
+    'traj': (('ti', 'FLOAT'), ('id', 'INTEGER'), ('type', 'VARCHAR(3)'),
+             ('tron', 'VARCHAR(10)'), ('voie', 'INTEGER'), ('dst', 'FLOAT'),
+             ('abs', 'FLOAT'), ('vit', 'FLOAT'), ('ldr', 'INTEGER'),
+             ('spc', 'FLOAT'), ('vld', 'FLOAT'), ('k', 'INTEGER')),
+    'closed': (('ti', 'FLOAT'), ('id', 'INTEGER'), ('type', 'VARCHAR(3)'),
+               ('tron', 'VARCHAR(10)'), ('voie', 'INTEGER'),
+               ('dst', 'FLOAT'), ('abs', 'FLOAT'), ('vit', 'FLOAT'),
+               ('ldr', 'INTEGER'), ('spc', 'FLOAT'), ('vld', 'FLOAT'),
+               ('k', 'INTEGER')),
+    'control': (('ti', 'FLOAT'), ('id', 'INTEGER'), ('type', 'VARCHAR(3)'),
+                ('tron', 'VARCHAR(10)'), ('voie', 'INTEGER'),
+                ('ctr', 'FLOAT'), ('nit', 'INTEGER'), ('k', 'INTEGER')),
+    'headway': (('ti', 'FLOAT'), ('id', 'INTEGER'), ('gapt', 'FLOAT'),
+                ('k', 'INTEGER')),
+    # traj rows of several scenarios (see runner.py)
+    'runs': (('ti', 'FLOAT'), ('id', 'INTEGER'), ('type', 'VARCHAR(3)'),
+             ('tron', 'VARCHAR(10)'), ('voie', 'INTEGER'), ('dst', 'FLOAT'),
+             ('abs', 'FLOAT'), ('vit', 'FLOAT'), ('ldr', 'INTEGER'),
+             ('spc', 'FLOAT'), ('vld', 'FLOAT'), ('scenario', 'VARCHAR(64)'),
+             ('k', 'INTEGER')),
+}
+
+PRAGMAS = ('PRAGMA journal_mode=WAL',
+           'PRAGMA synchronous=NORMAL',
+           'PRAGMA temp_store=MEMORY',
+           'PRAGMA cache_size=-65536',
+           )
+
+_CLEAR = object()
+_FLUSH = object()
+_STOP = object()
+
+
+def create_tables(connection, tables=TABLES):
+    """ Creates the output tables if they do not exist"""
+    for table, columns in tables.items():
+        sColumns = ', '.join(f'{name} {sql}' for name, sql in columns)
+        connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({sColumns})')
+
+
+def existing_tables(connection, tables=TABLES):
+    """ Names of the output tables present in the database"""
+    lExisting = [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return [table for table in tables if table in lExisting]
+
+
+def step_sql(ti='ti'):
+    """ SQL expression of the integer step of a time column"""
+    return f'CAST(ROUND({ti} / {DT}) AS INTEGER)'
+
+
+def migrate_tables(connection, tables=TABLES):
+    """ Adds the step column k to the existing tables if missing
+
+        Rows inserted without k by other code (e.g. the notebooks) get
+        it from ti through a trigger.
+    """
+    for table in existing_tables(connection, tables):
+        lExisting = [row[1] for row in
+                     connection.execute(f'PRAGMA table_info({table})')]
+        if 'k' not in lExisting:
+            connection.execute(f'ALTER TABLE {table} ADD COLUMN k INTEGER')
+        connection.execute(f'UPDATE {table} SET k = {step_sql()} '
+                           f'WHERE k IS NULL')
+        connection.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_step '
+                           f'AFTER INSERT ON {table} WHEN NEW.k IS NULL '
+                           f'BEGIN UPDATE {table} SET k = '
+                           f'{step_sql("NEW.ti")} '
+                           f'WHERE rowid = NEW.rowid; END')
+
+
+def to_step(ti):
+    """ Integer step of a time ti (float or str as given by SymuVia)"""
+    return int(round(float(ti) / DT))
+
+
+def as_rows(rows, columns):
+    """ Tuples in the column order from dicts, a dict or a VehicleFrame
+
+        The step k is computed from ti (first column).
+    """
+    if hasattr(rows, 'to_dicts'):
+        rows = rows.to_dicts()
+    elif isinstance(rows, dict):
+        rows = [rows]
+    names = [name for name, _ in columns[:-1]]
+    lRows = []
+    for row in rows:
+        row = tuple(row.get(name) for name in names) \
+            if isinstance(row, dict) else tuple(row)
+        lRows.append(row + (to_step(row[0]),))
+    return lRows
+
+
+class TrajectoryWriter:
+    """
+    Bulk writer on a background thread
+
+    TrajectoryWriter(path = str, batch_size = int, maxsize = int,
+                     flush_interval = float)
+
+    batch_size: rows per transaction
+    maxsize: queued write() calls before write() blocks
+    flush_interval: max. time [s] before queued rows are committed
+    """
+
+    def __init__(self, path: str, batch_size: int = 20000,
+                 maxsize: int = 1024, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+
+        self.n_rows = 0
+        self.n_commits = 0
+        self.t_write = 0.0
+        self.max_queue = 0
+
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='TrajectoryWriter')
+        self._thread.start()
+        self._ready.wait()
+        self._check()
+
+    # Simulation thread
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError('TrajectoryWriter failed') from self.error
+
+    def _put(self, item):
+        self._check()
+        if not self._thread.is_alive():
+            raise RuntimeError('TrajectoryWriter is closed')
+        self.queue.put(item)
+        self.max_queue = max(self.max_queue, self.queue.qsize())
+
+    def write(self, table, rows):
+        """ Queues rows (dicts, a dict, tuples or a VehicleFrame)"""
+        if table not in TABLES:
+            raise KeyError(f'Unknown table {table}')
+        self._put((table, rows))
+
+    def clear(self, table):
+        """ Queues the deletion of all rows of a table"""
+        if table not in TABLES:
+            raise KeyError(f'Unknown table {table}')
+        self._put((_CLEAR, table))
+
+    def flush(self):
+        """ Waits until all queued rows are committed
+
+            Raises if the writer thread stops before (its error if any)
+        """
+        done = threading.Event()
+        self._put((_FLUSH, done))
+        while not done.wait(self.flush_interval):
+            self._check()
+            if not self._thread.is_alive():
+                raise RuntimeError('TrajectoryWriter stopped before flush')
+        self._check()
+
+    def close(self):
+        """ Commits the queued rows and stops the thread"""
+        if self._thread.is_alive():
+            self.queue.put((_STOP, None))
+            self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __str__(self):
+        return (f'TrajectoryWriter(rows= {self.n_rows}, '
+                f'commits= {self.n_commits}, '
+                f'write time= {self.t_write:.3f} s, '
+                f'max. queue= {self.max_queue}/{self.queue.maxsize})')
+
+    # Writer thread
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        for pragma in PRAGMAS:
+            connection.execute(pragma)
+        create_tables(connection)
+        migrate_tables(connection)
+        return connection
+
+    def _commit(self, connection, dPending, lClear=()):
+        """ Writes pending deletions and rows in one transaction"""
+        t_0 = time.perf_counter()
+        connection.execute('BEGIN')
+        for table in lClear:
+            connection.execute(f'DELETE FROM {table}')
+        for table, lRows in dPending.items():
+            columns = TABLES[table]
+            sInsert = (f'INSERT INTO {table} '
+                       f'({", ".join(name for name, _ in columns)}) '
+                       f'VALUES ({", ".join("?" * len(columns))})')
+            connection.executemany(sInsert, lRows)
+            self.n_rows += len(lRows)
+        connection.execute('COMMIT')
+        self.n_commits += 1
+        self.t_write += time.perf_counter() - t_0
+        dPending.clear()
+
+    def _run(self):
+        try:
+            connection = self._connect()
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        dPending = {}
+        n_pending = 0
+        t_last = time.monotonic()
+        bRunning = True
+        lDone = []
+        try:
+            while bRunning:
+                timeout = max(self.flush_interval
+                              - (time.monotonic() - t_last), 0)
+                try:
+                    item = self.queue.get(timeout=timeout if n_pending
+                                          else None)
+                except queue.Empty:
+                    item = None
+
+                if item is not None:
+                    key, value = item
+                    if key is _STOP:
+                        bRunning = False
+                    elif key is _FLUSH:
+                        lDone.append(value)
+                    elif key is _CLEAR:
+                        # Rows queued before the deletion are dropped too
+                        dPending.pop(value, None)
+                        self._commit(connection, dPending, [value])
+                        n_pending = 0
+                        t_last = time.monotonic()
+                    else:
+                        lRows = as_rows(value, TABLES[key])
+                        if not n_pending:
+                            t_last = time.monotonic()
+                        dPending.setdefault(key, []).extend(lRows)
+                        n_pending += len(lRows)
+
+                if n_pending and (n_pending >= self.batch_size
+                                  or not bRunning or lDone
+                                  or time.monotonic() - t_last
+                                  >= self.flush_interval):
+                    self._commit(connection, dPending)
+                    n_pending = 0
+                    t_last = time.monotonic()
+                for done in lDone:
+                    done.set()
+                lDone = []
+        except Exception as e:
+            self.error = e
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            # Unblock producers and flush() callers
+            for done in lDone:
+                done.set()
+            while True:
+                try:
+                    key, value = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if key is _FLUSH:
+                    value.set()
+        finally:
+            connection.close()
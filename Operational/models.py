@@ -30,17 +30,22 @@ class VehDynamic:
 
     VehDynamic(func_dyn)
 
-    Creates a wrapper around the function func_dyn so that
+    Creates a wrapper around the function func_dyn so that the
+    dynamics can be called as func_dyn and its number of states
+    (n_state) is known when vehicles are stacked in a VehNetwork.
 
     """
+    __slots__ = ('veh_dyn', 'n_state')
+
     @wraps(vdyn)
     def __init__(self, veh_dyn: vdyn):
+        if isinstance(veh_dyn, VehDynamic):
+            veh_dyn = veh_dyn.veh_dyn
         self.veh_dyn = veh_dyn
+        self.n_state = N_STATE.get(veh_dyn)
 
     def __call__(self, *args, **kwargs):
-        def wrap_dyn(*args, **kwargs):
-            self.veh_dyn(*args, **kwargs)
-        return wrap_dyn
+        return self.veh_dyn(*args, **kwargs)
 
 
 def dynamic_3rd(veh_cst: ndarray, veh_nif: ndarray, veh_ctr: ndarray,
@@ -89,41 +94,137 @@ def dynamic_2nd(veh_cst: ndarray, veh_nif: ndarray, veh_ctr: ndarray,
     return np.array([au_s_hwy, au_v_veh, au_e_veh])
 
 
+# Number of states of each dynamic (s, v, e[, a])
+N_STATE = {dynamic_2nd: 3, dynamic_3rd: 4}
+
+
+def dynamic_batch(veh_cst: ndarray, veh_nif: ndarray, veh_ctr: ndarray,
+                  veh_lag: ndarray, t_stp: float,
+                  b_3rd: Optional[ndarray] = None) -> ndarray:
+    """
+    Updates a fleet of 2nd / 3rd order vehicles in one step
+
+    veh_cst: Current states (... x n_veh x 4), (s,v,e,a) or (s,v,e,0)
+    veh_nif: Neighbor information (... x n_veh), leader acceleration
+    veh_ctr: Control inputs (... x n_veh)
+    veh_lag: Acceleration lags (n_veh or ... x n_veh)
+    t_stp: Time step
+    b_3rd: 3rd order vehicles (n_veh, bool), all when None
+
+    Rows of dynamic_3rd and dynamic_2nd (first 3 columns) vehicles
+    are the outcomes of the per-vehicle functions. Leading axes (e.g.
+    Monte Carlo realizations) are updated together.
+    """
+    if b_3rd is None:
+        b_3rd = np.ones(veh_cst.shape[-2], dtype=bool)
+    a_s_hwy, a_v_veh, a_e_veh, a_a_veh = np.moveaxis(veh_cst, -1, 0)
+    a_a_veh = np.where(b_3rd, a_a_veh, veh_ctr)
+    veh_ust = np.empty_like(veh_cst)
+    veh_ust[..., 0] = a_s_hwy + t_stp * a_e_veh
+    veh_ust[..., 1] = a_v_veh + t_stp * a_a_veh
+    veh_ust[..., 2] = a_e_veh + t_stp * (veh_nif - a_a_veh)
+    veh_ust[..., 3] = np.where(
+        b_3rd, (1 - t_stp / veh_lag) * a_a_veh + t_stp / veh_lag * veh_ctr,
+        0.0)
+    return veh_ust
+
+
 # -------------------- VEHICLE CLASSES --------------------
 
 
-class Vehicle(SimParameter, VehParameter):
+def shared_dynamic(veh_dyn: Union[vdyn, VehDynamic]) -> VehDynamic:
+    """
+    One VehDynamic per dynamic function, shared by the vehicles
+    """
+    if isinstance(veh_dyn, VehDynamic):
+        return veh_dyn
+    try:
+        return _DYNAMICS[veh_dyn]
+    except KeyError:
+        return _DYNAMICS.setdefault(veh_dyn, VehDynamic(veh_dyn))
+
+
+_DYNAMICS = {}
+
+
+class Vehicle:
     """
     Single vehicle model
 
-    veh_dyn: vehicle dynamics 
+    Vehicle(sim_par = SimParameter, veh_par = VehParameter,
+            veh_dyn = VehDynamic)
+
+    sim_par: simulation parameters (shared)
+    veh_par: vehicle parameters (shared)
+    veh_dyn: vehicle dynamics
     veh_id: vehicle identifier
-    veh_type: vehicle type 
+    veh_type: vehicle type
     veh_clane: current lane
-    veh_clink: current link 
+    veh_clink: current link
     veh_cstat: current state
     veh_ccord: current coordinates (ord, abs)
+
+    Parameters are read through the shared parameter sets
+    (veh.v_lag, veh.t_stp). Once in a VehNetwork, veh_cstat is a view
+    of the row of the vehicle in the state array of the network.
     """
+    __slots__ = ('sim_par', 'veh_par', 'veh_id', 'veh_dyn', 'veh_type',
+                 'veh_clane', 'veh_clink', 'veh_ccord', '_cstat',
+                 '_network', '_index')
     n_veh = 0
 
-    def __init__(self, sim_par: SimParameter,
-                 veh_par: VehParameter,
-                 veh_dyn: VehDynamic)->None:
+    def __init__(self, sim_par: Optional[SimParameter] = None,
+                 veh_par: Optional[VehParameter] = None,
+                 veh_dyn: Union[vdyn, VehDynamic] = dynamic_3rd)->None:
 
         self.__class__.n_veh += 1
-        SimParameter.__init__(self, sim_par.t_stp, sim_par.t_hor,
-                              sim_par.t_sim)
-
-        VehParameter.__init__(self, veh_par.u_ffs, veh_par.l_veh,
-                              veh_par.x_gap, cpcty=veh_par.cpcty)
-
+        self.sim_par = sim_par if sim_par is not None else SimParameter()
+        self.veh_par = veh_par if veh_par is not None else VehParameter()
         self.veh_id = None
-        self.veh_dyn = VehDynamic(veh_dyn)
+        self.veh_dyn = shared_dynamic(veh_dyn)
         self.veh_type = None
         self.veh_clane = None
         self.veh_clink = None
-        self.veh_cstat = None
         self.veh_ccord = None
+        self._cstat = None
+        self._network = None
+        self._index = None
+
+    def __getattr__(self, name):
+        # Only called for names that are not slots: parameters
+        if name in Vehicle.__slots__:
+            raise AttributeError(name)
+        for par in (self.veh_par, self.sim_par):
+            if name in par.__slots__:
+                return getattr(par, name)
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id= {self.veh_id}, "
+                f"n_state= {self.veh_dyn.n_state})")
+
+    @property
+    def veh_cstat(self)->Optional[ndarray]:
+        if self._network is not None:
+            return self._network.veh_state[self._index,
+                                           :self.veh_dyn.n_state]
+        return self._cstat
+
+    @veh_cstat.setter
+    def veh_cstat(self, veh_cstat: Optional[ndarray])->None:
+        if self._network is not None:
+            self._network.veh_state[self._index,
+                                    :self.veh_dyn.n_state] = veh_cstat
+        else:
+            self._cstat = veh_cstat
+
+    def attach(self, network, index: int)->None:
+        """
+        Stores the state of the vehicle in row index of a VehNetwork
+        """
+        self._network = network
+        self._index = index
 
     def initialize_condition(self, init_cond: ndarray)->None:
         """
@@ -131,26 +232,210 @@ class Vehicle(SimParameter, VehParameter):
         """
         self.veh_cstat = init_cond
 
-    def evolve_step(self):
+    def evolve_step(self, veh_nif: ndarray, veh_ctr: ndarray)->ndarray:
         """
-
+        Updates the current state of the vehicle by one time step
         """
+        self.veh_cstat = self.veh_dyn(self.veh_cstat, veh_nif, veh_ctr,
+                                      self.veh_par, self.sim_par)
+        return self.veh_cstat
+
+# -------------------- DELAY BUFFERS --------------------
+
+
+class DelayBuffer:
+    """
+    Ring buffer of the last samples of a fleet
+
+    DelayBuffer(veh_dly = array, n_dim = int, fill = float)
+
+    veh_dly: delay in steps of each vehicle (n_veh, or ... x n_veh
+             for batched fleets)
+    n_dim: values per vehicle (e.g. 4 for states), None for scalars
+    fill: value read before enough samples are pushed
+
+    Only max(veh_dly) + 1 samples are stored, whatever the number of
+    pushed samples. After push(x), read() returns for each vehicle the
+    sample pushed veh_dly steps before x.
+    """
+
+    def __init__(self, veh_dly: ndarray, n_dim: Optional[int] = None,
+                 fill: Union[float, ndarray] = 0.0):
+        self.veh_dly = np.asarray(veh_dly, dtype=int)
+        if (self.veh_dly < 0).any():
+            raise ValueError('Delays must be non negative')
+        self.n_dim = n_dim
+        self.n_buf = int(self.veh_dly.max(initial=0)) + 1
+        shape = self.veh_dly.shape + (() if n_dim is None else (n_dim,))
+        self.buffer = np.empty((self.n_buf,) + shape)
+        self.reset(fill)
+
+    def reset(self, fill: Union[float, ndarray] = 0.0)->None:
+        """ Forgets the samples, reads fill until enough are pushed"""
+        self.buffer[:] = fill
+        self.k = 0
+
+    def push(self, x: ndarray)->None:
+        """ Stores the sample of the current step"""
+        self.buffer[self.k % self.n_buf] = x
+        self.k += 1
+
+    def read(self)->ndarray:
+        """ Delayed sample of each vehicle"""
+        i_buf = (self.k - 1 - self.veh_dly) % self.n_buf
+        if self.n_dim is not None:
+            i_buf = i_buf[..., None]
+        return np.take_along_axis(self.buffer, i_buf[None], axis=0)[0]
+
+    def delay(self, x: ndarray)->ndarray:
+        """ Pushes a sample and reads the delayed one"""
+        self.push(x)
+        return self.read()
+
 
 # -------------------- NETWORK CLASSES --------------------
 
 
-class VehNetwork(SimParameter):
+class VehNetwork:
     """
         Network of vehicles
 
-        sim_par: simulation parameter 
-
+        VehNetwork(sim_par = SimParameter, l_veh_id = List[Vehicle],
+                   l_ldr = List[int], ctr_dly = float | array,
+                   obs_dly = float | array)
+
+        sim_par: simulation parameter
+        l_veh_id: vehicles (2nd and 3rd order dynamics can be mixed)
+        l_ldr: index of the leader of each vehicle, -1 for a platoon
+               head (default: each vehicle follows the previous one)
+        ctr_dly: actuation delay [s] of all / each vehicle
+        obs_dly: delay [s] of the states seen by the controller
+
+        The states of the fleet are stored as one (n_veh x 4) array
+        veh_state, (s,v,e,a) for 3rd order and (s,v,e,0) for 2nd order
+        vehicles, and updated by dynamic_batch in a single step. The
+        vehicles become views of their rows (Vehicle.veh_cstat).
+
+        With delays, past controls and states are kept in DelayBuffer
+        (constant memory): evolve_step applies the control commanded
+        ctr_dly before and measure() returns the states of obs_dly
+        before.
     """
 
-    def __init__(self, sim_par: SimParameter,  l_veh_id: List[Vehicle]):
-        super().__init__(sim_par.t_stp, sim_par.t_hor,
-                         sim_par.t_sim)
+    def __init__(self, sim_par: SimParameter,  l_veh_id: List[Vehicle],
+                 l_ldr: Optional[List[int]] = None,
+                 ctr_dly: Union[None, float, ndarray] = None,
+                 obs_dly: Union[None, float, ndarray] = None):
+        self.sim_par = sim_par
+        self.t_stp = sim_par.t_stp
+        self.t_hor = sim_par.t_hor
+        self.t_sim = sim_par.t_sim
+        self.s_hor = sim_par.s_hor
         self.l_veh_id = l_veh_id
+        self.n_veh = len(l_veh_id)
+        if l_ldr is None:
+            l_ldr = list(range(-1, self.n_veh - 1))
+        self.veh_ldr = np.array(l_ldr, dtype=int)
+        l_nst = [shared_dynamic(veh.veh_dyn).n_state for veh in l_veh_id]
+        if None in l_nst:
+            raise ValueError('Only dynamic_2nd / dynamic_3rd vehicles can '
+                             'be stacked in a VehNetwork')
+        self.veh_nst = np.array(l_nst, dtype=int)
+        self.b_3rd = self.veh_nst == N_STATE[dynamic_3rd]
+        self.veh_lag = np.array([veh.v_lag for veh in l_veh_id], dtype=float)
+        self.veh_state = np.zeros((self.n_veh, N_STATE[dynamic_3rd]))
+        for i, veh in enumerate(l_veh_id):
+            if veh.veh_cstat is not None:
+                self.veh_state[i, :self.veh_nst[i]] = veh.veh_cstat
+            veh.attach(self, i)
+        self.ctr_buf = self.obs_buf = None
+        if ctr_dly is not None:
+            self.ctr_buf = DelayBuffer(self.delay_steps(ctr_dly))
+        if obs_dly is not None:
+            self.obs_buf = DelayBuffer(self.delay_steps(obs_dly),
+                                       N_STATE[dynamic_3rd], self.veh_state)
+
+    def delay_steps(self, veh_dly: Union[float, ndarray])->ndarray:
+        """
+        Delays [s] of all / each vehicle in time steps
+        """
+        return np.broadcast_to(np.round(np.asarray(veh_dly) / self.t_stp),
+                               (self.n_veh,)).astype(int)
+
+    def initialize_condition(self, init_cond: ndarray)->None:
+        """
+        Define initial conditions (n_veh x n_state) of the fleet
+        """
+        init_cond = np.atleast_2d(np.asarray(init_cond, dtype=float))
+        self.veh_state[:] = 0.0
+        self.veh_state[:, :init_cond.shape[1]] = init_cond
+        self.veh_state[~self.b_3rd, 3] = 0.0
+        if self.ctr_buf is not None:
+            self.ctr_buf.reset()
+        if self.obs_buf is not None:
+            self.obs_buf.reset(self.veh_state)
+
+    def measure(self)->ndarray:
+        """
+        States (n_veh x 4) available to the controller
+        """
+        if self.obs_buf is None:
+            return self.veh_state
+        return self.obs_buf.read()
+
+    def neighbour(self, veh_ctr: ndarray,
+                  head_nif: Union[float, ndarray] = 0.0)->ndarray:
+        """
+        Acceleration of the leader of each vehicle
+
+        The acceleration of a 3rd order vehicle is its state, the one of
+        a 2nd order vehicle its control. Platoon heads get head_nif.
+        """
+        veh_acc = np.where(self.b_3rd, self.veh_state[:, 3], veh_ctr)
+        b_head = self.veh_ldr < 0
+        return np.where(b_head, head_nif, veh_acc[np.where(b_head, 0,
+                                                           self.veh_ldr)])
+
+    def evolve_step(self, veh_ctr: ndarray,
+                    head_nif: Union[float, ndarray] = 0.0)->ndarray:
+        """
+        Updates all vehicles by one time step, returns the new states
+
+        veh_ctr is the commanded control, delayed by ctr_dly.
+        """
+        veh_ctr = np.broadcast_to(np.asarray(veh_ctr, dtype=float),
+                                  (self.n_veh,))
+        if self.ctr_buf is not None:
+            veh_ctr = self.ctr_buf.delay(veh_ctr)
+        veh_nif = self.neighbour(veh_ctr, head_nif)
+        self.veh_state[:] = dynamic_batch(self.veh_state, veh_nif, veh_ctr,
+                                          self.veh_lag, self.t_stp,
+                                          self.b_3rd)
+        if self.obs_buf is not None:
+            self.obs_buf.push(self.veh_state)
+        return self.veh_state
+
+    def evolve(self, m_ctr: ndarray,
+               head_nif: Union[float, ndarray] = 0.0)->ndarray:
+        """
+        Trajectory (n_stp + 1 x n_veh x 4) for controls (n_stp x n_veh)
+
+        head_nif: neighbour information of the heads, scalar or one
+        value per step
+        """
+        m_ctr = np.asarray(m_ctr, dtype=float)
+        head_nif = np.broadcast_to(head_nif, (len(m_ctr),))
+        m_state = np.empty((len(m_ctr) + 1,) + self.veh_state.shape)
+        m_state[0] = self.veh_state
+        for k, veh_ctr in enumerate(m_ctr):
+            m_state[k + 1] = self.evolve_step(veh_ctr, head_nif[k])
+        return m_state
+
+    def states(self)->List[ndarray]:
+        """
+        State of each vehicle with its own number of states
+        """
+        return [x[:n] for x, n in zip(self.veh_state, self.veh_nst)]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,315 @@
+"""
+    Batched Monte Carlo robustness analysis of 3rd order platoons
+
+    M perturbed realizations of a platoon of N dynamic_3rd vehicles are
+    simulated together as one (M x N x 4) state array, stepped by
+    dynamic_batch. The perturbations of platoon-closed-3rd.py can be
+    combined:
+
+    1. noise: Gaussian noise on the measured states (s, v, e, a)
+    2. mismatch: relative error on the actuation lag of each vehicle
+    3. delay: control of each vehicle applied a random number of steps
+       later (DelayBuffer)
+
+    Each realization draws from its own random streams (RandomState
+    seeded by seed, realization, perturbation): a realization gives the
+    same result whatever the chunk size or the worker process running
+    it.
+    Chunks of realizations run in worker processes (see sweep.py) and
+    their metrics are merged into RunningStats as each chunk finishes.
+
+    In order to use:
+
+        mc = MonteCarlo(sim_par, veh_par, n_veh=8, noise=(0.1, 0, 0, 0),
+                        head_nif=braking(sim_par))
+        stats = mc.run(10000, chunk=500, processes=4)
+        stats.mean['max_err'], stats.std('max_err')
+"""
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+from numpy import ndarray
+
+from models import DelayBuffer, dynamic_batch
+from parameters import CtrParameter, SimParameter, VehParameter
+from sweep import run_sweep, OK
+
+# Random streams of a realization
+NOISE = 0
+MISMATCH = 1
+DELAY = 2
+
+# Metrics of a realization, one value per vehicle
+METRICS = ('max_err', 'rms_err', 'max_ctr', 'min_hwy')
+
+BLOCK = 100  # Steps of measurement noise drawn at once
+
+
+def braking(sim_par: SimParameter, t_start: float = 5.0,
+            t_brake: float = 3.0, a_brake: float = -1.0)->ndarray:
+    """ Leader acceleration: brakes then recovers its speed"""
+    a_time = np.arange(int(round(sim_par.t_sim / sim_par.t_stp))) \
+        * sim_par.t_stp
+    head_nif = np.zeros(len(a_time))
+    head_nif[(a_time >= t_start) & (a_time < t_start + t_brake)] = a_brake
+    t_back = t_start + 2 * t_brake
+    head_nif[(a_time >= t_back) & (a_time < t_back + t_brake)] = -a_brake
+    return head_nif
+
+
+class LinearFeedback:
+    """
+    Spacing feedback for the 3rd order platoon
+
+    LinearFeedback(veh_par = VehParameter, ctr_par = CtrParameter,
+                   k_p = float, k_d = float)
+
+    u = k_p * d + k_d * d' on the spacing error d = s - s_ref where
+    s_ref = x_dsp + t_dsp * v (+ split gap), saturated to
+    [u_min, u_max]. Any callable (m_meas, x_ref) -> controls with the
+    same shapes can be used in MonteCarlo.
+    """
+
+    def __init__(self, veh_par: VehParameter, ctr_par: CtrParameter,
+                 k_p: float = 0.2, k_d: float = 0.7):
+        self.x_dsp = veh_par.x_dsp
+        self.t_dsp = veh_par.t_dsp
+        self.u_min = ctr_par.u_min
+        self.u_max = ctr_par.u_max
+        self.k_p = k_p
+        self.k_d = k_d
+
+    def error(self, m_state: ndarray, x_ref: ndarray)->ndarray:
+        """ Spacing error (M x N) of the states (M x N x 4)"""
+        return (m_state[..., 0] - self.x_dsp - x_ref
+                - self.t_dsp * m_state[..., 1])
+
+    def __call__(self, m_meas: ndarray, x_ref: ndarray)->ndarray:
+        d_err = self.error(m_meas, x_ref)
+        d_dot = m_meas[..., 2] - self.t_dsp * m_meas[..., 3]
+        return np.clip(self.k_p * d_err + self.k_d * d_dot,
+                       self.u_min, self.u_max)
+
+
+class RunningStats:
+    """
+    Streaming statistics of realization metrics
+
+    RunningStats(names = tuple, shape = tuple)
+
+    Count, mean, variance, min and max of each metric (arrays of
+    shape) are merged chunk by chunk (pairwise update of Chan et al.)
+    without keeping the realizations.
+    """
+
+    def __init__(self, names: Sequence[str] = METRICS, shape: tuple = ()):
+        self.names = tuple(names)
+        self.count = 0
+        self.mean = {name: np.zeros(shape) for name in self.names}
+        self.min = {name: np.full(shape, np.inf) for name in self.names}
+        self.max = {name: np.full(shape, -np.inf) for name in self.names}
+        self._m2 = {name: np.zeros(shape) for name in self.names}
+
+    def update(self, d_batch: dict)->None:
+        """ Adds realizations (first axis of each metric array)"""
+        n_new = len(d_batch[self.names[0]])
+        if not n_new:
+            return
+        n_tot = self.count + n_new
+        for name in self.names:
+            x = np.asarray(d_batch[name], dtype=float)
+            mean = x.mean(axis=0)
+            delta = mean - self.mean[name]
+            self.mean[name] = self.mean[name] + delta * n_new / n_tot
+            self._m2[name] = (self._m2[name] + ((x - mean) ** 2).sum(axis=0)
+                              + delta ** 2 * self.count * n_new / n_tot)
+            self.min[name] = np.minimum(self.min[name], x.min(axis=0))
+            self.max[name] = np.maximum(self.max[name], x.max(axis=0))
+        self.count = n_tot
+
+    def var(self, name: str)->ndarray:
+        """ Sample variance of a metric"""
+        if self.count < 2:
+            return np.full_like(self._m2[name], np.nan)
+        return self._m2[name] / (self.count - 1)
+
+    def std(self, name: str)->ndarray:
+        """ Sample standard deviation of a metric"""
+        return np.sqrt(self.var(name))
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(count= {self.count}, "
+                + ", ".join(f"{name}= {np.mean(self.mean[name]):.4g}"
+                            for name in self.names) + ")")
+
+
+def _run_chunk(event: dict)->dict:
+    """ Metrics of the realizations [start, stop) of a sweep event"""
+    return event['engine'].simulate(np.arange(event['start'],
+                                              event['stop']))[0]
+
+
+class MonteCarlo:
+    """
+    Batched Monte Carlo engine
+
+    MonteCarlo(sim_par = SimParameter, veh_par = VehParameter,
+               n_veh = int, ctr_par = CtrParameter, controller = callable,
+               noise = array(4), mismatch = float, delay = float,
+               head_nif = array, split = (float, int, float),
+               v_ini = float, seed = int)
+
+    noise: standard deviations of the noise on measured (s, v, e, a)
+    mismatch: relative standard deviation of the actuation lags
+    delay: maximum control delay [s], uniform on steps per vehicle
+    head_nif: acceleration of the platoon leader, scalar or per step
+    split: (time, vehicle, gap) extra spacing reference of a split
+    v_ini: initial speed, the platoon starts at equilibrium
+    seed: root seed of the random streams
+
+    The controller sees the noisy states and the nominal parameters;
+    the vehicles evolve with the true states and perturbed lags.
+    """
+
+    def __init__(self, sim_par: Optional[SimParameter] = None,
+                 veh_par: Optional[VehParameter] = None, n_veh: int = 8,
+                 ctr_par: Optional[CtrParameter] = None,
+                 controller: Optional[Callable] = None,
+                 noise: Optional[Sequence[float]] = None,
+                 mismatch: float = 0.0, delay: float = 0.0,
+                 head_nif: Union[float, ndarray] = 0.0,
+                 split: Optional[tuple] = None, v_ini: float = 20.0,
+                 seed: int = 0):
+        self.sim_par = sim_par if sim_par is not None else SimParameter()
+        self.veh_par = veh_par if veh_par is not None else VehParameter()
+        self.ctr_par = ctr_par if ctr_par is not None else CtrParameter()
+        self.controller = controller if controller is not None else \
+            LinearFeedback(self.veh_par, self.ctr_par)
+        self.n_veh = n_veh
+        self.t_stp = self.sim_par.t_stp
+        self.n_stp = int(round(self.sim_par.t_sim / self.t_stp))
+        self.noise = None if noise is None else \
+            np.asarray(noise, dtype=float)
+        self.mismatch = mismatch
+        self.n_delay = int(round(delay / self.t_stp))
+        self.head_nif = np.broadcast_to(np.asarray(head_nif, dtype=float),
+                                        (self.n_stp,))
+        self.split = split
+        self.seed = seed
+        self.init_state = np.zeros((n_veh, 4))
+        self.init_state[:, 0] = self.veh_par.x_dsp + self.veh_par.t_dsp * v_ini
+        self.init_state[:, 1] = v_ini
+
+    def stream(self, index: int, kind: int)->np.random.RandomState:
+        """ Random stream of one perturbation of one realization"""
+        return np.random.RandomState([self.seed, index, kind])
+
+    def realizations(self, a_index: ndarray)->tuple:
+        """ Actuation lags and delays in steps (M x N)"""
+        veh_lag = np.full((len(a_index), self.n_veh), self.veh_par.v_lag)
+        a_delay = np.zeros((len(a_index), self.n_veh), dtype=int)
+        for j, index in enumerate(a_index):
+            if self.mismatch:
+                veh_lag[j] *= 1 + self.mismatch * self.stream(
+                    index, MISMATCH).standard_normal(self.n_veh)
+            if self.n_delay:
+                a_delay[j] = self.stream(index, DELAY).randint(
+                    self.n_delay + 1, size=self.n_veh)
+        # Explicit Euler steps of the lag stay stable
+        return np.maximum(veh_lag, self.t_stp), a_delay
+
+    def simulate(self, a_index: Union[int, Sequence[int]],
+                 b_traj: bool = False)->tuple:
+        """
+        Simulates realizations together
+
+        a_index: indices of the realizations (M)
+
+        Returns the metrics (dict of M x N arrays) and, with b_traj,
+        the trajectory (n_stp + 1 x M x N x 4).
+        """
+        a_index = np.atleast_1d(a_index)
+        n_mc, n_veh = len(a_index), self.n_veh
+        veh_lag, a_delay = self.realizations(a_index)
+        l_rng = [self.stream(index, NOISE) for index in a_index] \
+            if self.noise is not None else []
+
+        ctr_buf = DelayBuffer(a_delay)
+
+        m_state = np.tile(self.init_state, (n_mc, 1, 1))
+        m_traj = np.empty((self.n_stp + 1,) + m_state.shape) \
+            if b_traj else None
+        if b_traj:
+            m_traj[0] = m_state
+        x_ref = np.zeros(n_veh)
+        veh_nif = np.empty((n_mc, n_veh))
+        max_err = np.zeros((n_mc, n_veh))
+        sum_err = np.zeros((n_mc, n_veh))
+        max_ctr = np.zeros((n_mc, n_veh))
+        min_hwy = m_state[..., 0].copy()
+
+        for k in range(self.n_stp):
+            if self.split is not None and k * self.t_stp >= self.split[0]:
+                x_ref[self.split[1]] = self.split[2]
+            if l_rng:
+                if k % BLOCK == 0:
+                    n_blk = min(BLOCK, self.n_stp - k)
+                    m_noise = np.stack(
+                        [rng.standard_normal((n_blk, n_veh, 4))
+                         for rng in l_rng], axis=1) * self.noise
+                m_meas = m_state + m_noise[k % BLOCK]
+            else:
+                m_meas = m_state
+            veh_ctr = ctr_buf.delay(self.controller(m_meas, x_ref))
+
+            veh_nif[:, 0] = self.head_nif[k]
+            veh_nif[:, 1:] = m_state[:, :-1, 3]
+            m_state = dynamic_batch(m_state, veh_nif, veh_ctr, veh_lag,
+                                    self.t_stp)
+            if b_traj:
+                m_traj[k + 1] = m_state
+
+            d_err = np.abs(self.controller.error(m_state, x_ref))
+            np.maximum(max_err, d_err, out=max_err)
+            sum_err += d_err ** 2
+            np.maximum(max_ctr, np.abs(veh_ctr), out=max_ctr)
+            np.minimum(min_hwy, m_state[..., 0], out=min_hwy)
+
+        d_metric = {'max_err': max_err,
+                    'rms_err': np.sqrt(sum_err / self.n_stp),
+                    'max_ctr': max_ctr, 'min_hwy': min_hwy}
+        return d_metric, m_traj
+
+    def run(self, n_mc: int, chunk: int = 1000, processes: int = 1,
+            callback: Optional[Callable] = None)->RunningStats:
+        """
+        Statistics of n_mc realizations, simulated by chunks
+
+        callback(stats) is called each time a chunk is merged. With
+        processes > 1 chunks run in a pool of worker processes; failed
+        chunks raise a RuntimeError once the others are merged.
+        """
+        stats = RunningStats(METRICS, (self.n_veh,))
+        l_events = [{'id': i, 'start': start,
+                     'stop': min(start + chunk, n_mc), 'engine': self}
+                    for i, start in enumerate(range(0, n_mc, chunk))]
+
+        def merge(name, event, d_metric):
+            stats.update(d_metric)
+            if callback is not None:
+                callback(stats)
+
+        if processes <= 1:
+            for event in l_events:
+                merge(None, event, _run_chunk(event))
+            return stats
+
+        l_report = run_sweep(_run_chunk, l_events, merge, processes,
+                             name=lambda event: f"chunk_{event['id']}")
+        l_failed = [report for report in l_report if report.status != OK]
+        if l_failed:
+            raise RuntimeError(
+                f'{len(l_failed)} chunks failed: '
+                + '; '.join(f'{r.name} {r.status} {r.error}'
+                            for r in l_failed))
+        return stats
@@ -31,7 +31,12 @@
     Min control:        u_min
 """
 # from typing import List, NamedTuple, Callable, Optional, Union
+import inspect
+import itertools
 import typing
+import weakref
+
+import numpy as np
 
 # -------------------- DEFAULT VALUES -----------------------------------------
 
@@ -67,7 +72,75 @@ U_MIN = -1.5  # Min. Acceleration
 # --------------------
 
 
-class VehParameter:
+def _rebuild(cls, key):
+    """ Unpickles an interned parameter set"""
+    return cls(**dict(key))
+
+
+class Interned(type):
+    """
+    Metaclass of the parameter sets
+
+    Calls with the same (bound) arguments return the same instance
+    while it is referenced, the instance is frozen once built.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._cache = weakref.WeakValueDictionary()
+        cls._signature = inspect.signature(cls.__init__)
+
+    def key(cls, args, kwargs):
+        """ Arguments of a call, defaults and **kwargs included"""
+        bound = cls._signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        l_key = []
+        for name, value in list(bound.arguments.items())[1:]:
+            kind = cls._signature.parameters[name].kind
+            if kind is inspect.Parameter.VAR_KEYWORD:
+                l_key.extend(sorted(value.items()))
+            else:
+                l_key.append((name, value))
+        return tuple(l_key)
+
+    def __call__(cls, *args, **kwargs):
+        key = cls.key(args, kwargs)
+        try:
+            return cls._cache[key]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable argument: not interned
+            key = None
+        obj = super().__call__(*args, **kwargs)
+        object.__setattr__(obj, '_key', key)
+        if key is not None:
+            cls._cache[key] = obj
+        return obj
+
+
+class Parameter(metaclass=Interned):
+    """
+    Immutable parameter set (see Interned)
+    """
+    __slots__ = ('_key', '__weakref__')
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_key', False) is not False:
+            raise AttributeError(f'{self.__class__.__name__} is immutable')
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __reduce__(self):
+        return (_rebuild, (self.__class__, self._key))
+
+    def as_dict(self):
+        """ Stored parameters"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class VehParameter(Parameter):
     """
     Vehicle Parameter:
 
@@ -87,7 +160,12 @@ class VehParameter:
 
     VehParameterSym(u_ffs =float, k_x = float, w_cgt = float, l_veh = float)
 
+    Parameter sets are immutable and shared between equal calls.
+
     """
+    __slots__ = ('cpcty', 'w_cgt', 'u_ffs', 'k_crt', 'k_max', 'x_dsp',
+                 't_dsp', 'l_veh', 'x_gap', 't_gap', 'x_hwy', 't_hwy',
+                 'v_drp', 'v_lag')
 
     def __init__(self, u_ffs: float = U_FFS, l_veh: float = L_CAV,
                  x_gap: float = X_GAP_CAV, **kwargs):
@@ -112,11 +190,11 @@ class VehParameter:
         self.fill_parameter(**kwargs)
 
     def __str__(self):
-        return ("""{name}(\n cpcty= {cpcty},\n w_cgt= {w_cgt},\n u_ffs= {u_ffs},\n k_crt= {k_crt},\n k_max= {k_max},\n x_dsp= {x_dsp},\n t_dsp= {t_dsp},\n l_veh= {l_veh},\n x_gap= {x_gap},\n t_gap= {t_gap},\n x_hwy= {x_hwy},\n t_hwy= {t_hwy},\n v_drp= {v_drp},\n)""".format(name=self.__class__.__name__, **self.__dict__)
+        return ("""{name}(\n cpcty= {cpcty},\n w_cgt= {w_cgt},\n u_ffs= {u_ffs},\n k_crt= {k_crt},\n k_max= {k_max},\n x_dsp= {x_dsp},\n t_dsp= {t_dsp},\n l_veh= {l_veh},\n x_gap= {x_gap},\n t_gap= {t_gap},\n x_hwy= {x_hwy},\n t_hwy= {t_hwy},\n v_drp= {v_drp},\n)""".format(name=self.__class__.__name__, **self.as_dict())
                 )
 
     def __repr__(self):
-        return ("""{name} \n cpcty= {cpcty},\n w_cgt= {w_cgt},\n u_ffs= {u_ffs},\n k_crt= {k_crt},\n k_max= {k_max},\n x_dsp= {x_dsp},\n t_dsp= {t_dsp},\n l_veh= {l_veh},\n x_gap= {x_gap},\n t_gap= {t_gap},\n x_hwy= {x_hwy},\n t_hwy= {t_hwy},\n v_drp= {v_drp},\n)""".format(name=self.__class__.__name__, **self.__dict__)
+        return ("""{name} \n cpcty= {cpcty},\n w_cgt= {w_cgt},\n u_ffs= {u_ffs},\n k_crt= {k_crt},\n k_max= {k_max},\n x_dsp= {x_dsp},\n t_dsp= {t_dsp},\n l_veh= {l_veh},\n x_gap= {x_gap},\n t_gap= {t_gap},\n x_hwy= {x_hwy},\n t_hwy= {t_hwy},\n v_drp= {v_drp},\n)""".format(name=self.__class__.__name__, **self.as_dict())
                 )
 
     def fill_parameter(self, **kwargs):
@@ -129,12 +207,8 @@ class VehParameter:
 
         self.cpcty = kwargs.get("cpcty", None)
         if not self.cpcty:
-            print(
-                f"""Missing Parameters: \n C = {self.cpcty}\n No value for capacity provided \n Using congestion speed wave """
-            )
+            # No capacity: computed from the congestion wave speed
             self.w_cgt = kwargs.get("w_cgt", None)
-            print(f" w = {self.w_cgt}")
-
             self.cpcty = self.find_cpcty()
 
             self.k_crt = self.find_k_crt()
@@ -158,8 +232,7 @@ class VehParameter:
             cpcty = self.w_cgt * self.u_ffs / \
                 (self.w_cgt + self.u_ffs) * self.k_max
         except TypeError:
-            print(
-                f""" \n No value for wave congestion provided\n Using default value w: {W_CGT_CAV}""")
+            # No congestion wave speed either: default W_CGT_CAV
             self.w_cgt = W_CGT_CAV
             cpcty = self.w_cgt * self.u_ffs / \
                 (self.w_cgt + self.u_ffs) * self.k_max
@@ -179,7 +252,7 @@ class VehParameter:
                             x_gap=x_gap, w_cgt=w_cgt)
 
 
-class SimParameter:
+class SimParameter(Parameter):
     """
     Simulation Parameters
 
@@ -192,6 +265,7 @@ class SimParameter:
     s_hor : Sample horizon:      
 
     """
+    __slots__ = ('t_stp', 't_hor', 't_sim', 's_hor')
 
     def __init__(self, t_stp: float = T_STP, t_hor: float = T_HOR,
                  t_sim: float = T_SIM):
@@ -209,7 +283,7 @@ class SimParameter:
                 )
 
 
-class CtrParameter:
+class CtrParameter(Parameter):
     """
     Control Parameters
 
@@ -224,6 +298,7 @@ class CtrParameter:
     u_min : Min control
 
     """
+    __slots__ = ('c_nb1', 'c_nb2', 'c_nb3', 'u_min', 'u_max')
 
     def __init__(self, c_nb1: float = C_NB1,
                  c_nb2: float = C_NB2,
@@ -243,3 +318,156 @@ class CtrParameter:
     def __repr__(self):
         return (f"{self.__class__.__name__}(c_nb1={self.c_nb1}, c_nb2={self.c_nb2}, c_nb3={self.c_nb3})"
                 )
+
+
+# -------------------- PARAMETER GRIDS --------------------
+
+# Inputs of a vehicle parameter set (None: missing, see fill_parameter)
+VEH_INPUTS = ('u_ffs', 'l_veh', 'x_gap', 'cpcty', 'w_cgt', 'v_lag')
+VEH_DEFAULTS = {'u_ffs': U_FFS, 'l_veh': L_CAV, 'x_gap': X_GAP_CAV,
+                'cpcty': None, 'w_cgt': None, 'v_lag': T_A}
+CTR_INPUTS = ('c_nb1', 'c_nb2', 'c_nb3', 'u_min', 'u_max')
+
+
+def derive_parameters(u_ffs, l_veh, x_gap, cpcty=None, w_cgt=None,
+                      v_lag=T_A):
+    """
+    Derived parameters of arrays of inputs (vectorized fill_parameter)
+
+    Missing cpcty / w_cgt are NaN (or None for a whole column), 0 is a
+    missing capacity as in fill_parameter. Without capacity it is
+    computed from w_cgt, without both w_cgt is W_CGT_CAV.
+    """
+    u_ffs, l_veh, x_gap, v_lag = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (u_ffs, l_veh, x_gap, v_lag)))
+    cpcty = np.broadcast_to(np.asarray(np.nan if cpcty is None else cpcty,
+                                       dtype=float), u_ffs.shape)
+    w_cgt = np.broadcast_to(np.asarray(np.nan if w_cgt is None else w_cgt,
+                                       dtype=float), u_ffs.shape)
+
+    x_dsp = l_veh + x_gap
+    k_max = 1 / x_dsp
+    b_cpcty = ~np.isnan(cpcty) & (cpcty != 0)
+    w_in = np.where(np.isnan(w_cgt), W_CGT_CAV, w_cgt)
+    cpcty_w = w_in * u_ffs / (w_in + u_ffs) * k_max
+    cpcty = np.where(b_cpcty, cpcty, cpcty_w)
+    k_crt = cpcty / u_ffs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w_cgt = np.where(b_cpcty, cpcty / (k_max - k_crt), w_in)
+    t_dsp = 1 / (k_max * w_cgt)
+    return {'cpcty': cpcty, 'w_cgt': w_cgt, 'u_ffs': u_ffs, 'k_crt': k_crt,
+            'k_max': k_max, 'x_dsp': x_dsp, 't_dsp': t_dsp, 'l_veh': l_veh,
+            'x_gap': x_gap, 'v_lag': v_lag}
+
+
+class ParameterGrid:
+    """
+    Vehicle (and control) parameter sets of a sensitivity study
+
+    ParameterGrid(u_ffs = array, l_veh = array, x_gap = array,
+                  cpcty = array, w_cgt = array, v_lag = array,
+                  c_nb1 = array, ...)
+
+    Inputs are broadcast together (ParameterGrid.product for all the
+    combinations), missing inputs take the defaults of VehParameter /
+    CtrParameter. Derived values are computed once per distinct input
+    row by derive_parameters and read as columns (grid.k_max,
+    grid['t_dsp']). grid[i] builds the VehParameter of row i (the same
+    interned object as the scalar constructor) and grid.control(i) its
+    CtrParameter, only when requested.
+    """
+
+    def __init__(self, **inputs):
+        l_unknown = set(inputs) - set(VEH_INPUTS) - set(CTR_INPUTS)
+        if l_unknown:
+            raise TypeError(f'Unknown parameters {sorted(l_unknown)}')
+        self.inputs = {name: inputs[name] for name in VEH_INPUTS + CTR_INPUTS
+                       if name in inputs and inputs[name] is not None}
+        l_arrays = np.broadcast_arrays(*(
+            np.asarray(x, dtype=float) for x in self.inputs.values()))
+        self.inputs = {name: np.ravel(x) for name, x in
+                       zip(self.inputs, l_arrays)}
+        self.n_row = len(next(iter(self.inputs.values()))) \
+            if self.inputs else 1
+
+        # Distinct vehicle input rows: derived once, materialized once
+        m_veh = np.column_stack([self.column_input(name)
+                                 for name in VEH_INPUTS])
+        m_key = np.where(np.isnan(m_veh), np.inf, m_veh)
+        m_unique, self.i_unique = np.unique(m_key, axis=0,
+                                            return_inverse=True)
+        self.i_unique = self.i_unique.ravel()
+        m_unique = np.where(np.isinf(m_unique), np.nan, m_unique)
+        self.derived = derive_parameters(*m_unique.T)
+        self._veh_par = {}
+
+    @classmethod
+    def product(cls, **axes):
+        """ Grid of all the combinations of the values of each input"""
+        names = list(axes)
+        l_rows = list(itertools.product(*(np.atleast_1d(axes[name])
+                                          for name in names)))
+        return cls(**{name: np.array([row[i] for row in l_rows],
+                                     dtype=float)
+                      for i, name in enumerate(names)})
+
+    def column_input(self, name):
+        """ Input column, NaN for a missing cpcty / w_cgt"""
+        if name in self.inputs:
+            return self.inputs[name]
+        default = VEH_DEFAULTS.get(name)
+        return np.full(self.n_row, np.nan if default is None else default)
+
+    def __len__(self):
+        return self.n_row
+
+    def __getattr__(self, name):
+        if name in ('inputs', 'n_row', 'derived', 'i_unique', '_veh_par'):
+            raise AttributeError(name)
+        if name in self.derived:
+            return self.derived[name][self.i_unique]
+        if name in CTR_INPUTS:
+            return self.inputs.get(name, np.full(self.n_row, getattr(
+                CtrParameter(), name)))
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return getattr(self, index)
+        return self.vehicle(index)
+
+    def __iter__(self):
+        return (self.vehicle(i) for i in range(self.n_row))
+
+    def vehicle(self, index: int)->VehParameter:
+        """ VehParameter of a row (built once per distinct input)"""
+        key = int(self.i_unique[index])
+        try:
+            return self._veh_par[key]
+        except KeyError:
+            pass
+        d_in = {name: self.column_input(name)[index].item()
+                for name in VEH_INPUTS}
+        kwargs = {}
+        if not np.isnan(d_in['cpcty']) and d_in['cpcty']:
+            kwargs['cpcty'] = d_in['cpcty']
+        elif not np.isnan(d_in['w_cgt']):
+            kwargs['w_cgt'] = d_in['w_cgt']
+        if d_in['v_lag'] != T_A:
+            kwargs['vlag'] = d_in['v_lag']
+        veh_par = VehParameter(d_in['u_ffs'], d_in['l_veh'], d_in['x_gap'],
+                               **kwargs)
+        self._veh_par[key] = veh_par
+        return veh_par
+
+    def control(self, index: int)->CtrParameter:
+        """ CtrParameter of a row"""
+        return CtrParameter(**{name: x[index].item()
+                               for name, x in self.inputs.items()
+                               if name in CTR_INPUTS})
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(rows= {self.n_row}, "
+                f"distinct= {len(self.derived['k_max'])}, "
+                f"inputs= {list(self.inputs)})")
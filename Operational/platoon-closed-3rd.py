@@ -10,11 +10,16 @@
     2. Model mismatch between the control and the model.
     3. Delays within the control signal. 
 
+    Each scenario runs N_MC realizations in batches (see montecarlo.py)
+
     Usage: 
     python platoon-closed-3rd.py
 """
+import os
+
 from parameters import VehParameter, SimParameter
 from models import VehNetwork, Vehicle, dynamic_3rd
+from montecarlo import MonteCarlo, braking
 
 # Create a simulation timings
 T_STP = 0.01
@@ -34,33 +39,53 @@ veh_par = VehParameter.VehParameterSym(U_FFS, K_X, W_CGT, L_VEH)
 
 
 veh_model = Vehicle(sim_par, veh_par, dynamic_3rd)
-print(vars(veh_model))
+print(veh_model, veh_model.veh_par)
 
-veh_list = [veh_model, veh_model]
+veh_list = [veh_model, Vehicle(sim_par, veh_par, dynamic_3rd)]
 
 # Create the network of vehicles
 veh_network = VehNetwork(sim_par, veh_list)
-print(vars(veh_network))
-
-
-# Initialize the network of vehicles
-
-# Create the controller
-
-# Create the splitting manouvers to be executed. (Tactical layer)
-
-# Initialize the controller - (references + models to be launched)
-
-# Evolve the system
-
-# Scenario 1: Perturb the measurements with noise
-
-# Scenario 2: Perturb the model parameters with noise / Parameters should keep consistancy
-
-# Scenario 3: Save on each vehicle the full buffer but remember to retrieve the info in the past. Compute ctrl with this info and then feed the system.
-
-# Obtain Performance measurements
-
-# In all cases: Dynamic Answer (State + Control)
-
-# Save results
+print(veh_network.veh_state.shape)
+
+# Monte Carlo: realizations, realizations per batch, worker processes
+N_VEH = 8
+N_MC = 10000
+CHUNK = 500
+PROCESSES = os.cpu_count()
+SEED = 2019
+
+# Controller: saturated linear spacing feedback (montecarlo.LinearFeedback)
+# in place of the MPC of contfunc, too costly to batch over realizations
+
+# Leader brakes, vehicle 4 opens a gap (Tactical layer)
+HEAD_NIF = braking(sim_par)
+SPLIT = (30.0, 4, 10.0)
+
+# Scenario 1: Perturb the measurements with noise (s, v, e, a)
+# Scenario 2: Perturb the actuation lag / Other parameters keep consistancy
+# Scenario 3: Control computed with the measurements of the past
+SCENARIOS = {'nominal': {},
+             'noise': {'noise': (0.5, 0.2, 0.2, 0.05)},
+             'mismatch': {'mismatch': 0.3},
+             'delay': {'delay': 0.3}}
+
+
+def report(stats):
+    """ Progress of a scenario"""
+    print(f'  {stats.count:>6} realizations, max spacing error '
+          f'{stats.mean["max_err"].max():.3f} m')
+
+
+if __name__ == "__main__":
+    for name, kwargs in SCENARIOS.items():
+        print(name)
+        mc = MonteCarlo(sim_par, veh_par, N_VEH, head_nif=HEAD_NIF,
+                        split=SPLIT, seed=SEED, **kwargs)
+        stats = mc.run(1 if name == 'nominal' else N_MC, CHUNK, PROCESSES,
+                       callback=report)
+
+        # Performance measurements per vehicle
+        for metric in stats.names:
+            print(f'  {metric:>8} mean {stats.mean[metric].round(3)}')
+            if stats.count > 1:
+                print(f'  {metric:>8} std  {stats.std(metric).round(3)}')
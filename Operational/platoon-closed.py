@@ -6,14 +6,34 @@
     
     In order to use: python platoon-closed.py 
     
-    Check output files in: ../Output/
+    Check output files in: ../Output/ (see store.py to read them)
 """
+import logging
 import os
+import sys
+from collections import Counter
+from functools import lru_cache, partial
+
 import numpy as np
 
+from models import DelayBuffer
+from store import ResultStore
+from sweep import run_sweep
+
+# Costate update engines are shared with the notebooks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                '..', 'Notebooks'))
+from symuviapy.engines import dengine  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
 # Platoon length
 N = 6
 
+# Sweep: parallel scenarios and time limit per scenario [s]
+PROCESSES = os.cpu_count()
+TIMEOUT = 3600
+
 # Truck parameters
 L_AVG = 18
 G = 0
@@ -95,6 +115,7 @@ def create_ref(dEvent, Teq):
         aNewTime = 8 * (aTime - (yld + ant/2)) / ant
         return v0 + (vf-v0) * 1 / (1 + np.exp(- aNewTime))
 
+    aTime = np.arange(nSamples)*DT
     mRef = np.ones(aDims) * Teq
     iIdTruck = dEvent['id']
     fMrgTime = dEvent['tm']
@@ -281,16 +302,314 @@ def backward_evolution_alt(X, Ref):
     return ls, lv
 
 
-def compute_control(mX0, mRef, mTheta):
-    """ Computes a control based on mX0 and the reference mRef"""
+# Condensed QP (linear model)
+QP_ITER = 50  # Max. Newton iterations
+QP_EPS = 1e-8  # Tolerance fixed point residual
+
+
+def predecessor_topology(n):
+    """ Leader position of each truck (head leads itself)"""
+    return tuple([0] + list(range(n - 1)))
+
+
+def reversed_sum(X, n):
+    """ Sum over the following samples, X stacked by sample (h*n, m)"""
+    X = X.reshape(-1, n, X.shape[-1])
+    R = np.zeros(X.shape)
+    R[:-1] = np.flip(np.cumsum(np.flip(X[1:], axis=0), axis=0), axis=0)
+    return R.reshape(-1, R.shape[-1])
+
+
+@lru_cache(maxsize=16)
+def prediction_matrices(h, n, dt, ldr):
+    """ Condensed prediction matrices of the linear model
+
+        For the stacked control u = vec(U) (row major, h x n):
+        V = V0 + GV u, DV = DV0 + GDV u, S = S0 + k dt DV0 + GS u
+        RS is the sum over the following samples (costate recursion)
+    """
+    L = np.tri(h, h, -1)
+    I_n = np.eye(n)
+    P = I_n[list(ldr)] - I_n  # DU = U[ldr] - U
+    GV = dt * np.kron(L, I_n)
+    GDV = dt * np.kron(L, P)
+    GS = dt ** 2 * np.kron(L @ L, P)
+    RS = reversed_sum(np.eye(h*n), n)
+    for M in (GV, GDV, GS, RS):
+        M.flags.writeable = False
+    return GV, GDV, GS, RS
+
+
+@lru_cache(maxsize=64)
+def condensed_system(h, n, dt, ldr, tg_key):
+    """ Fixed point u = clip(K u + k) of the control iteration
+
+        Returns K and the matrices giving k from the spacing error
+        and speed difference of the free response. Cached by
+        reference window (tg_key: bytes of the reference).
+    """
+    GV, GDV, GS, RS = prediction_matrices(h, n, dt, ldr)
+    tg = np.frombuffer(tg_key)[:, None]
+
+    # es = Ae u + e0, ls = cs RS es, lv = dt RS (-2 C1 tg es - C2 DV - ls)
+    cs = 2 * C1 * dt
+    Ae = GS - tg * GV
+    Mlv = dt * reversed_sum(-2 * C1 * tg * Ae - cs * reversed_sum(Ae, n)
+                            - C2 * GDV, n)
+    Mle = dt * reversed_sum(-2 * C1 * np.diag(tg.ravel()) - cs * RS, n)
+    K = -Mlv / (2 * C3)
+    Ke = -Mle / (2 * C3)
+    Kdv = C2 * dt * RS / (2 * C3)
+    for M in (Ae, K, Ke, Kdv):
+        M.flags.writeable = False
+    return Ae, K, Ke, Kdv
+
+
+def compute_control_qp(mX0, mRef, state=None):
+    """ Computes a control by solving the condensed problem
+
+        The fixed point u = clip(K u + k) of the gradient iteration
+        for the linear model (forward/backward_evolution_alt) is
+        found by a projected (semismooth) Newton method with
+        backtracking. Returns None if it does not converge.
+    """
+    mS0, mV0, mDV0 = mX0
+    h, n = mRef.shape
+    ldr = predecessor_topology(n)
+    tg = np.ascontiguousarray(mRef, dtype=float).ravel()
+    Ae, K, Ke, Kdv = condensed_system(h, n, DT, ldr, tg.tobytes())
+    I_K = np.eye(h*n) - K
+
+    # Free response
+    k = np.arange(h)[:, None]
+    s0 = (mS0 + DT * k * mDV0).ravel()
+    v0 = np.tile(mV0, h)
+    dv0 = np.tile(mDV0, h)
+    e0 = s0 - (v0 * tg + L_AVG)
+    k0 = Ke @ e0 + Kdv @ dv0
+
+    def residual(u):
+        z = K @ u + k0
+        return z, u - np.clip(z, U_MIN, U_MAX)
+
+    # Projected Newton iterations
+    u = np.clip(np.linalg.solve(I_K, k0), U_MIN, U_MAX)
+    z, F = residual(u)
+    error = np.linalg.norm(F)
+    for it in range(1, QP_ITER + 1):
+        if error <= QP_EPS:
+            break
+        bFree = (z > U_MIN) & (z < U_MAX)
+        if bFree.all():
+            du = np.linalg.solve(I_K, -F)
+        else:
+            du = np.linalg.solve(np.eye(h*n) - bFree[:, None] * K, -F)
+        t = 1.0
+        while True:
+            z_t, F_t = residual(u + t * du)
+            error_t = np.linalg.norm(F_t)
+            if error_t <= (1 - 1e-4 * t) * error or t < 1e-4:
+                break
+            t = t / 2
+        u, z, F, error = u + t * du, z_t, F_t, error_t
+    else:
+        return None
+
+    U_star = np.clip(z, U_MIN, U_MAX).reshape(h, n)
+
+    if state is not None:
+        # Costates of the solution (lv = -2 C3 z), zero beyond a
+        # short window
+        _m_LS, _m_LV = np.zeros(aDimMPC), np.zeros(aDimMPC)
+        _lS = 2 * C1 * DT * reversed_sum((Ae @ u + e0)[:, None], n)
+        _m_LS[:h] = _lS.reshape(h, n)
+        _m_LV[:h] = -2 * C3 * z.reshape(h, n)
+        state.update(_m_LS, _m_LV, it, path='qp')
+
+    return U_star[0]
+
+
+@lru_cache(maxsize=64)
+def riccati_gains(h, n, dt, ldr, tg_key):
+    """ Backward Riccati pass of the unconstrained problem
+
+        Costates follow lambda_k = P_k x_k + p_k with x = (s, v, dv)
+        and lambda = (ls, lv), the control is u_k = -R lambda_k.
+        Cached by reference window (tg_key: bytes of the reference).
+    """
+    tg = np.frombuffer(tg_key).reshape(h, n)
+    I_n, Z_n = np.eye(n), np.zeros((n, n))
+    P = I_n[list(ldr)] - I_n  # DU = U[ldr] - U
+
+    A = np.block([[I_n, Z_n, dt * I_n], [Z_n, I_n, Z_n], [Z_n, Z_n, I_n]])
+    B = np.vstack((Z_n, dt * I_n, dt * P))
+    R = np.hstack((Z_n, I_n / (2 * C3)))
+    IC = np.block([[I_n, Z_n], [-dt * I_n, I_n]])  # ls enters lv
+    BR = B @ R
+
+    m_P = np.zeros((h, 2 * n, 3 * n))
+    m_p = np.zeros((h, 2 * n))
+    for k in range(h - 1, 0, -1):
+        T = np.diag(tg[k])
+        Es = np.hstack((I_n, -T, Z_n))  # es = Es x - L_AVG
+        Q = np.vstack((2 * C1 * Es, -2 * C1 * T @ Es
+                       - C2 * np.hstack((Z_n, Z_n, I_n))))
+        q = np.concatenate((-2 * C1 * L_AVG * np.ones(n),
+                            2 * C1 * L_AVG * tg[k]))
+        M = IC @ m_P[k] + dt * Q
+        m = IC @ m_p[k] + dt * q
+        G = np.eye(2 * n) + M @ BR
+        m_P[k-1] = np.linalg.solve(G, M @ A)
+        m_p[k-1] = np.linalg.solve(G, m)
+
+    for X in (m_P, m_p, A, B, R):
+        X.flags.writeable = False
+    return m_P, m_p, A, B, R
+
+
+def compute_control_riccati(mX0, mRef, state=None):
+    """ Unconstrained solution by a Riccati pass (linear model)
+
+        Returns None when the control leaves [U_MIN, U_MAX] or the
+        reference window is shorter than H (the engine then solves
+        and records the sample).
+    """
+    h, n = mRef.shape
+    if h != H:
+        return None
+    ldr = predecessor_topology(n)
+    tg = np.ascontiguousarray(mRef, dtype=float)
+    m_P, m_p, A, B, R = riccati_gains(h, n, DT, ldr, tg.tobytes())
+
+    x = np.concatenate(mX0)
+    m_L = np.zeros((h, 2 * n))
+    U_star = np.zeros((h, n))
+    for k in range(h):
+        m_L[k] = m_P[k] @ x + m_p[k]
+        U_star[k] = -R @ m_L[k]
+        x = A @ x + B @ U_star[k]
+
+    if U_star.max() > U_MAX or U_star.min() < U_MIN:
+        return None
+
+    if state is not None:
+        state.update(m_L[:, :n], m_L[:, n:], 1, path='riccati')
+
+    return U_star[0]
+
+
+class SolverState:
+    """ Costates of the previous sample, used to warm start the next one
+
+        check: also run a cold solve per sample to measure the
+               iterations saved
+        warm: warm start the iterative solves (otherwise the state
+              only records the solves)
+
+        Per call: l_iter iterations, l_path solver path, l_warm warm
+        started, l_cold iterations of the cold solve (iterative path
+        only, None otherwise)
+    """
+
+    def __init__(self, check=False, warm=True):
+        self.check = check
+        self.warm = warm
+        self.m_LS = None
+        self.m_LV = None
+        self.l_iter = []
+        self.l_cold = []
+        self.l_warm = []
+        self.l_path = []
+        self.paths = Counter()
+
+    def initial_guess(self):
+        """ Previous costates shifted by one sample (zeros if none)"""
+        _m_LS, _m_LV = np.zeros(aDimMPC), np.zeros(aDimMPC)
+        if self.m_LS is None:
+            return _m_LS, _m_LV, False
+        _m_LS[:-1] = self.m_LS[1:]
+        _m_LV[:-1] = self.m_LV[1:]
+        return _m_LS, _m_LV, True
+
+    def update(self, m_LS, m_LV, n, n_cold=None, path='iterative',
+               bWarm=False):
+        """ Stores the costates of the last solve"""
+        self.m_LS, self.m_LV = m_LS, m_LV
+        self.l_iter.append(n)
+        self.l_warm.append(bWarm)
+        self.l_path.append(path)
+        if path != 'iterative':
+            n_cold = None
+        elif not bWarm:
+            n_cold = n
+        self.l_cold.append(n_cold)
+        self.paths[path] += 1
+
+    @property
+    def iterations_saved(self):
+        """ Iterations saved by warm starting the iterative solves
+
+            Measured per call (check), otherwise estimated from the
+            average of the cold started iterative solves
+        """
+        l_calls = [(n, c, w) for n, c, w, p in zip(
+            self.l_iter, self.l_cold, self.l_warm, self.l_path)
+            if p == 'iterative']
+        if self.check:
+            return sum(c - n for n, c, _ in l_calls if c is not None)
+        n_cold = [n for n, _, w in l_calls if not w]
+        n_warm = [n for n, _, w in l_calls if w]
+        if not n_cold:
+            return 0
+        return int(round(np.mean(n_cold) * len(n_warm) - sum(n_warm)))
+
+    def __str__(self):
+        return (f"{self.__class__.__name__}(calls= {len(self.l_iter)}, "
+                f"iterations= {sum(self.l_iter)}, "
+                f"saved= {self.iterations_saved}, "
+                f"paths= {dict(self.paths)})")
+
+
+def compute_control(mX0, mRef, mTheta, state=None, engine='relax',
+                    fast=False):
+    """ Computes a control based on mX0 and the reference mRef
+
+        state: SolverState recording the solve (iterations, path),
+               warm starts from the previous sample if state.warm
+        engine: costate update 'relax', 'adaptive', 'nesterov' or
+                'anderson' (see symuviapy/engines.py), or 'qp' for
+                the condensed solver (falls back to 'relax' if it
+                fails)
+        fast: try the unconstrained Riccati solution first, the
+              engine is used only if it violates the bounds
+    """
+
+    if fast:
+        aU = compute_control_riccati(mX0, mRef, state)
+        if aU is not None:
+            return aU
+        logger.debug('Riccati solution not admissible: using %s', engine)
+
+    if engine == 'qp':
+        aU = compute_control_qp(mX0, mRef, state)
+        if aU is not None:
+            return aU
+        logger.debug('Condensed solver failed: using relaxation')
+        engine = 'relax'
 
     _m_S, _m_V, _m_DV, _m_LS, _m_LV, _ = initialize_mpc(*mX0)
     _X = (_m_S, _m_V, _m_DV)
 
+    bWarm = False
+    if state is not None and state.warm:
+        _m_LS, _m_LV, bWarm = state.initial_guess()
+
     # Parameters
 
     ALPHA = 0.02
     EPS = 0.1
+    update = dengine[engine](ALPHA)
+    _m_L = np.stack((_m_LS, _m_LV))
 
     # Convergence
     error = 100
@@ -305,7 +624,7 @@ def compute_control(mX0, mRef, mTheta):
         try:
             next(step)
 
-            U_star = -_m_LV / (2 * C3)
+            U_star = -_m_L[1] / (2 * C3)
 
             U_star = np.clip(U_star, U_MIN, U_MAX)
 
@@ -313,11 +632,7 @@ def compute_control(mX0, mRef, mTheta):
 
             _lS, _lV = backward_evolution_alt(_X, mRef)
 
-            _m_LS = (1 - ALPHA) * _m_LS + ALPHA * _lS
-            _m_LV = (1 - ALPHA) * _m_LV + ALPHA * _lV
-
-            error = np.linalg.norm(_m_LS - _lS) + \
-                np.linalg.norm(_m_LV - _lV)
+            _m_L, error = update.update(_m_L, np.stack((_lS, _lV)))
 
             # print(f'Error:{error}')
             # Routine for changing convergence parameter
@@ -325,8 +640,8 @@ def compute_control(mX0, mRef, mTheta):
             if error > 10e5:
                 raise AssertionError('Algorithm does not converge ')
             if n >= 5000:
-                ALPHA = max(ALPHA - 0.01, 0.01)
-                print(f'Reaching {n} iterations: Reducing alpha: {ALPHA}')
+                update.stall()
+                print(f'Reaching {n} iterations: alpha: {update.alpha}')
                 print(f'Error before update {error}')
                 if n > 20000:
                     raise AssertionError(
@@ -344,13 +659,38 @@ def compute_control(mX0, mRef, mTheta):
             bSuccess = 0
 
     n = n + n_prev
-    print(f'Total iterations:{n}')
+    logger.debug('Total iterations: %d (%s)', n, engine)
+
+    if state is not None:
+        n_cold = None
+        if bWarm and state.check:
+            cold = SolverState()
+            compute_control(mX0, mRef, mTheta, cold, engine)
+            n_cold = cold.l_iter[0]
+        state.update(_m_L[0], _m_L[1], n, n_cold, bWarm=bWarm)
 
     return U_star[0]
 
 
-def closed_loop(dEvent):
-    """Receives a dictionary and finds the solution in closed loop"""
+def delay_steps(dly):
+    """ Delays [s] of all / each truck in samples"""
+    return np.broadcast_to(np.round(np.asarray(dly) / DT), (N,)).astype(int)
+
+
+def closed_loop(dEvent, warm=False, engine='relax', fast=False,
+                verbose=False, ctr_dly=None, obs_dly=None):
+    """Receives a dictionary and finds the solution in closed loop
+
+        warm: warm start each sample from the previous solution
+        engine: costate update engine of compute_control
+        fast: Riccati fast path for unconstrained samples (exact
+              optimum, differs from the relaxation up to its EPS)
+        verbose: print the solver statistics at the end
+        ctr_dly: actuation delay [s] of all / each truck, the control
+                 applied is the one computed ctr_dly before (0 before)
+        obs_dly: delay [s] of the states (s, v, dv) seen by the
+                 controller (initial states before)
+    """
 
     # Time
     aTime = np.arange(nSamples)*DT
@@ -371,6 +711,15 @@ def closed_loop(dEvent):
     mRefW = G_T*np.ones((H, N))
     mThetaW = np.zeros((H, N))
 
+    state = SolverState(warm=warm)
+
+    ctr_buf = obs_buf = None
+    if ctr_dly is not None:
+        ctr_buf = DelayBuffer(delay_steps(ctr_dly))
+    if obs_dly is not None:
+        obs_buf = DelayBuffer(delay_steps(obs_dly), 3,
+                              np.stack((mS[0], mV[0], mDV[0]), axis=1))
+
     for i, t in enumerate(zip(mRef, aTime)):
 
         if i < len(mRef)-2:
@@ -381,8 +730,12 @@ def closed_loop(dEvent):
             print(f'Sample Time:{t[-1]}')
 
             aX = (mS[i], mV[i], mDV[i])
+            if obs_buf is not None:
+                aX = tuple(obs_buf.delay(np.stack(aX, axis=1)).T)
 
-            aU = compute_control(aX, mRefW, mThetaW)
+            aU = compute_control(aX, mRefW, mThetaW, state, engine, fast)
+            if ctr_buf is not None:
+                aU = ctr_buf.delay(aU)
 
             aDU = aU[0:-1] - aU[1:]
 
@@ -399,6 +752,9 @@ def closed_loop(dEvent):
 
             mX[i+1] = mX[i] + mV[i] * DT + 0.5 * aU * DT ** 2
 
+    if verbose:
+        print(f'Solver: {state}')
+
     mSd = mRef * V_P + L_AVG
 
     return mS, mV, mDV, mSd, mU, mX
@@ -424,29 +780,21 @@ if __name__ == "__main__":
 
     print(f'Simulating the following situations: {mEvents}')
 
-    dirname = '/Users/ladino/Documents/03-Code/02-Python/ISTTT2019/Output/'
-
-    for event in mEvents:
+    dirname = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                           '..', 'Output')
+    store = ResultStore(dirname)
 
-        print(f'Current situation:{event}')
+    def save(sEvent, event, result):
+        """ Writes the results of a scenario as soon as it finishes"""
+        S, V, DV, Sd, U, X = result
 
-        S, V, DV, Sd, U, X = closed_loop(event)
+        print(f'Finished situation:{event}')
 
-        sEvent = '_yield_' + str(event['id']) + '_gap_' + str(event['tg'][-1])
+        store.save(sEvent, event, space=S, speed=V, reference=Sd,
+                   control=U, position=X)
 
-        filename_S = dirname + 'space' + sEvent + '.csv'
-        filename_V = dirname + 'speed' + sEvent + '.csv'
-        filename_Sd = dirname + 'reference' + sEvent + '.csv'
-        filename_U = dirname + 'control' + sEvent + '.csv'
-        filename_X = dirname + 'postition' + sEvent + '.csv'
+    l_report = run_sweep(partial(closed_loop, warm=True), mEvents, save,
+                         processes=PROCESSES, timeout=TIMEOUT)
 
-        np.savetxt(filename_S, S, fmt='%.4f',
-                   delimiter='\t', newline='\n')
-        np.savetxt(filename_V, V, fmt='%.4f',
-                   delimiter='\t', newline='\n')
-        np.savetxt(filename_Sd, Sd,
-                   fmt='%.4f', delimiter='\t', newline='\n')
-        np.savetxt(filename_U, U, fmt='%.4f',
-                   delimiter='\t', newline='\n')
-        np.savetxt(filename_X, X, fmt='%.4f',
-                   delimiter='\t', newline='\n')
+    for report in l_report:
+        print(report)
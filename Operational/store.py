@@ -0,0 +1,186 @@
+"""
+    Binary result store for scenario sweeps
+
+    Each scenario is written to one file result<name>.npz holding all
+    its arrays plus the event dictionary (JSON). An index.json in the
+    same directory maps scenario names to files and events, so a sweep
+    can be queried without opening every file.
+
+    Files are stored uncompressed by default: arrays are then read
+    through np.memmap, without copying the data. Compressed files are
+    smaller but read eagerly.
+
+    In order to use:
+
+        store = ResultStore('../Output')
+        store.save(name, event, space=S, speed=V)
+        V = store.open(name)['speed']
+        mV = store.stack('speed', column=2, id=2)  # scenarios x time
+"""
+import json
+import os
+import zipfile
+
+import numpy as np
+
+META = '__event__'
+INDEX = 'index.json'
+PREFIX = 'result'
+
+
+def _member_memmap(path, zinfo):
+    """ Memory map of an uncompressed .npy member of a zip file"""
+    with open(path, 'rb') as f:
+        f.seek(zinfo.header_offset)
+        header = f.read(zipfile.sizeFileHeader)
+        n_name = int.from_bytes(header[26:28], 'little')
+        n_extra = int.from_bytes(header[28:30], 'little')
+        f.seek(zinfo.header_offset + zipfile.sizeFileHeader
+               + n_name + n_extra)
+        if np.lib.format.read_magic(f) == (1, 0):
+            read_header = np.lib.format.read_array_header_1_0
+        else:
+            read_header = np.lib.format.read_array_header_2_0
+        shape, fortran, dtype = read_header(f)
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError(f'{zinfo.filename}: object arrays cannot be mapped')
+    order = 'F' if fortran else 'C'
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype, order=order)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                     shape=shape, order=order)
+
+
+class Result:
+    """
+    Arrays and event of one scenario
+
+    Result(path = str, mmap = bool)
+
+    Arrays are loaded on access: result['speed'].
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        with zipfile.ZipFile(path) as zf:
+            self._members = {zi.filename[:-4]: zi for zi in zf.infolist()}
+            with zf.open(META + '.npy') as f:
+                self.event = json.loads(str(np.lib.format.read_array(f)))
+        self.mmap = mmap and all(zi.compress_type == zipfile.ZIP_STORED
+                                 for zi in self._members.values())
+
+    def keys(self):
+        return [k for k in self._members if k != META]
+
+    def __contains__(self, key):
+        return key != META and key in self._members
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if self.mmap:
+            return _member_memmap(self.path, self._members[key])
+        with np.load(self.path, allow_pickle=False) as data:
+            return data[key]
+
+    def __repr__(self):
+        return f'Result({self.path!r}, keys={self.keys()})'
+
+
+def save_result(path, event, compress=False, **dArrays):
+    """ Writes the arrays and the event of a scenario into one file"""
+    if META in dArrays:
+        raise ValueError(f'{META} is a reserved name')
+    sEvent = np.array(json.dumps(event), dtype=np.str_)
+    savez = np.savez_compressed if compress else np.savez
+    with open(path, 'wb') as f:
+        savez(f, **{META: sEvent}, **dArrays)
+    return path
+
+
+def _normalize(value):
+    """ JSON form of an event value (tuples become lists)"""
+    return json.loads(json.dumps(value))
+
+
+class ResultStore:
+    """
+    Directory of scenario results with an index
+
+    ResultStore(dirname = str, compress = bool)
+    """
+
+    def __init__(self, dirname: str, compress: bool = False):
+        self.dirname = dirname
+        self.compress = compress
+        os.makedirs(dirname, exist_ok=True)
+        self.index = self._read_index()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.dirname, INDEX)
+
+    def _read_index(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                return json.load(f)
+        return {}
+
+    def _write_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def rebuild(self):
+        """ Rebuilds the index from the result files in the directory"""
+        self.index = {}
+        for sFile in sorted(os.listdir(self.dirname)):
+            if sFile.startswith(PREFIX) and sFile.endswith('.npz'):
+                result = Result(os.path.join(self.dirname, sFile))
+                name = sFile[len(PREFIX):-4]
+                self.index[name] = {'file': sFile, 'event': result.event}
+        self._write_index()
+        return self
+
+    def save(self, name, event, **dArrays):
+        """ Writes one scenario and adds it to the index"""
+        sFile = PREFIX + name + '.npz'
+        save_result(os.path.join(self.dirname, sFile), event,
+                    self.compress, **dArrays)
+        self.index[name] = {'file': sFile, 'event': _normalize(event)}
+        self._write_index()
+        return sFile
+
+    def open(self, name, mmap=True):
+        """ Result of one scenario"""
+        return Result(os.path.join(self.dirname, self.index[name]['file']),
+                      mmap)
+
+    def select(self, **dCriteria):
+        """ Names of scenarios whose event matches all criteria"""
+        dCriteria = _normalize(dCriteria)
+        return [name for name, entry in self.index.items()
+                if all(entry['event'].get(k) == v
+                       for k, v in dCriteria.items())]
+
+    def stack(self, key, names=None, column=None, **dCriteria):
+        """ Array key of many scenarios stacked along a first axis
+
+            names: scenarios (default: select(**dCriteria))
+            column: keep only this column (e.g. one truck)
+        """
+        if names is None:
+            names = self.select(**dCriteria)
+        l_data = []
+        for name in names:
+            mData = self.open(name)[key]
+            l_data.append(mData[:, column] if column is not None else mData)
+        return np.stack(l_data) if l_data else np.empty((0,))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
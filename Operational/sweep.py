@@ -0,0 +1,129 @@
+"""
+    Parallel scenario sweep
+
+    Runs a function (e.g. closed_loop) over a list of events, each
+    event in its own worker process. At most `processes` workers run
+    at the same time and a worker exceeding `timeout` seconds is
+    terminated. Results are handed to `callback` in the parent process
+    as soon as each scenario finishes, so outputs are written while
+    the sweep is still running.
+
+    In order to use:
+
+        l_report = run_sweep(closed_loop, mEvents, save, processes=4,
+                             timeout=600)
+
+    `func` must be importable by the workers (a module level function).
+"""
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.connection import wait
+
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+
+def event_name(event):
+    """ Deterministic name of a scenario from its event dictionary"""
+    sEvent = '_yield_' + str(event['id']) + '_gap_' + str(event['tg'][-1])
+    if 'tm' in event:
+        sEvent += '_split_' + str(event['tm'])
+    return sEvent
+
+
+def _worker(func, event, conn):
+    """ Runs one scenario and sends (status, result) to the parent"""
+    try:
+        conn.send((OK, func(event)))
+    except Exception as e:
+        conn.send((ERROR, repr(e)))
+    finally:
+        conn.close()
+
+
+class SweepReport:
+    """
+    Outcome of one scenario of a sweep
+
+    SweepReport(index = int, event = dict, name = str)
+    """
+
+    def __init__(self, index: int, event: dict, name: str):
+        self.index = index
+        self.event = event
+        self.name = name
+        self.status = None
+        self.error = None
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (f'{self.name}: {self.status} ({self.elapsed:.1f} s)'
+                + (f' {self.error}' if self.error else ''))
+
+
+def run_sweep(func, l_events, callback=None, processes=None, timeout=None,
+              name=event_name):
+    """ Runs func(event) for all events in a bounded pool of processes
+
+        callback(name, event, result) is called in the parent when a
+        scenario succeeds. Returns one SweepReport per event, in the
+        order of l_events.
+    """
+    processes = processes or os.cpu_count() or 1
+    l_report = [SweepReport(i, event, name(event))
+                for i, event in enumerate(l_events)]
+    l_pending = list(reversed(l_report))
+    dRunning = {}  # conn -> (process, report, start)
+
+    while l_pending or dRunning:
+
+        # Fill the pool
+        while l_pending and len(dRunning) < processes:
+            report = l_pending.pop()
+            conn_parent, conn_child = mp.Pipe(duplex=False)
+            proc = mp.Process(target=_worker,
+                              args=(func, report.event, conn_child),
+                              daemon=True)
+            proc.start()
+            conn_child.close()
+            dRunning[conn_parent] = (proc, report, time.monotonic())
+
+        # Wait for a result or the closest deadline
+        wait_time = None
+        if timeout is not None:
+            now = time.monotonic()
+            wait_time = max(min(start + timeout - now
+                                for _, _, start in dRunning.values()), 0)
+        l_ready = wait(list(dRunning), wait_time)
+
+        for conn in l_ready:
+            proc, report, start = dRunning.pop(conn)
+            try:
+                report.status, result = conn.recv()
+            except EOFError:
+                report.status = ERROR
+                result = f'worker exited with code {proc.exitcode}'
+            conn.close()
+            proc.join()
+            report.elapsed = time.monotonic() - start
+            if report.status == OK:
+                if callback is not None:
+                    callback(report.name, report.event, result)
+            else:
+                report.error = result
+
+        # Terminate scenarios past their deadline
+        if timeout is not None:
+            now = time.monotonic()
+            for conn in [c for c, (_, _, start) in dRunning.items()
+                         if now - start >= timeout]:
+                proc, report, start = dRunning.pop(conn)
+                proc.terminate()
+                proc.join()
+                conn.close()
+                report.status = TIMEOUT
+                report.elapsed = now - start
+
+    return l_report
@@ -2,13 +2,54 @@
     Unit test for Models
 """
 
+import os
+import timeit
+
 import numpy as np
 from numpy.testing import assert_almost_equal
 
-from models import (dynamic_2nd, dynamic_3rd, VehDynamic, Vehicle)
+from models import (dynamic_2nd, dynamic_3rd, DelayBuffer, VehDynamic,
+                    Vehicle, VehNetwork)
 from parameters import VehParameter, SimParameter
 import unittest
 
+FLEETS = (10, 100, 1000)
+
+
+def create_fleet(n_veh, sim_par, veh_par):
+    """ Vehicles alternating 3rd / 2nd order dynamics"""
+    rng = np.random.RandomState(n_veh)
+    l_veh = []
+    for i in range(n_veh):
+        veh = Vehicle(sim_par, veh_par, (dynamic_3rd, dynamic_2nd)[i % 2])
+        veh.initialize_condition(rng.normal(size=4 - i % 2))
+        l_veh.append(veh)
+    return l_veh
+
+
+def step_vehicles(l_veh, veh_ctr):
+    """ One step vehicle by vehicle, each one following the previous"""
+    l_acc = [veh.veh_cstat[3] if len(veh.veh_cstat) == 4 else u
+             for veh, u in zip(l_veh, veh_ctr)]
+    l_nif = [0.0] + l_acc[:-1]
+    for veh, nif, ctr in zip(l_veh, l_nif, veh_ctr):
+        veh.evolve_step(np.array([nif]), np.array([ctr]))
+
+
+def throughput(n_veh, number=None):
+    """ Vehicle updates per second: per vehicle and batched network"""
+    sim_par = SimParameter()
+    veh_par = VehParameter(cpcty=0.8)
+    l_veh = create_fleet(n_veh, sim_par, veh_par)
+    network = VehNetwork(sim_par, l_veh)
+    veh_ctr = np.full(n_veh, 0.1)
+    number = number or max(20000 // n_veh, 1)
+    t_loop = min(timeit.repeat(lambda: step_vehicles(l_veh, veh_ctr),
+                               number=number, repeat=3)) / number
+    t_net = min(timeit.repeat(lambda: network.evolve_step(veh_ctr),
+                              number=number, repeat=3)) / number
+    return n_veh / t_loop, n_veh / t_net
+
 
 class TestModel(unittest.TestCase):
 
@@ -98,6 +139,161 @@ class TestModel(unittest.TestCase):
         val_ust = A @ veh_cst + B1 @ veh_ctr + B2 @ veh_nif
         assert_almost_equal(veh_ust, val_ust)
 
+    def test_network_equivalence(self):
+        """
+        Batched network step against the per-vehicle dynamics
+        """
+        veh_par = VehParameter(cpcty=0.8)
+        sim_par = SimParameter()
+        rng = np.random.RandomState(0)
+        l_dyn = [dynamic_3rd, dynamic_2nd, dynamic_3rd, dynamic_3rd,
+                 dynamic_2nd, dynamic_2nd]
+        l_init = [rng.normal(size=VehDynamic(dyn).n_state) for dyn in l_dyn]
+        l_veh, l_ref = [], []
+        for dyn, init in zip(l_dyn, l_init):
+            for l_fleet in (l_veh, l_ref):
+                l_fleet.append(Vehicle(sim_par, veh_par, dyn))
+                l_fleet[-1].initialize_condition(init.copy())
+        l_ldr = [-1, 0, 1, 0, 3, 4]
+        network = VehNetwork(sim_par, l_veh, l_ldr)
+        assert_almost_equal(np.concatenate(network.states()),
+                            np.concatenate(l_init))
+
+        m_ctr = rng.normal(size=(50, len(l_veh)))
+        m_state = network.evolve(m_ctr, head_nif=0.2)
+        for k, veh_ctr in enumerate(m_ctr):
+            # Leader acceleration: state for 3rd order, control for 2nd
+            l_acc = [v.veh_cstat[3] if len(v.veh_cstat) == 4 else u
+                     for v, u in zip(l_ref, veh_ctr)]
+            l_nif = [0.2 if i < 0 else l_acc[i] for i in l_ldr]
+            for veh, nif, ctr in zip(l_ref, l_nif, veh_ctr):
+                veh.evolve_step(np.array([nif]), np.array([ctr]))
+            for i, veh in enumerate(l_ref):
+                assert_almost_equal(m_state[k + 1, i, :len(veh.veh_cstat)],
+                                    veh.veh_cstat)
+        assert_almost_equal(m_state[:, [1, 4, 5], 3], 0.0)
+
+        # Vehicles of the network are views of its state
+        for veh, ref in zip(l_veh, l_ref):
+            assert_almost_equal(veh.veh_cstat, ref.veh_cstat)
+        l_veh[2].veh_cstat = np.zeros(4)
+        assert_almost_equal(network.veh_state[2], 0.0)
+
+    def test_shared_parameters(self):
+        """
+        Vehicles reference the same parameter sets and dynamics
+        """
+        l_veh = [Vehicle(SimParameter(), VehParameter(cpcty=0.8),
+                         dynamic_2nd) for _ in range(3)]
+        self.assertIs(l_veh[0].veh_par, l_veh[2].veh_par)
+        self.assertIs(l_veh[0].sim_par, l_veh[1].sim_par)
+        self.assertIs(l_veh[0].veh_dyn, l_veh[1].veh_dyn)
+        self.assertEqual(l_veh[0].v_lag, l_veh[0].veh_par.v_lag)
+        self.assertEqual(l_veh[0].t_stp, 0.01)
+        self.assertFalse(hasattr(l_veh[0], '__dict__'))
+        with self.assertRaises(AttributeError):
+            l_veh[0].unknown
+
+    def test_network_platoon(self):
+        """
+        Default leaders follow the order of the vehicles
+        """
+        veh_par = VehParameter(cpcty=0.8)
+        sim_par = SimParameter()
+        l_veh = [Vehicle(sim_par, veh_par, dynamic_3rd) for _ in range(4)]
+        network = VehNetwork(sim_par, l_veh)
+        self.assertEqual(network.veh_ldr.tolist(), [-1, 0, 1, 2])
+        network.initialize_condition(np.tile([30.0, 25.0, 0.0, 0.0],
+                                             (4, 1)))
+        # Constant speed: invariant
+        m_state = network.evolve(np.zeros((100, 4)))
+        assert_almost_equal(m_state[-1], m_state[0])
+        # Head braking: only the first follower sees its leader slow down
+        network.evolve(np.tile([-1.0, 0.0, 0.0, 0.0], (10, 1)))
+        self.assertLess(network.veh_state[0, 1], 25.0)
+        self.assertLess(network.veh_state[1, 2], 0.0)
+        assert_almost_equal(network.veh_state[2:, 2], 0.0)
+
+    def test_delay_buffer(self):
+        """
+        Each vehicle reads its own delayed sample in constant memory
+        """
+        buf = DelayBuffer([0, 2, 3], fill=-1.0)
+        for k in range(1000):
+            veh_out = buf.delay(np.full(3, float(k)))
+            veh_ref = [k, k - 2, k - 3]
+            assert_almost_equal(veh_out, [x if x >= 0 else -1.0
+                                          for x in veh_ref])
+        self.assertEqual(buf.buffer.shape, (4, 3))
+
+        buf = DelayBuffer([[1, 0]], n_dim=2)
+        buf.push(np.ones((1, 2, 2)))
+        buf.push(2 * np.ones((1, 2, 2)))
+        assert_almost_equal(buf.read(), [[[1, 1], [2, 2]]])
+        with self.assertRaises(ValueError):
+            DelayBuffer([-1])
+
+    def test_network_delay(self):
+        """
+        Delayed controls and measurements of a VehNetwork
+        """
+        veh_par = VehParameter(cpcty=0.8)
+        sim_par = SimParameter()
+        rng = np.random.RandomState(1)
+        l_dyn = [dynamic_3rd, dynamic_2nd, dynamic_3rd]
+        init = rng.normal(size=(3, 4))
+        network = VehNetwork(sim_par, [Vehicle(sim_par, veh_par, dyn)
+                                       for dyn in l_dyn],
+                             ctr_dly=[0.0, 0.02, 0.05], obs_dly=0.03)
+        ref = VehNetwork(sim_par, [Vehicle(sim_par, veh_par, dyn)
+                                   for dyn in l_dyn])
+        network.initialize_condition(init)
+        ref.initialize_condition(init)
+        assert_almost_equal(network.measure(), ref.veh_state)
+
+        m_ctr = rng.normal(size=(40, 3))
+        m_applied = np.zeros_like(m_ctr)
+        for i, n_dly in enumerate([0, 2, 5]):
+            m_applied[n_dly:, i] = m_ctr[:len(m_ctr) - n_dly, i]
+        m_state = ref.evolve(m_applied)
+        for k, veh_ctr in enumerate(m_ctr):
+            network.evolve_step(veh_ctr)
+            assert_almost_equal(network.veh_state, m_state[k + 1])
+            assert_almost_equal(network.measure(), m_state[max(k - 2, 0)])
+        self.assertEqual(network.obs_buf.buffer.shape, (4, 3, 4))
+
+    def test_network_fleet(self):
+        """
+        Batched step of a mixed fleet equals the per-vehicle step
+        """
+        sim_par = SimParameter()
+        veh_par = VehParameter(cpcty=0.8)
+        for n_veh in FLEETS:
+            with self.subTest(n_veh=n_veh):
+                l_veh = create_fleet(n_veh, sim_par, veh_par)
+                network = VehNetwork(sim_par,
+                                     create_fleet(n_veh, sim_par, veh_par))
+                veh_ctr = np.full(n_veh, 0.1)
+                for _ in range(3):
+                    step_vehicles(l_veh, veh_ctr)
+                    network.evolve_step(veh_ctr)
+                for i, veh in enumerate(l_veh):
+                    assert_almost_equal(
+                        network.veh_state[i, :len(veh.veh_cstat)],
+                        veh.veh_cstat)
+
+    @unittest.skipUnless(os.environ.get('BENCHMARK'),
+                         'timing, set BENCHMARK=1 (see '
+                         'Benchmarks/bench_models.py)')
+    def test_network_throughput(self):
+        """
+        Throughput over fleet size (see Benchmarks/bench_models.py)
+        """
+        for n_veh in FLEETS:
+            with self.subTest(n_veh=n_veh):
+                f_loop, f_net = throughput(n_veh, number=5)
+        # Large margin: the batched step is ~100x faster at this size
+        self.assertGreater(f_net, 2 * f_loop)
 
 if __name__ == "__main__":
     unittest.main()
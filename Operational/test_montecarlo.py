@@ -0,0 +1,87 @@
+"""
+    Unit test for the batched Monte Carlo engine
+"""
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_almost_equal
+
+from models import dynamic_3rd, Vehicle, VehNetwork
+from montecarlo import MonteCarlo, RunningStats, braking
+from parameters import VehParameter, SimParameter
+import unittest
+
+sim_par = SimParameter(0.01, 0.5, 4)
+veh_par = VehParameter.VehParameterSym(25.0, 0.16, 6.25, 4.0)
+
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def test_nominal(self):
+        """
+        Unperturbed realizations follow the VehNetwork closed loop
+        """
+        head_nif = braking(sim_par, t_start=0.5, t_brake=1.0)
+        mc = MonteCarlo(sim_par, veh_par, n_veh=4, head_nif=head_nif)
+        d_metric, m_traj = mc.simulate([0, 1, 2], b_traj=True)
+        self.assertEqual(m_traj.shape, (401, 3, 4, 4))
+        assert_almost_equal(m_traj[:, 0], m_traj[:, 2])
+
+        network = VehNetwork(sim_par, [Vehicle(sim_par, veh_par, dynamic_3rd)
+                                       for _ in range(4)])
+        network.initialize_condition(mc.init_state)
+        x_ref = np.zeros(4)
+        for k in range(mc.n_stp):
+            veh_ctr = mc.controller(network.veh_state, x_ref)
+            network.evolve_step(veh_ctr, head_nif[k])
+            assert_almost_equal(m_traj[k + 1, 1], network.veh_state)
+        self.assertTrue((d_metric['max_err'] > 0).all())
+        assert_almost_equal(d_metric['min_hwy'][0],
+                            m_traj[:, 0, :, 0].min(axis=0))
+
+    def test_streams(self):
+        """
+        A realization does not depend on its chunk or on its process
+        """
+        mc = MonteCarlo(sim_par, veh_par, n_veh=3, noise=(0.2, 0.1, 0, 0),
+                        mismatch=0.2, delay=0.05, seed=7)
+        d_all, _ = mc.simulate(np.arange(6))
+        d_one, _ = mc.simulate([4])
+        for name in d_all:
+            assert_almost_equal(d_all[name][4], d_one[name][0])
+        self.assertFalse(np.allclose(d_all['max_err'][0],
+                                     d_all['max_err'][1]))
+
+        veh_lag, a_delay = mc.realizations(np.arange(50))
+        self.assertEqual(a_delay.shape, (50, 3))
+        self.assertTrue(((a_delay >= 0) & (a_delay <= 5)).all())
+        self.assertGreater(len(np.unique(a_delay)), 1)
+        self.assertTrue((veh_lag >= sim_par.t_stp).all())
+
+        l_count = []
+        stats = mc.run(6, chunk=4, callback=lambda s: l_count.append(s.count))
+        self.assertEqual(l_count, [4, 6])
+        stats_mp = mc.run(6, chunk=2, processes=2)
+        for name in d_all:
+            assert_allclose(stats.mean[name], d_all[name].mean(axis=0))
+            assert_allclose(stats_mp.mean[name], stats.mean[name])
+            assert_allclose(stats_mp.std(name), stats.std(name))
+            assert_allclose(stats.max[name], d_all[name].max(axis=0))
+
+    def test_running_stats(self):
+        """
+        Merged chunks give the statistics of all the samples
+        """
+        rng = np.random.RandomState(0)
+        x = rng.normal(3.0, 2.0, size=(1000, 2))
+        stats = RunningStats(('x',), (2,))
+        self.assertTrue(np.isnan(stats.var('x')).all())
+        for x_chunk in np.array_split(x, [1, 10, 400, 999]):
+            stats.update({'x': x_chunk})
+        self.assertEqual(stats.count, 1000)
+        assert_allclose(stats.mean['x'], x.mean(axis=0))
+        assert_allclose(stats.var('x'), x.var(axis=0, ddof=1))
+        assert_allclose(stats.min['x'], x.min(axis=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
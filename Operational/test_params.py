@@ -2,7 +2,13 @@
     Unit test for parameters module
 """
 
-from parameters import VehParameter, SimParameter, CtrParameter
+import pickle
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from parameters import (VehParameter, SimParameter, CtrParameter,
+                        ParameterGrid)
 
 import unittest
 
@@ -68,6 +74,56 @@ class TestParameter(unittest.TestCase):
         self.assertEqual(veh_par.cpcty * veh_par.t_dsp,
                          veh_par.u_ffs / (veh_par.w_cgt + veh_par.u_ffs))
 
+    def test_interned(self):
+        """
+        Equal parameter sets are one immutable object
+        """
+        veh_par = VehParameter(u_ffs, l_veh, x_gap, cpcty=cpcty)
+        self.assertIs(veh_par, VehParameter(u_ffs=u_ffs, l_veh=l_veh,
+                                            x_gap=x_gap, cpcty=cpcty))
+        self.assertIsNot(veh_par, VehParameter(u_ffs, l_veh, x_gap,
+                                               w_cgt=w_cgt))
+        self.assertIs(SimParameter(), SimParameter(0.01))
+        self.assertIs(CtrParameter(), CtrParameter())
+        with self.assertRaises(AttributeError):
+            veh_par.u_ffs = 10
+        self.assertIs(pickle.loads(pickle.dumps(veh_par)), veh_par)
+        self.assertEqual(veh_par.as_dict()['k_max'], 1 / (l_veh + x_gap))
+
+    def test_grid(self):
+        """
+        Grid columns and rows match the scalar constructor
+        """
+        grid = ParameterGrid.product(u_ffs=[u_ffs, 25.0], l_veh=[l_veh, 4.5],
+                                     x_gap=[x_gap], cpcty=[cpcty, np.nan, 0],
+                                     w_cgt=[w_cgt, np.nan])
+        self.assertEqual(len(grid), 24)
+        for i, veh_par in enumerate(grid):
+            for name in ('cpcty', 'w_cgt', 'k_crt', 'k_max', 'x_dsp',
+                         't_dsp', 'v_lag'):
+                self.assertEqual(getattr(veh_par, name), grid[name][i])
+        # Same fallback: without capacity and wave speed, default w_cgt
+        veh_par = VehParameter(u_ffs, l_veh, x_gap)
+        self.assertEqual(grid.w_cgt[5], veh_par.w_cgt)
+        self.assertIs(grid[5], veh_par)
+        assert_allclose(grid.cpcty * grid.t_dsp,
+                        grid.u_ffs / (grid.w_cgt + grid.u_ffs))
+
+    def test_grid_memo(self):
+        """
+        Repeated input rows are derived and materialized once
+        """
+        grid = ParameterGrid(u_ffs=np.tile([20.0, 25.0], 50), cpcty=cpcty,
+                             c_nb3=np.linspace(0.1, 1, 100))
+        self.assertEqual(len(grid), 100)
+        self.assertEqual(len(grid.derived['k_max']), 2)
+        self.assertIs(grid[0], grid[98])
+        self.assertIsNot(grid[0], grid[1])
+        self.assertEqual(grid.control(99).c_nb3, 1.0)
+        self.assertEqual(grid.control(99).c_nb1, CtrParameter().c_nb1)
+        with self.assertRaises(TypeError):
+            ParameterGrid(k_max=[0.1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,206 @@
+"""
+    Unit test for the solver state of platoon-closed
+"""
+
+import contextlib
+import importlib.util
+import io
+import os
+from unittest import mock
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+import unittest
+
+
+def load_platoon_closed():
+    """ Imports platoon-closed.py as a module"""
+    file_name = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'platoon-closed.py')
+    spec = importlib.util.spec_from_file_location('platoon_closed',
+                                                  file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+pc = load_platoon_closed()
+
+# Control error allowed by the stopping rule of the relaxation
+EPS_RELAX = 0.1 / (2 * pc.C3)
+
+
+def platoon_state(aDS=0):
+    """ Platoon at capacity, spacing shifted by aDS"""
+    return (np.ones(pc.N) * (pc.S_D + pc.L_AVG) + aDS,
+            np.ones(pc.N) * pc.V_P, np.zeros(pc.N))
+
+
+class TestSolverState(unittest.TestCase):
+
+    def test_mixed_paths(self):
+        """
+        Only iterative solves are compared, cold with warm
+        """
+        m_L = np.zeros(pc.aDimMPC)
+        state = pc.SolverState()
+        state.update(m_L, m_L, 1, path='riccati')
+        state.update(m_L, m_L, 100)
+        state.update(m_L, m_L, 6, path='qp')
+        state.update(m_L, m_L, 40, bWarm=True)
+        state.update(m_L, m_L, 1, path='riccati')
+        state.update(m_L, m_L, 60, bWarm=True)
+        self.assertEqual(state.l_cold, [None, 100, None, None, None, None])
+        self.assertEqual(state.iterations_saved, 100)
+        self.assertEqual(dict(state.paths),
+                         {'riccati': 2, 'iterative': 3, 'qp': 1})
+
+        # Measured: cold solve of each warm call
+        state = pc.SolverState(check=True)
+        state.update(m_L, m_L, 1, path='riccati')
+        state.update(m_L, m_L, 30, 90, bWarm=True)
+        state.update(m_L, m_L, 6, 6, path='qp')
+        state.update(m_L, m_L, 50, 70, bWarm=True)
+        self.assertEqual(state.iterations_saved, 80)
+
+        # No cold iterative solve to compare with
+        state = pc.SolverState()
+        state.update(m_L, m_L, 1, path='riccati')
+        state.update(m_L, m_L, 40, bWarm=True)
+        self.assertEqual(state.iterations_saved, 0)
+
+    def test_cold_state(self):
+        """
+        Without warm start the solves are still recorded, cold
+        """
+        aX = (np.ones(pc.N) * (pc.S_D + pc.L_AVG), np.ones(pc.N) * pc.V_P,
+              np.zeros(pc.N))
+        mRef = pc.G_T * np.ones((pc.H, pc.N))
+        state = pc.SolverState(warm=False)
+        for _ in range(2):
+            pc.compute_control(aX, mRef, np.zeros(mRef.shape), state,
+                               fast=True)
+            pc.compute_control(aX, mRef, np.zeros(mRef.shape), state)
+        self.assertEqual(dict(state.paths), {'riccati': 2, 'iterative': 2})
+        self.assertEqual(state.l_warm, [False] * 4)
+
+
+class TestCondensedSolver(unittest.TestCase):
+
+    def setUp(self):
+        self.mTheta = np.zeros(pc.aDimMPC)
+
+    def check_relax(self, aX, mRef):
+        """ QP control against the relaxation"""
+        aU = pc.compute_control_qp(aX, mRef)
+        aU_relax = pc.compute_control(aX, mRef, self.mTheta, engine='relax')
+        np.testing.assert_allclose(aU, aU_relax, atol=EPS_RELAX)
+        return aU
+
+    def test_unsaturated(self):
+        """
+        Spacing errors within the bounds: same control as relax
+        """
+        aX = platoon_state(np.linspace(0, 2, pc.N))
+        mRef = pc.G_T * np.ones(pc.aDimMPC)
+        aU = self.check_relax(aX, mRef)
+        self.assertTrue((aU > pc.U_MIN).all() and (aU < pc.U_MAX).all())
+
+    def test_saturated(self):
+        """
+        Bounds active: same control as relax, clipped to U_MIN
+        """
+        aDT = np.zeros(pc.N)
+        aDT[1] = 2
+        mRef = pc.G_T * np.ones(pc.aDimMPC) + aDT
+        aU = self.check_relax(platoon_state(), mRef)
+        self.assertEqual(aU[1], pc.U_MIN)
+
+        aDS = np.zeros(pc.N)
+        aDS[1] = 20
+        aU = self.check_relax(platoon_state(aDS), pc.G_T
+                              * np.ones(pc.aDimMPC))
+        self.assertEqual(aU.max(), pc.U_MAX)
+
+    def test_exact_reference(self):
+        """
+        The system is built for the reference given, not a rounded one
+        """
+        aX = platoon_state(np.linspace(0, 2, pc.N))
+        mRef = pc.G_T * np.ones(pc.aDimMPC)
+        aU = pc.compute_control_qp(aX, mRef)
+        aU_close = pc.compute_control_qp(aX, mRef + 1e-6)
+        self.assertFalse(np.array_equal(aU, aU_close))
+
+
+class TestRiccati(unittest.TestCase):
+
+    def test_unconstrained(self):
+        """
+        Same control as the QP when no bound is active
+        """
+        aX = platoon_state(np.linspace(0, 2, pc.N))
+        aDT = np.zeros(pc.N)
+        aDT[2] = 0.05
+        for mRef in (pc.G_T * np.ones(pc.aDimMPC),
+                     pc.G_T * np.ones(pc.aDimMPC) + aDT):
+            aU = pc.compute_control_riccati(aX, mRef)
+            self.assertIsNotNone(aU)
+            np.testing.assert_allclose(aU, pc.compute_control_qp(aX, mRef),
+                                       atol=1e-8)
+
+    def test_short_window(self):
+        """
+        Windows shorter than H are solved by the engine and recorded
+        """
+        aX = platoon_state(np.linspace(0, 2, pc.N))
+        mRef = pc.G_T * np.ones((pc.H // 2, pc.N))
+        self.assertIsNone(pc.compute_control_riccati(aX, mRef))
+        state = pc.SolverState()
+        pc.compute_control(aX, mRef, np.zeros(mRef.shape), state,
+                           engine='qp', fast=True)
+        self.assertEqual(dict(state.paths), {'qp': 1})
+        self.assertEqual(state.m_LS.shape, pc.aDimMPC)
+
+
+class TestDelays(unittest.TestCase):
+
+    def run_loop(self, **kwargs):
+        """ Closed loop with a recording controller, control of call j
+            is j / 100 for all trucks
+        """
+        lX = []
+
+        def control(aX, *args):
+            lX.append(np.array(aX))
+            return np.full(pc.N, len(lX) / 100)
+
+        dEvent = {'id': 1, 'tm': 30.0, 'tg': (pc.G_T, 2 * pc.G_T)}
+        with mock.patch.object(pc, 'compute_control', control), \
+                contextlib.redirect_stdout(io.StringIO()):
+            mS, mV, mDV, _, mU, _ = pc.closed_loop(dEvent, **kwargs)
+        # Followers only: the drag term overwrites the head spacing
+        mX = np.stack((mS, mV, mDV), axis=1)
+        return np.array(lX)[..., 1:], mX[..., 1:], mU
+
+    def test_delays(self):
+        """
+        Applied controls and observed states are delayed per truck
+        """
+        lX, mX, mU = self.run_loop()
+        n = len(lX)
+        assert_array_equal(lX, mX[:n])
+        assert_array_equal(mU[:n, 0], np.arange(1, n + 1) / 100)
+
+        aDly = np.array([0, 0.1, 0.3, 0, 0, 0.5])
+        lX, mX, mU = self.run_loop(ctr_dly=aDly, obs_dly=0.2)
+        for j, d in enumerate(pc.delay_steps(aDly)):
+            aU = np.r_[np.zeros(d), np.arange(1, n + 1 - d) / 100]
+            np.testing.assert_allclose(mU[:n, j], aU)
+        assert_array_equal(lX[2:], mX[:n - 2])
+        assert_array_equal(lX[:2], mX[[0, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+    Unit test for the binary result store
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from store import ResultStore, Result
+import unittest
+
+
+def create_sweep(dirname, compress=False):
+    """ Store with 4 scenarios of (100, 6) arrays"""
+    store = ResultStore(dirname, compress)
+    rng = np.random.RandomState(0)
+    dData = {}
+    for i in range(4):
+        event = {'id': i % 2, 'tm': 30.0, 'tg': (1.2, 1.2 * (i + 2))}
+        name = f'_scenario_{i}'
+        dData[name] = (event, rng.rand(100, 6), rng.rand(100, 6))
+        store.save(name, event, speed=dData[name][1], control=dData[name][2])
+    return store, dData
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_roundtrip(self):
+        """
+        Arrays and events are read back exactly, through a memory map
+        """
+        store, dData = create_sweep(self.tmp.name)
+        for name, (event, mV, mU) in dData.items():
+            result = store.open(name)
+            self.assertIsInstance(result['speed'], np.memmap)
+            assert_array_equal(result['speed'], mV)
+            assert_array_equal(result['control'], mU)
+            self.assertEqual(result.event['tg'], list(event['tg']))
+            self.assertEqual(sorted(result.keys()), ['control', 'speed'])
+
+    def test_compressed(self):
+        """
+        Compressed files are read eagerly with the same content
+        """
+        store, dData = create_sweep(self.tmp.name, compress=True)
+        result = store.open('_scenario_1')
+        self.assertNotIsInstance(result['speed'], np.memmap)
+        assert_array_equal(result['speed'], dData['_scenario_1'][1])
+
+    def test_index(self):
+        """
+        Index selects scenarios, stacks columns and can be rebuilt
+        """
+        store, dData = create_sweep(self.tmp.name)
+        names = store.select(id=1)
+        self.assertEqual(names, ['_scenario_1', '_scenario_3'])
+        mV = store.stack('speed', column=2, id=1)
+        assert_array_equal(mV, np.stack([dData[n][1][:, 2] for n in names]))
+
+        os.remove(store.index_path)
+        store = ResultStore(self.tmp.name).rebuild()
+        self.assertEqual(sorted(store), sorted(dData))
+        self.assertEqual(store.select(tg=(1.2, 2.4)), ['_scenario_0'])
+        self.assertIsInstance(Result(os.path.join(
+            self.tmp.name, store.index['_scenario_0']['file'])), Result)
+
+
+if __name__ == '__main__':
+    unittest.main()
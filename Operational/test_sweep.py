@@ -0,0 +1,61 @@
+"""
+    Unit test for the parallel scenario sweep
+"""
+
+import time
+
+from sweep import run_sweep, event_name, OK, ERROR, TIMEOUT
+import unittest
+
+
+def scenario(event):
+    """ Sleeps event['tm'] seconds, fails for negative ids"""
+    if event['id'] < 0:
+        raise ValueError('negative id')
+    time.sleep(event['tm'])
+    return event['id'] * 2
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_results(self):
+        """
+        All scenarios run, callback receives results, reports keep order
+        """
+        l_events = [{'id': i, 'tm': 0.1 * (5 - i), 'tg': (1, 2)}
+                    for i in range(5)]
+        dResult = {}
+
+        def save(name, event, result):
+            dResult[name] = result
+
+        l_report = run_sweep(scenario, l_events, save, processes=3)
+        self.assertEqual([r.event for r in l_report], l_events)
+        self.assertTrue(all(r.status == OK for r in l_report))
+        self.assertEqual(dResult, {event_name(e): 2 * e['id']
+                                   for e in l_events})
+
+    def test_failures(self):
+        """
+        Errors and timeouts are reported without stopping the sweep
+        """
+        l_events = [{'id': -1, 'tm': 0, 'tg': (1, 2)},
+                    {'id': 1, 'tm': 30, 'tg': (1, 2)},
+                    {'id': 2, 'tm': 0, 'tg': (1, 2)}]
+        t_0 = time.monotonic()
+        l_report = run_sweep(scenario, l_events, processes=2, timeout=1)
+        self.assertLess(time.monotonic() - t_0, 10)
+        self.assertEqual([r.status for r in l_report], [ERROR, TIMEOUT, OK])
+        self.assertIn('negative id', l_report[0].error)
+
+    def test_name(self):
+        """
+        Scenario names depend only on the event
+        """
+        event = {'id': 2, 'tm': 30.0, 'tg': (1.0, 2.0)}
+        self.assertEqual(event_name(event), '_yield_2_gap_2.0_split_30.0')
+        self.assertEqual(event_name(dict(event)), event_name(event))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,45 +3,29 @@
 
 import sys 
 import os
-from ctypes import cdll, create_string_buffer, c_int, byref
-from xmltodict import parse
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
-lib_path_name = ('..','Symuvia','Contents','Frameworks','libSymuVia.dylib')
+sys.path.insert(0, os.path.join(dir_path, '..', 'Notebooks'))
+
+from symuviapy.session import SymuviaSession
 
-dir_path 
+lib_path_name = ('..','Symuvia','Contents','Frameworks','libSymuVia.dylib')
 full_name = os.path.join(dir_path,*lib_path_name)
-# print(full_name)
 
 print('Library folder {}'.format(full_name))
 
-symuvialib = cdll.LoadLibrary(full_name)        
-
-if symuvialib is None:
-    print('Impossible de charger libSymuVia.dylib !')
-
-print('\n Library loaded\n')
-
 file_path_name = ('..','Network','Merge.xml')
 file_name = os.path.join(dir_path,*file_path_name)
 print(file_name)
-m = symuvialib.SymLoadNetworkEx(file_name.encode('UTF8'))
-print(f'Network loaded {m}')
 
-sFlow = create_string_buffer(10000)
-print(f'Value before {sFlow.value}')
-bEnd = c_int()
+# Loads the library (once) and the network
+session = SymuviaSession(file_name, full_name)
+print(f'Network loaded {session.network}')
 
-time = range(800)
-for s in time:
+for k, ti, aTraj in session.run(800):
     # For all vehicle connected if created:
-        # symuvialib.SymDriveVehiculeEx(Id,sTroncon, nVoie, dPos, bForce)
-    bResult = symuvialib.SymRunNextStepEx(sFlow, 1, byref(bEnd))
-    dParsed = parse(sFlow.value.decode('UTF8'))
-    ti = dParsed['INST']['@val']
-    print(ti, bResult)
-    # print(f'bResult: {bResult}')
-    # print(f'OutputNet: {sFlow.value}')
+        # session.drive(Id, sTroncon, nVoie, dPos)
+    print(ti, len(aTraj))
 
 print('\n I finished simulating \n')
 # r = symuvialib.SymRunEx(file_name.encode('UTF8'))